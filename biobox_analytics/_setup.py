@@ -6,4 +6,7 @@ import os
 
 BIOBOX_REST_API = os.environ.get("BIOBOX_REST_API")
 BIOBOX_TOKEN = os.environ.get("BIOBOX_TOKEN")
-BIOBOX_ORGID = os.environ.get("BIOBOX_ORGID")
\ No newline at end of file
+BIOBOX_ORGID = os.environ.get("BIOBOX_ORGID")
+BIOBOX_CACHE_DIR = os.environ.get("BIOBOX_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "biobox"))
+# Space separated URL prefixes (e.g. file:///data/mirror/) tried before the original download URL
+BIOBOX_MIRRORS = os.environ.get("BIOBOX_MIRRORS", "").split()
@@ -1,2 +1,11 @@
+from biobox_analytics.data._writer import DataPackWriter
+from biobox_analytics.data._parquet import iter_parquet_records, read_parquet_tables
+from biobox_analytics.data._manifest import load_manifest
+from biobox_analytics.data._index import DataPackIndex
+from biobox_analytics.data._reader import iter_pack_records, pack_shards
+from biobox_analytics.data._validate import validate_pack
+from biobox_analytics.data._merge import merge_packs
 from biobox_analytics.data.adapters.genome import GenomeAdapter
+from biobox_analytics.data.adapters.genome._gtf import load_gtf
+from biobox_analytics.data.adapters.genome._batch import build_genomes
 from biobox_analytics.data.adapters.scrna import ScRNA
\ No newline at end of file
@@ -0,0 +1,180 @@
+"""
+BioBox block-compressed gzip (BGZF-style) files
+
+A block-compressed file is a sequence of independent gzip members, so any
+gzip reader can decompress it as a whole. Every member carries a `BP` extra
+subfield holding the total size of the member, which lets readers hop from
+block to block without inflating anything and hand blocks to separate
+workers. Writers only cut blocks on line ends, so each block decompresses to
+whole jsonl lines.
+"""
+
+import os
+import hashlib
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from biobox_analytics.data._manifest import file_sha256
+
+# gzip member header: magic, CM=deflate, FLG=FEXTRA, MTIME=0, XFL=0, OS=unknown,
+# XLEN=8 followed by a single 'BP' subfield holding the uint32 member size.
+_HEADER = struct.Struct("<BBBBIBBHBBHI")
+_TRAILER = struct.Struct("<II")
+_SUBFIELD_ID = (ord("B"), ord("P"))
+
+
+def compress_block(data, compresslevel=6):
+    """
+    Compress `data` into a single self-describing gzip member.
+
+    Args:
+        data (bytes): The uncompressed block.
+        compresslevel (int, optional): zlib compression level. Defaults to 6.
+
+    Returns:
+        bytes: The complete gzip member.
+    """
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(data) + compressor.flush()
+    size = _HEADER.size + len(deflated) + _TRAILER.size
+    header = _HEADER.pack(
+        0x1F, 0x8B, 8, 4, 0, 0, 255, 8,
+        _SUBFIELD_ID[0], _SUBFIELD_ID[1], 4, size
+    )
+    trailer = _TRAILER.pack(zlib.crc32(data) & 0xFFFFFFFF, len(data) & 0xFFFFFFFF)
+    return header + deflated + trailer
+
+
+class BlockGzipWriter:
+    """
+    Binary file writer that compresses blocks in a thread pool.
+
+    Each call to `write_block` becomes one gzip member. Blocks are compressed
+    concurrently (zlib releases the GIL) and written to disk in submission
+    order, with at most `2 * threads` blocks in flight. The sha256 of a new
+    file is kept as it is written; a file that is appended to is only hashed
+    when `hexdigest` is called, so appending costs nothing per existing byte.
+
+    Args:
+        path (str): File to write. Opened in append mode.
+        compresslevel (int, optional): zlib compression level. Defaults to 6.
+        threads (int, optional): Number of compression threads. 1 compresses inline, None uses every core. Defaults to 1.
+    """
+
+    def __init__(self, path, compresslevel=6, threads=1):
+        self.path = path
+        self.compresslevel = compresslevel
+        self.threads = max(1, threads or os.cpu_count() or 1)
+        self.block_offsets = []
+        self._handle = open(path, "ab")
+        self._handle.seek(0, os.SEEK_END)
+        self._offset = self.start_offset = self._handle.tell()
+        self._sha256 = None if self.start_offset else hashlib.sha256()
+        self._pending = deque()
+        self._executor = ThreadPoolExecutor(max_workers=self.threads) if self.threads > 1 else None
+
+    def write_block(self, data):
+        """
+        Queue `data` as one block.
+
+        Returns:
+            int: The sequence number of the block, an index into `block_offsets` once written.
+        """
+        seq = len(self.block_offsets) + len(self._pending)
+        if self._executor is None:
+            self._write_member(compress_block(data, self.compresslevel))
+        else:
+            self._pending.append(self._executor.submit(compress_block, data, self.compresslevel))
+            while len(self._pending) > 2 * self.threads:
+                self._write_member(self._pending.popleft().result())
+        return seq
+
+    def _write_member(self, member):
+        self.block_offsets.append(self._offset)
+        self._handle.write(member)
+        if self._sha256 is not None:
+            self._sha256.update(member)
+        self._offset += len(member)
+
+    @property
+    def size(self):
+        """Number of bytes in the file, counting only blocks already written."""
+        return self._offset
+
+    def hexdigest(self):
+        """sha256 of the file contents written so far, read back from disk for an appended file."""
+        if self._sha256 is None:
+            if self._handle is not None:
+                self.flush()
+            return file_sha256(self.path)
+        return self._sha256.hexdigest()
+
+    def flush(self):
+        while self._pending:
+            self._write_member(self._pending.popleft().result())
+        self._handle.flush()
+
+    def close(self):
+        if self._handle is None:
+            return
+        self.flush()
+        if self._executor is not None:
+            self._executor.shutdown()
+        self._handle.close()
+        self._handle = None
+
+
+def iter_blocks(path):
+    """
+    Iterate over the blocks of a block-compressed file without decompressing them.
+
+    Args:
+        path (str): Path to a file written by BlockGzipWriter.
+
+    Yields:
+        tuple: (offset, size) of each gzip member in the file.
+
+    Raises:
+        ValueError: If a member does not carry the block size subfield.
+    """
+    with open(path, "rb") as f:
+        offset = 0
+        while True:
+            header = f.read(_HEADER.size)
+            if not header:
+                return
+            size = _block_size(header, path, offset)
+            yield offset, size
+            offset += size
+            f.seek(offset)
+
+
+def _block_size(header, path, offset):
+    if len(header) < _HEADER.size:
+        raise ValueError(f"Truncated block header at offset {offset} in {path}")
+    fields = _HEADER.unpack(header)
+    if fields[0] != 0x1F or fields[1] != 0x8B or not fields[3] & 4 or (fields[8], fields[9]) != _SUBFIELD_ID:
+        raise ValueError(f"{path} is not block-compressed (no block size at offset {offset})")
+    return fields[11]
+
+
+def read_block(f, offset):
+    """
+    Decompress the block starting at `offset`.
+
+    Args:
+        f: A file object opened in binary mode, or a path.
+        offset (int): Offset of the gzip member, as returned by `iter_blocks`.
+
+    Returns:
+        bytes: The uncompressed contents of the block.
+    """
+    if isinstance(f, (str, os.PathLike)):
+        with open(f, "rb") as fh:
+            return read_block(fh, offset)
+    f.seek(offset)
+    header = f.read(_HEADER.size)
+    size = _block_size(header, getattr(f, "name", "<file>"), offset)
+    member = header + f.read(size - _HEADER.size)
+    return zlib.decompress(member, 16 + zlib.MAX_WBITS)
@@ -0,0 +1,198 @@
+"""
+BioBox bounded-memory deduplication
+
+`DiskHashSet` remembers 64-bit key hashes in a small in-memory buffer that
+is spilled to sorted run files on disk. Runs of similar size are merged in
+fixed-size chunks, so there are only O(log n) runs and memory stays bounded
+by the buffer, the merge chunk and the optional Bloom filter, whatever the
+number of keys. Lookups are vectorized over batches of hashes.
+
+A set opened on a `path` keeps its runs there when it is closed and loads
+them when it is opened again, so keys are remembered across writers, runs
+and packs.
+"""
+
+import os
+import re
+import glob
+import math
+import shutil
+import tempfile
+import numpy as np
+
+
+class BloomFilter:
+    """
+    In-memory Bloom filter over 64-bit hashes.
+
+    Args:
+        capacity (int): Expected number of distinct keys.
+        error_rate (float, optional): Target false positive rate at capacity. Defaults to 0.01.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, hashes):
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        k = np.arange(self.hash_count, dtype=np.uint64)
+        return (h1[:, None] + k[None, :] * h2[:, None]) % np.uint64(self.size)
+
+    def add(self, hashes):
+        positions = self._positions(hashes).ravel()
+        np.bitwise_or.at(self._bits, positions >> np.uint64(3), (1 << (positions & np.uint64(7))).astype(np.uint8))
+
+    def contains(self, hashes):
+        """Return a boolean mask that is False where a hash was certainly never added."""
+        positions = self._positions(hashes)
+        bits = self._bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)
+        return np.all(bits & 1, axis=1)
+
+
+def _merge_runs(a, b, path, chunk):
+    """Merge two sorted, disjoint runs into a new run file, `chunk` hashes of each at a time."""
+    out = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint64, shape=(len(a) + len(b),))
+    i = j = k = 0
+    while i < len(a) and j < len(b):
+        bound = min(a[min(i + chunk, len(a)) - 1], b[min(j + chunk, len(b)) - 1])
+        i_end = i + int(np.searchsorted(a[i:i + chunk], bound, side="right"))
+        j_end = j + int(np.searchsorted(b[j:j + chunk], bound, side="right"))
+        part = np.sort(np.concatenate([a[i:i_end], b[j:j_end]]))
+        out[k:k + len(part)] = part
+        k += len(part)
+        i, j = i_end, j_end
+    for rest, start in ((a, i), (b, j)):
+        for s in range(start, len(rest), chunk):
+            part = rest[s:s + chunk]
+            out[k:k + len(part)] = part
+            k += len(part)
+    out.flush()
+    del out
+    return np.load(path, mmap_mode="r")
+
+
+class DiskHashSet:
+    """
+    Disk-backed set of 64-bit hashes.
+
+    Args:
+        tmp_dir (str, optional): Parent of the temporary directory that holds the run files, which is
+            removed on close. Defaults to the system temp directory.
+        path (str, optional): Directory of a persistent set, created if missing, instead of a temporary
+            one. Hashes added earlier are loaded and the set is saved there on close. Only one set should
+            have a path open at a time.
+        buffer_size (int, optional): Hashes held in memory before spilling a run. Defaults to 1048576.
+        bloom_capacity (int, optional): Enable a Bloom filter sized for this many keys, which lets most
+            first-seen keys skip the run lookups. Defaults to None (no filter).
+        merge_chunk (int, optional): Hashes per step when merging runs. Defaults to 4194304.
+    """
+
+    def __init__(self, tmp_dir=None, buffer_size=1 << 20, bloom_capacity=None, merge_chunk=1 << 22, path=None):
+        self.persistent = path is not None
+        if self.persistent:
+            os.makedirs(path, exist_ok=True)
+            self.directory = path
+        else:
+            if tmp_dir is not None:
+                os.makedirs(tmp_dir, exist_ok=True)
+            self.directory = tempfile.mkdtemp(prefix="biobox-dedupe-", dir=tmp_dir)
+        self.buffer_size = buffer_size
+        self.merge_chunk = merge_chunk
+        self.bloom = BloomFilter(bloom_capacity) if bloom_capacity else None
+        self._memory = np.empty(0, dtype=np.uint64)
+        self._runs = []
+        self._run_number = 0
+        self.count = 0
+        self._load_runs()
+
+    def _load_runs(self):
+        paths = sorted(glob.glob(os.path.join(self.directory, "run-*.npy")))
+        for path in paths:
+            run = np.load(path, mmap_mode="r")
+            self._runs.append(run)
+            self.count += len(run)
+            if self.bloom is not None:
+                for start in range(0, len(run), self.merge_chunk):
+                    self.bloom.add(np.asarray(run[start:start + self.merge_chunk]))
+        if paths:
+            self._run_number = int(re.search(r"run-(\d+)\.npy$", paths[-1]).group(1))
+        # Runs are kept largest first, like the ones _spill produces
+        self._runs.sort(key=len, reverse=True)
+
+    def __len__(self):
+        return self.count
+
+    def add_new(self, hashes):
+        """
+        Add a batch of hashes.
+
+        Args:
+            hashes (numpy.ndarray): uint64 hashes, possibly repeated.
+
+        Returns:
+            numpy.ndarray: Boolean mask, True for the first occurrence of every hash not already in the set.
+        """
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        unique, first = np.unique(hashes, return_index=True)
+        seen = _isin_sorted(unique, self._memory)
+        candidates = ~seen
+        if self.bloom is not None:
+            candidates &= self.bloom.contains(unique)
+        for run in self._runs:
+            idx = np.flatnonzero(candidates)
+            if len(idx) == 0:
+                break
+            found = idx[_isin_sorted(unique[idx], run)]
+            seen[found] = True
+            candidates[found] = False
+        new = unique[~seen]
+        if len(new):
+            # Both are sorted, so the batch is inserted in place rather than re-sorting the buffer
+            self._memory = np.insert(self._memory, np.searchsorted(self._memory, new), new)
+            if self.bloom is not None:
+                self.bloom.add(new)
+            self.count += len(new)
+            if len(self._memory) >= self.buffer_size:
+                self._spill()
+        mask = np.zeros(len(hashes), dtype=bool)
+        mask[first[~seen]] = True
+        return mask
+
+    def _spill(self):
+        path = self._run_path()
+        np.save(path, self._memory)
+        self._runs.append(np.load(path, mmap_mode="r"))
+        self._memory = np.empty(0, dtype=np.uint64)
+        while len(self._runs) >= 2 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+            b = self._runs.pop()
+            a = self._runs.pop()
+            paths = (a.filename, b.filename)
+            self._runs.append(_merge_runs(a, b, self._run_path(), self.merge_chunk))
+            del a, b
+            for p in paths:
+                os.remove(p)
+
+    def _run_path(self):
+        self._run_number += 1
+        return os.path.join(self.directory, f"run-{self._run_number:06d}.npy")
+
+    def close(self):
+        """Save a persistent set's buffer as a run, or remove a temporary set's files."""
+        if self.persistent:
+            if len(self._memory):
+                self._spill()
+            self._runs = []
+            return
+        self._runs = []
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _isin_sorted(values, sorted_array):
+    if len(sorted_array) == 0 or len(values) == 0:
+        return np.zeros(len(values), dtype=bool)
+    idx = np.searchsorted(sorted_array, values)
+    idx[idx == len(sorted_array)] = len(sorted_array) - 1
+    return sorted_array[idx] == values
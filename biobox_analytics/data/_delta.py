@@ -0,0 +1,149 @@
+"""
+BioBox content hashes and delta data packs
+
+A pack written with `hashes=True` stores, per stream, a `<stem>.hashes` file
+of (key hash, content hash) pairs: 64-bit hashes of every record's key (see
+`record_key`) and of its canonical JSON. A later build given that pack as its
+`base` compares each record against those hashes and only writes records
+that were added or changed, plus the base records whose keys no longer
+appear, into a small patch pack.
+"""
+
+import os
+import json
+import numpy as np
+from biobox_analytics.data._index import hash_id, hash_ids
+from biobox_analytics.data._manifest import load_manifest, MANIFEST_FILENAME
+from biobox_analytics.data._records import record_key
+from biobox_analytics.data._reader import iter_pack_records
+
+HASHES_SUFFIX = ".hashes"
+HASH_DTYPE = np.dtype([("key", "<u8"), ("content", "<u8")])
+
+
+def content_hash(record):
+    """Return the 64-bit hash of a record's canonical JSON."""
+    return hash_id(json.dumps(record, sort_keys=True))
+
+
+def content_hashes(records):
+    """Return the content hashes of `records` as a uint64 NumPy array."""
+    return hash_ids(json.dumps(record, sort_keys=True) for record in records)
+
+
+class HashWriter:
+    """Append (key hash, content hash) pairs to a stream's hashes file."""
+
+    def __init__(self, path):
+        self.path = path
+        self.records = 0
+        self._handle = open(path, "ab")
+
+    def write(self, keys, contents):
+        pairs = np.empty(len(keys), dtype=HASH_DTYPE)
+        pairs["key"] = keys
+        pairs["content"] = contents
+        self._handle.write(pairs.tobytes())
+        self.records += len(pairs)
+
+    def close(self):
+        self._handle.close()
+
+
+def load_hashes(directory, kind):
+    """
+    Load the content hashes of one stream of a pack.
+
+    Returns:
+        numpy.ndarray: HASH_DTYPE pairs sorted by key hash.
+
+    Raises:
+        ValueError: If the pack was not written with hashes.
+    """
+    entries = [h for h in load_manifest(directory).get("hashes", []) if h["kind"] == kind]
+    if not entries and not os.path.exists(os.path.join(directory, MANIFEST_FILENAME)):
+        raise ValueError(f"{directory} has no {MANIFEST_FILENAME}; base packs must be written with hashes=True")
+    pairs = [np.fromfile(os.path.join(directory, h["path"]), dtype=HASH_DTYPE) for h in entries]
+    pairs = np.concatenate(pairs) if pairs else np.empty(0, dtype=HASH_DTYPE)
+    return pairs[np.argsort(pairs["key"], kind="stable")]
+
+
+class DeltaState:
+    """
+    Compare the records of one stream against the hashes of a base pack.
+
+    Args:
+        directory (str): Directory of the base pack.
+        kind (str): 'node' or 'edge'.
+    """
+
+    def __init__(self, directory, kind):
+        self.directory = directory
+        self.kind = kind
+        pairs = load_hashes(directory, kind)
+        # Keep one pair per key so that matching a key covers every base copy of it
+        if len(pairs):
+            first = np.ones(len(pairs), dtype=bool)
+            first[1:] = pairs["key"][1:] != pairs["key"][:-1]
+            pairs = pairs[first]
+        self._keys = np.ascontiguousarray(pairs["key"])
+        self._contents = np.ascontiguousarray(pairs["content"])
+        self._matched = np.zeros(len(pairs), dtype=bool)
+        self.counts = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0}
+
+    def classify(self, keys, contents):
+        """
+        Return a boolean mask of the records that were added or changed since the base pack.
+
+        Args:
+            keys (numpy.ndarray): Key hashes of a batch of records.
+            contents (numpy.ndarray): Content hashes of the same records.
+        """
+        if len(self._keys) == 0:
+            self.counts["added"] += len(keys)
+            return np.ones(len(keys), dtype=bool)
+        idx = np.searchsorted(self._keys, keys)
+        idx[idx == len(self._keys)] = len(self._keys) - 1
+        found = self._keys[idx] == keys
+        unchanged = found & (self._contents[idx] == contents)
+        self._matched[idx[found]] = True
+        self.counts["added"] += int((~found).sum())
+        self.counts["changed"] += int((found & ~unchanged).sum())
+        self.counts["unchanged"] += int(unchanged.sum())
+        return ~unchanged
+
+    def removed_keys(self):
+        """Key hashes of base records that were never matched, sorted."""
+        removed = np.unique(self._keys[~self._matched])
+        self.counts["removed"] = len(removed)
+        return removed
+
+
+def iter_removed(directory, kind, removed_keys, batch_size=8192):
+    """
+    Stream the records of a base pack whose key hashes are in `removed_keys`.
+
+    Args:
+        directory (str): Directory of the base pack.
+        kind (str): 'node' or 'edge'.
+        removed_keys (numpy.ndarray): Sorted key hashes, as returned by DeltaState.removed_keys.
+    """
+    if len(removed_keys) == 0:
+        return
+    batch = []
+    for record in iter_pack_records(directory, kind=kind):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield from _select(batch, removed_keys)
+            batch = []
+    yield from _select(batch, removed_keys)
+
+
+def _select(batch, removed_keys):
+    if not batch:
+        return
+    keys = hash_ids(record_key(x) for x in batch)
+    idx = np.minimum(np.searchsorted(removed_keys, keys), len(removed_keys) - 1)
+    for record, hit in zip(batch, removed_keys[idx] == keys):
+        if hit:
+            yield record
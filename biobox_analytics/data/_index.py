@@ -0,0 +1,185 @@
+"""
+BioBox data pack offset indexes
+
+Every indexed shard `node-00000.jsonl.gz` has a sidecar
+`node-00000.jsonl.gz.idx`: an 8-byte magic, a record count and one entry per
+record, sorted by the 64-bit hash of the record's id. An entry holds the
+offset of the compressed block containing the record plus the record's
+offset and length inside the decompressed block, so one record is fetched by
+a binary search over the memory-mapped index and a single block inflate.
+"""
+
+import os
+import json
+import struct
+import hashlib
+from array import array
+import numpy as np
+from biobox_analytics.data._bgzf import read_block
+from biobox_analytics.data._manifest import load_manifest, MANIFEST_FILENAME
+from biobox_analytics.data._records import record_id, is_edge
+
+INDEX_SUFFIX = ".idx"
+_MAGIC = b"BXIDX001"
+_COUNT = struct.Struct("<Q")
+_HEADER_SIZE = len(_MAGIC) + _COUNT.size
+INDEX_DTYPE = np.dtype([("hash", "<u8"), ("block", "<u8"), ("offset", "<u4"), ("length", "<u4")])
+
+
+def hash_id(key):
+    """Return a stable unsigned 64-bit hash of a record id or key."""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def hash_ids(keys):
+    """Return the 64-bit hashes of `keys` as a uint64 NumPy array."""
+    return np.fromiter((hash_id(k) for k in keys), dtype=np.uint64)
+
+
+class IndexBuilder:
+    """
+    Collect index entries for one shard while it is written.
+
+    Entries are held in compact arrays (24 bytes per record) and sorted when
+    the shard is closed.
+    """
+
+    def __init__(self):
+        self._hashes = array("Q")
+        self._blocks = array("Q")
+        self._offsets = array("I")
+        self._lengths = array("I")
+
+    def add(self, key, block, offset, length):
+        """Record that `key` is `length` bytes at `offset` in the shard's `block`-th block."""
+        self._hashes.append(hash_id(key))
+        self._blocks.append(block)
+        self._offsets.append(offset)
+        self._lengths.append(length)
+
+    def write(self, path, block_offsets):
+        """
+        Write the sorted index to `path`.
+
+        Args:
+            path (str): Index file to write. Entries of an existing index are kept.
+            block_offsets (list): File offset of each block, by block number.
+        """
+        entries = np.empty(len(self._hashes), dtype=INDEX_DTYPE)
+        entries["hash"] = np.frombuffer(self._hashes, dtype=np.uint64)
+        entries["block"] = np.asarray(block_offsets, dtype=np.uint64)[np.frombuffer(self._blocks, dtype=np.uint64)]
+        entries["offset"] = np.frombuffer(self._offsets, dtype=np.uint32)
+        entries["length"] = np.frombuffer(self._lengths, dtype=np.uint32)
+        if os.path.exists(path):
+            entries = np.concatenate([np.asarray(_open_index(path)), entries])
+        entries = entries[np.argsort(entries["hash"], kind="stable")]
+        with open(path + ".tmp", "wb") as f:
+            f.write(_MAGIC)
+            f.write(_COUNT.pack(len(entries)))
+            f.write(entries.tobytes())
+        os.replace(path + ".tmp", path)
+
+
+def _open_index(path):
+    with open(path, "rb") as f:
+        header = f.read(_HEADER_SIZE)
+    if header[:len(_MAGIC)] != _MAGIC:
+        raise ValueError(f"{path} is not a data pack index")
+    (count,) = _COUNT.unpack(header[len(_MAGIC):])
+    if count == 0:
+        return np.empty(0, dtype=INDEX_DTYPE)
+    return np.memmap(path, dtype=INDEX_DTYPE, mode="r", offset=_HEADER_SIZE, shape=(count,))
+
+
+class DataPackIndex:
+    """
+    Random access to the records of indexed data pack shards by id.
+
+    Nodes are looked up by `_id` and edges by the uuid of their source node.
+    Index files are memory-mapped, so opening a pack is cheap and a lookup
+    reads only the index pages it searches and the blocks that hold matches.
+
+    Usage:
+        index = DataPackIndex("genome_pack")
+        index.get("ENSG00000139618")
+        index.get_many(["ENSG00000139618", "ENST00000380152"], kind="edge")
+
+    Args:
+        source (str or list): A data pack directory, or a list of shard paths.
+            For a directory the shards come from its manifest if it has one,
+            otherwise every shard with an index sidecar is used.
+    """
+
+    def __init__(self, source):
+        self._shards = []
+        if isinstance(source, (str, os.PathLike)) and os.path.isdir(source):
+            if os.path.exists(os.path.join(source, MANIFEST_FILENAME)):
+                for entry in load_manifest(source)["shards"]:
+                    if entry.get("index"):
+                        self._add(os.path.join(source, entry["path"]), os.path.join(source, entry["index"]), entry["kind"])
+            else:
+                for name in sorted(os.listdir(source)):
+                    if name.endswith(INDEX_SUFFIX):
+                        self._add(os.path.join(source, name[:-len(INDEX_SUFFIX)]), os.path.join(source, name), None)
+        else:
+            for path in ([source] if isinstance(source, (str, os.PathLike)) else source):
+                self._add(path, path + INDEX_SUFFIX, None)
+        if not self._shards:
+            raise ValueError(f"No indexed shards found in {source}")
+
+    def _add(self, path, index_path, kind):
+        self._shards.append({"path": path, "kind": kind, "index": _open_index(index_path)})
+
+    def __len__(self):
+        return sum(len(shard["index"]) for shard in self._shards)
+
+    def get_many(self, ids, kind=None):
+        """
+        Fetch the records for a batch of ids.
+
+        Args:
+            ids (list): Node `_id`s or edge source uuids.
+            kind (str, optional): Restrict the lookup to 'node' or 'edge' records.
+
+        Returns:
+            dict: Mapping of each id to the list of matching records (empty if none).
+        """
+        ids = list(dict.fromkeys(ids))
+        results = {i: [] for i in ids}
+        hashes = hash_ids(ids)
+        for shard in self._shards:
+            if kind is not None and shard["kind"] not in (None, kind):
+                continue
+            index = shard["index"]
+            if len(index) == 0:
+                continue
+            keys = index["hash"]
+            lo = np.searchsorted(keys, hashes, side="left")
+            hi = np.searchsorted(keys, hashes, side="right")
+            hits = [(i, j) for i, (a, b) in enumerate(zip(lo, hi)) for j in range(a, b)]
+            if not hits:
+                continue
+            blocks = {}
+            with open(shard["path"], "rb") as f:
+                for i, j in sorted(hits, key=lambda hit: int(index["block"][hit[1]])):
+                    block_offset = int(index["block"][j])
+                    if block_offset not in blocks:
+                        blocks[block_offset] = read_block(f, block_offset)
+                    start = int(index["offset"][j])
+                    record = json.loads(blocks[block_offset][start:start + int(index["length"][j])])
+                    if record_id(record) != ids[i]:
+                        continue
+                    if kind is not None and is_edge(record) != (kind == "edge"):
+                        continue
+                    results[ids[i]].append(record)
+        return results
+
+    def get(self, id, kind=None):
+        """
+        Fetch a single record by id.
+
+        Returns:
+            dict: The first matching record, or None if the id is not in the pack.
+        """
+        records = self.get_many([id], kind=kind)[id]
+        return records[0] if records else None
@@ -0,0 +1,85 @@
+"""
+BioBox data pack manifests
+
+A manifest (`manifest.json`) lists every shard of a data pack with its kind,
+format, row count, byte size, label mix and sha256 checksum, so loaders can
+ingest shards in parallel and verify them.
+"""
+
+import os
+import json
+import hashlib
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    """Return the hex sha256 digest of the file at `path`."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(directory):
+    """
+    Load the manifest of the data pack in `directory`.
+
+    Returns:
+        dict: The manifest, or an empty manifest if the directory has none.
+    """
+    path = os.path.join(directory, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return {"version": MANIFEST_VERSION, "shards": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def update_manifest(directory, entries, hashes=(), delta=None):
+    """
+    Merge shard entries into the manifest of the data pack in `directory`.
+
+    An entry whose path is already listed replaces the previous entry, with
+    its record, byte and label counts added to the earlier ones, since shards are
+    appended to rather than overwritten. The manifest is replaced atomically.
+
+    Args:
+        directory (str): Directory holding the data pack.
+        entries (list): Shard entries with at least `kind`, `path` and `records`.
+        hashes (list, optional): Content hash files ({"kind", "path", "records"}) written alongside the shards.
+        delta (dict, optional): Delta summary to record, e.g. {"base": ..., "node": {"added": 3, ...}}.
+
+    Returns:
+        dict: The updated manifest.
+    """
+    manifest = load_manifest(directory)
+    shards = {s["path"]: s for s in manifest["shards"]}
+    for entry in entries:
+        previous = shards.get(entry["path"])
+        if previous is not None and entry.get("appended"):
+            entry = dict(entry)
+            entry["records"] += previous["records"]
+            if "uncompressed_bytes" in entry:
+                entry["uncompressed_bytes"] += previous.get("uncompressed_bytes", 0)
+            labels = dict(previous.get("labels", {}))
+            for label, n in entry.get("labels", {}).items():
+                labels[label] = labels.get(label, 0) + n
+            entry["labels"] = labels
+        entry = {k: v for k, v in entry.items() if k != "appended"}
+        shards[entry["path"]] = entry
+    manifest["shards"] = list(shards.values())
+    if hashes:
+        files = {h["path"]: h for h in manifest.get("hashes", [])}
+        for h in hashes:
+            previous = files.get(h["path"])
+            files[h["path"]] = dict(h, records=h["records"] + (previous["records"] if previous else 0))
+        manifest["hashes"] = list(files.values())
+    if delta:
+        manifest.setdefault("delta", {}).update(delta)
+    path = os.path.join(directory, MANIFEST_FILENAME)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+    return manifest
@@ -0,0 +1,135 @@
+"""
+BioBox data pack merging
+
+Combines several data packs into one, sorting nodes by `_id` and edges by
+(source uuid, label, target uuid) with an external merge sort: records are
+sorted in bounded runs that are spilled to disk, then k-way merged, dropping
+duplicate keys, into a single pack written with DataPackWriter.
+"""
+
+import os
+import gzip
+import json
+import heapq
+import shutil
+import tempfile
+from biobox_analytics.data._writer import DataPackWriter
+from biobox_analytics.data._reader import iter_pack_records
+from biobox_analytics.data._records import batched
+
+
+def _sort_key(record):
+    if "from" in record:
+        return (record["from"]["uuid"], record["label"], record["to"]["uuid"])
+    return (record.get("_id", record.get("id")),)
+
+
+def _write_run(path, items):
+    with gzip.open(path, "wt", compresslevel=1) as f:
+        for key, line in items:
+            f.write(json.dumps(key))
+            f.write("\t")
+            f.write(line)
+            f.write("\n")
+
+
+def _read_run(path):
+    with gzip.open(path, "rt") as f:
+        for line in f:
+            key, record = line.rstrip("\n").split("\t", 1)
+            yield tuple(json.loads(key)), record
+
+
+def _merged(runs):
+    return heapq.merge(*(_read_run(path) for path in runs), key=lambda item: item[0])
+
+
+class _RunSpiller:
+    def __init__(self, directory, kind, run_records, fan_in):
+        self.directory = directory
+        self.kind = kind
+        self.run_records = run_records
+        self.fan_in = fan_in
+        self.runs = []
+        self._count = 0
+
+    def _path(self):
+        self._count += 1
+        return os.path.join(self.directory, f"{self.kind}-run-{self._count:06d}.gz")
+
+    def spill(self, records):
+        for batch in batched(records, self.run_records):
+            items = sorted(((_sort_key(x), json.dumps(x)) for x in batch), key=lambda item: item[0])
+            path = self._path()
+            _write_run(path, items)
+            self.runs.append(path)
+
+    def final_runs(self):
+        """Merge runs in groups of `fan_in` until at most `fan_in` remain, keeping their order."""
+        while len(self.runs) > self.fan_in:
+            runs = []
+            for i in range(0, len(self.runs), self.fan_in):
+                group = self.runs[i:i + self.fan_in]
+                if len(group) == 1:
+                    runs.extend(group)
+                    continue
+                path = self._path()
+                _write_run(path, _merged(group))
+                for p in group:
+                    os.remove(p)
+                runs.append(path)
+            self.runs = runs
+        return self.runs
+
+
+def merge_packs(inputs, directory, run_records=1_000_000, fan_in=64, tmp_dir=None, **writer_kwargs):
+    """
+    Merge data packs into one sorted, deduplicated pack.
+
+    Nodes come out sorted by `_id` and edges by (source uuid, label, target
+    uuid), which keeps each node's outgoing edges together for the graph
+    loader. When several inputs hold a record with the same key, the one
+    from the earliest input is kept.
+
+    Usage:
+        merge_packs(["genome", "chipseq", "scrna"], "combined", shard_records=5_000_000, index=True)
+
+    Args:
+        inputs (list): Directories of the packs to merge, in order of precedence.
+        directory (str): Directory the merged pack is written to.
+        run_records (int, optional): Records sorted in memory per spill run. Defaults to 1,000,000.
+        fan_in (int, optional): Runs merged at once. Defaults to 64.
+        tmp_dir (str, optional): Parent directory for the spill files. Defaults to the system temp directory.
+        **writer_kwargs: Options for the DataPackWriter of the merged pack, e.g. shard_records or format.
+
+    Returns:
+        dict: Per kind, the number of records read, written and dropped as duplicates.
+    """
+    os.makedirs(directory, exist_ok=True)
+    spill_directory = tempfile.mkdtemp(prefix="biobox-merge-", dir=tmp_dir)
+    stats = {}
+    try:
+        with DataPackWriter(directory=directory, **writer_kwargs) as writer:
+            for kind in ("node", "edge"):
+                spiller = _RunSpiller(spill_directory, kind, run_records, fan_in)
+                for pack in inputs:
+                    spiller.spill(iter_pack_records(pack, kind=kind))
+                counts = {"read": 0, "written": 0, "duplicates": 0}
+                stats[kind] = counts
+                write = writer.write_nodes if kind == "node" else writer.write_edges
+                write(_unique(_merged(spiller.final_runs()), counts))
+    finally:
+        shutil.rmtree(spill_directory, ignore_errors=True)
+    return stats
+
+
+def _unique(items, counts):
+    previous = None
+    for key, line in items:
+        counts["read"] += 1
+        if key == previous:
+            counts["duplicates"] += 1
+            continue
+        previous = key
+        counts["written"] += 1
+        yield json.loads(line)
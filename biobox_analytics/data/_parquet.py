@@ -0,0 +1,282 @@
+"""
+BioBox columnar (Parquet) data packs
+
+Nodes and edges are written as one Parquet table per label. Node tables have
+`_id`, `labels` and a typed `properties` struct column; edge tables flatten the
+endpoints into `from`/`to` uuid columns next to `label` and `properties`.
+"""
+
+import os
+import re
+import pyarrow as pa
+import pyarrow.parquet as pq
+from biobox_analytics.data._records import record_label
+from biobox_analytics.data._manifest import file_sha256
+
+# Property types that are pinned instead of inferred from the first row group
+COLUMN_TYPES = {
+    "start": pa.int64(),
+    "end": pa.int64(),
+    "chrom_start": pa.int64(),
+    "chrom_end": pa.int64(),
+    "taxon": pa.int64(),
+    "normValue": pa.float32(),
+    "peakValue": pa.float32(),
+}
+
+
+def _to_row(record):
+    if "from" in record:
+        return {
+            "from": record["from"]["uuid"],
+            "to": record["to"]["uuid"],
+            "label": record["label"],
+            "properties": record.get("properties") or None,
+        }
+    return {
+        "_id": record.get("_id", record.get("id")),
+        "labels": record["labels"],
+        "properties": record.get("properties") or None,
+    }
+
+
+def _from_row(row):
+    properties = row.pop("properties", None)
+    if "from" in row:
+        record = {
+            "from": {"uuid": row["from"]},
+            "to": {"uuid": row["to"]},
+            "label": row["label"],
+        }
+    else:
+        record = {"_id": row["_id"], "labels": row["labels"]}
+    if properties:
+        record["properties"] = {k: v for k, v in properties.items() if v is not None}
+    return record
+
+
+def _infer_schema(rows):
+    return _pin_types(pa.Table.from_pylist(rows).schema)
+
+
+def _pin_types(schema):
+    index = schema.get_field_index("properties")
+    if index < 0:
+        return schema
+    prop_type = schema.field(index).type
+    if not pa.types.is_struct(prop_type) or prop_type.num_fields == 0:
+        return schema.remove(index)
+    fields = [
+        pa.field(f.name, COLUMN_TYPES.get(f.name, f.type))
+        for f in prop_type
+    ]
+    return schema.set(index, pa.field("properties", pa.struct(fields)))
+
+
+def _check_properties(label, names, schema):
+    known = set(schema.field("properties").type.names) if "properties" in schema.names else set()
+    extra = set(names) - known
+    if extra:
+        raise ValueError(
+            f"Properties {sorted(extra)} of '{label}' are missing from the table schema inferred "
+            "from its first row group; increase row_group_size or make the properties uniform"
+        )
+
+
+def _conform(table, label, schema):
+    """Cast `table` to `schema`, filling properties it lacks with nulls."""
+    properties = table.column("properties").combine_chunks() if "properties" in table.column_names else None
+    names = properties.type.names if properties is not None and pa.types.is_struct(properties.type) else []
+    _check_properties(label, names, schema)
+    columns = []
+    for field in schema:
+        if field.name != "properties":
+            columns.append(table.column(field.name).cast(field.type))
+            continue
+        children = dict(zip(names, properties.flatten())) if names else {}
+        columns.append(pa.StructArray.from_arrays(
+            [
+                children[f.name].cast(f.type) if f.name in children else pa.nulls(table.num_rows, f.type)
+                for f in field.type
+            ],
+            fields=list(field.type),
+        ))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _safe_name(label):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", label)
+
+
+class ParquetStream:
+    """
+    Parquet output stream writing one table per label under `root`.
+
+    Rows are buffered per label and written as row groups of `row_group_size`
+    rows. The schema of each table is inferred from its first row group, with
+    the types in `COLUMN_TYPES` pinned; a property that first appears in a
+    later row group raises a ValueError rather than being dropped.
+
+    Every table file is a shard; with `shard_records` or `shard_bytes` set a
+    label rolls over to a new file once its current one is large enough.
+    Finished files are described in `shards`.
+
+    Args:
+        root (str): Directory the label tables are written to.
+        row_group_size (int, optional): Rows per row group. Defaults to 131072.
+        compression (str, optional): Parquet codec. Defaults to 'zstd'.
+        shard_records (int, optional): Roll over to a new file after this many rows.
+        shard_bytes (int, optional): Roll over to a new file after this many bytes.
+    """
+
+    def __init__(self, root, row_group_size=1 << 17, compression="zstd", shard_records=None, shard_bytes=None):
+        self.path = root
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.shard_records = shard_records
+        self.shard_bytes = shard_bytes
+        self.records = 0
+        self.shards = []
+        self._buffers = {}
+        self._writers = {}
+        self._paths = {}
+        self._file_records = {}
+
+    @property
+    def bytes(self):
+        return sum(shard["bytes"] for shard in self.shards)
+
+    def write(self, objs):
+        for x in objs:
+            label = record_label(x)
+            rows = self._buffers.setdefault(label, [])
+            rows.append(_to_row(x))
+            self.records += 1
+            if len(rows) >= self.row_group_size or (
+                self.shard_records and len(rows) + self._file_records.get(label, 0) >= self.shard_records
+            ):
+                self._flush_label(label)
+
+    def _writer(self, label, schema):
+        writer = self._writers.get(label)
+        if writer is None:
+            os.makedirs(self.path, exist_ok=True)
+            n = 0
+            while True:
+                path = os.path.join(self.path, f"{_safe_name(label)}-{n:05d}.parquet")
+                if not os.path.exists(path):
+                    break
+                n += 1
+            writer = pq.ParquetWriter(path, schema, compression=self.compression)
+            self._writers[label] = writer
+            self._paths[label] = path
+            self._file_records[label] = 0
+        return writer
+
+    def _close_file(self, label):
+        self._writers.pop(label).close()
+        path = self._paths.pop(label)
+        records = self._file_records.pop(label)
+        self.shards.append({
+            "path": path,
+            "format": "parquet",
+            "records": records,
+            "bytes": os.path.getsize(path),
+            "labels": {label: records},
+            "sha256": file_sha256(path),
+        })
+
+    def _flush_label(self, label):
+        rows = self._buffers.pop(label, None)
+        if not rows:
+            return
+        writer = self._writers.get(label)
+        schema = _infer_schema(rows) if writer is None else writer.schema
+        names = set()
+        for row in rows:
+            names.update((row["properties"] or {}).keys())
+        _check_properties(label, names, schema)
+        self._write_table(label, pa.Table.from_pylist(rows, schema=schema))
+
+    def write_table(self, label, table):
+        """
+        Write a pyarrow Table of rows that all have `label`.
+
+        The table uses the row layout of the Parquet files (`_id`, `labels`,
+        `properties` for nodes; `from`, `to`, `label`, `properties` for edges)
+        and is cast to the label's schema, which is taken from this table if
+        the label has none yet.
+        """
+        self._flush_label(label)
+        offset = 0
+        while offset < table.num_rows:
+            n = table.num_rows - offset
+            if self.shard_records:
+                n = min(n, self.shard_records - self._file_records.get(label, 0))
+            part = table.slice(offset, n)
+            writer = self._writers.get(label)
+            schema = _pin_types(part.schema) if writer is None else writer.schema
+            self._write_table(label, _conform(part, label, schema))
+            self.records += n
+            offset += n
+
+    def _write_table(self, label, table):
+        writer = self._writer(label, table.schema)
+        writer.write_table(table, row_group_size=self.row_group_size)
+        self._file_records[label] += table.num_rows
+        if (self.shard_records and self._file_records[label] >= self.shard_records) or (
+            self.shard_bytes and os.path.getsize(self._paths[label]) >= self.shard_bytes
+        ):
+            self._close_file(label)
+
+    def flush(self):
+        for label in list(self._buffers):
+            self._flush_label(label)
+
+    def close(self):
+        self.flush()
+        for label in list(self._writers):
+            self._close_file(label)
+
+
+def _parquet_files(path):
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, f) for f in os.listdir(path) if f.endswith(".parquet")
+        )
+    return [path]
+
+
+def read_parquet_tables(path, columns=None):
+    """
+    Read the label tables of a Parquet node or edge directory.
+
+    Args:
+        path (str): A directory written by ParquetStream, or a single table file.
+        columns (list, optional): Columns to read, e.g. ['_id', 'properties'].
+
+    Returns:
+        dict: Mapping of file path to pyarrow.Table.
+    """
+    return {f: pq.read_table(f, columns=columns) for f in _parquet_files(path)}
+
+
+def iter_parquet_records(path, batch_size=65536):
+    """
+    Iterate over the records of a Parquet node or edge directory as data pack dicts.
+
+    Null properties are dropped, and pinned float32 values come back as the
+    nearest Python float.
+
+    Args:
+        path (str): A directory written by ParquetStream, or a single table file.
+        batch_size (int, optional): Rows decoded at a time. Defaults to 65536.
+
+    Yields:
+        dict: Node records ({"_id", "labels", "properties"}) or edge records
+        ({"from": {"uuid"}, "to": {"uuid"}, "label", "properties"}).
+    """
+    for f in _parquet_files(path):
+        for batch in pq.ParquetFile(f).iter_batches(batch_size=batch_size):
+            for row in batch.to_pylist():
+                yield _from_row(row)
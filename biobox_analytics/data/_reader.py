@@ -0,0 +1,91 @@
+"""
+BioBox data pack readers
+
+Stream the records of a data pack written by DataPackWriter, shard by
+shard, whatever its format.
+"""
+
+import os
+import gzip
+import json
+from biobox_analytics.data._manifest import load_manifest, MANIFEST_FILENAME
+from biobox_analytics.data._parquet import iter_parquet_records
+from biobox_analytics.data._records import is_edge
+
+_JSONL_SUFFIXES = (".jsonl.gz", ".json.gz", ".jsonl", ".json")
+
+
+def pack_shards(directory, kind=None, include_removed=False):
+    """
+    List the shards of the data pack in `directory`.
+
+    Shards are taken from the pack's manifest. Without a manifest every jsonl
+    file in the directory and every Parquet table directory is a shard of
+    unknown kind.
+
+    Args:
+        directory (str): Directory holding the data pack.
+        kind (str, optional): Only list 'node' or 'edge' shards (and shards of unknown kind).
+        include_removed (bool, optional): Include the removed-record shards of a delta pack. Defaults to False.
+
+    Returns:
+        list: Dicts with `path` (absolute), `format` and `kind` (None when unknown).
+    """
+    if os.path.exists(os.path.join(directory, MANIFEST_FILENAME)):
+        shards = []
+        for entry in load_manifest(directory)["shards"]:
+            if entry.get("delta") == "removed" and not include_removed:
+                continue
+            if kind is not None and entry["kind"] != kind:
+                continue
+            shard = dict(entry)
+            shard["path"] = os.path.join(directory, entry["path"])
+            shards.append(shard)
+        return shards
+    shards = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if name.endswith(_JSONL_SUFFIXES):
+            shards.append({"path": path, "format": "jsonl.gz" if name.endswith(".gz") else "jsonl", "kind": None})
+        elif os.path.isdir(path) and any(f.endswith(".parquet") for f in os.listdir(path)):
+            shards.append({"path": path, "format": "parquet", "kind": None})
+    return shards
+
+
+def iter_shard_records(path, format=None):
+    """
+    Iterate over the records of a single shard.
+
+    Args:
+        path (str): A jsonl(.gz) file, or a Parquet table file or directory.
+        format (str, optional): 'jsonl.gz', 'jsonl' or 'parquet'. Guessed from the path by default.
+
+    Yields:
+        dict: Node or edge records.
+    """
+    if format == "parquet" or (format is None and (path.endswith(".parquet") or os.path.isdir(path))):
+        yield from iter_parquet_records(path)
+        return
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_pack_records(directory, kind=None, include_removed=False):
+    """
+    Iterate over the records of a data pack.
+
+    Args:
+        directory (str): Directory holding the data pack.
+        kind (str, optional): Only yield 'node' or 'edge' records.
+        include_removed (bool, optional): Include the removed records of a delta pack. Defaults to False.
+
+    Yields:
+        dict: Node or edge records, shard by shard.
+    """
+    for shard in pack_shards(directory, kind=kind, include_removed=include_removed):
+        for record in iter_shard_records(shard["path"], shard.get("format")):
+            if kind is None or shard["kind"] is not None or is_edge(record) == (kind == "edge"):
+                yield record
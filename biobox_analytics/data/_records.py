@@ -0,0 +1,55 @@
+"""
+BioBox data pack records
+
+Helpers shared by the data pack writers and readers for looking at node
+records ({"_id", "labels", "properties"}) and edge records
+({"from": {"uuid"}, "to": {"uuid"}, "label", "properties"}).
+"""
+
+import itertools
+
+
+def is_edge(record):
+    """Return True if `record` is an edge."""
+    return "from" in record
+
+
+def record_label(record):
+    """Return the label of an edge, or the most specific (last) label of a node."""
+    if "from" in record:
+        return record["label"]
+    return record["labels"][-1]
+
+
+def record_id(record):
+    """
+    Return the id a record is looked up by.
+
+    Nodes are identified by `_id` (or `id`, as written by ChipSeqAdapter) and
+    edges by the uuid of their source node.
+    """
+    if "from" in record:
+        return record["from"]["uuid"]
+    return record.get("_id", record.get("id"))
+
+
+def record_key(record):
+    """
+    Return the key that identifies a record within a data pack.
+
+    Nodes are keyed by id; edges by source uuid, label and target uuid, so
+    parallel edges with different labels are distinct.
+    """
+    if "from" in record:
+        return f"{record['from']['uuid']}\x1f{record['label']}\x1f{record['to']['uuid']}"
+    return record.get("_id", record.get("id"))
+
+
+def batched(iterable, n):
+    """Yield lists of up to `n` consecutive items of `iterable`."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, n))
+        if not batch:
+            return
+        yield batch
@@ -0,0 +1,97 @@
+"""
+BioBox data pack validation
+
+Checks the referential integrity of a data pack: every edge endpoint must be
+the id of a node in the pack (or in the packs it is validated against).
+"""
+
+import math
+from collections import Counter, defaultdict
+import numpy as np
+from biobox_analytics.data._index import hash_ids
+from biobox_analytics.data._manifest import load_manifest
+from biobox_analytics.data._reader import iter_pack_records
+from biobox_analytics.data._records import record_id, batched
+
+
+def _node_hashes(directories, partitions, partition, budget):
+    chunks = []
+    size = 0
+    for directory in directories:
+        for batch in batched(iter_pack_records(directory, kind="node"), 65536):
+            hashes = hash_ids(record_id(x) for x in batch)
+            if partitions > 1:
+                hashes = hashes[hashes % np.uint64(partitions) == partition]
+            chunks.append(hashes)
+            size += hashes.nbytes
+            if 2 * size > budget:
+                return None
+    hashes = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.uint64)
+    return np.unique(hashes)
+
+
+def validate_pack(directory, node_directories=(), memory_budget=1 << 30, max_examples=10, batch_size=65536):
+    """
+    Report edges whose endpoints are not nodes of the pack.
+
+    Node ids are streamed into sorted arrays of 64-bit hashes, then edges are
+    streamed and their endpoints looked up in batches. If the ids do not fit
+    in `memory_budget` they are split by hash into partitions, and nodes and
+    edges are streamed once per partition.
+
+    Args:
+        directory (str): Directory of the data pack to validate.
+        node_directories (list, optional): Other packs whose nodes edges may point at, e.g. the genome pack
+            for a ChIP-seq pack.
+        memory_budget (int, optional): Bytes allowed for the node id index. Defaults to 1 GiB.
+        max_examples (int, optional): Dangling uuids kept per edge label and endpoint. Defaults to 10.
+        batch_size (int, optional): Edges looked up at a time. Defaults to 65536.
+
+    Returns:
+        dict: {"nodes": ..., "edges": ..., "dangling": {label: {"from": n, "to": n}},
+        "examples": {label: {"from": [...], "to": [...]}}, "valid": bool}
+    """
+    directories = [directory] + list(node_directories)
+    node_count = sum(
+        s["records"] for d in directories for s in load_manifest(d)["shards"]
+        if s["kind"] == "node" and s.get("delta") != "removed"
+    )
+    partitions = max(1, math.ceil(2 * 8 * node_count / memory_budget))
+    dangling = defaultdict(Counter)
+    examples = defaultdict(lambda: {"from": [], "to": []})
+    nodes = edges = 0
+    partition = 0
+    while partition < partitions:
+        known = _node_hashes(directories, partitions, partition, memory_budget)
+        if known is None:
+            # The manifest undercounted (or there is none): split further and start over
+            partitions *= 2
+            partition = 0
+            dangling.clear()
+            examples.clear()
+            nodes = edges = 0
+            continue
+        nodes += len(known)
+        for batch in batched(iter_pack_records(directory, kind="edge"), batch_size):
+            if partition == 0:
+                edges += len(batch)
+            for side in ("from", "to"):
+                uuids = [x[side]["uuid"] for x in batch]
+                hashes = hash_ids(uuids)
+                mine = hashes % np.uint64(partitions) == partition
+                idx = np.minimum(np.searchsorted(known, hashes), max(len(known) - 1, 0))
+                found = known[idx] == hashes if len(known) else np.zeros(len(batch), dtype=bool)
+                for i in np.flatnonzero(mine & ~found):
+                    label = batch[i]["label"]
+                    dangling[label][side] += 1
+                    if len(examples[label][side]) < max_examples:
+                        examples[label][side].append(uuids[i])
+        partition += 1
+    return {
+        "nodes": nodes,
+        "edges": edges,
+        "partitions": partitions,
+        "dangling": {label: dict(counts) for label, counts in dangling.items()},
+        "examples": {label: ex for label, ex in examples.items()},
+        "valid": not dangling,
+    }
@@ -0,0 +1,507 @@
+"""
+BioBox Data Pack Writer
+"""
+
+import os
+import json
+import itertools
+from collections import Counter
+import numpy as np
+from biobox_analytics.data._bgzf import BlockGzipWriter
+from biobox_analytics.data._parquet import ParquetStream
+from biobox_analytics.data._records import record_label, record_id, record_key, batched
+from biobox_analytics.data._index import IndexBuilder, INDEX_SUFFIX, hash_ids
+from biobox_analytics.data._dedupe import DiskHashSet
+from biobox_analytics.data._manifest import update_manifest, file_sha256
+from biobox_analytics.data._delta import HashWriter, DeltaState, HASHES_SUFFIX, content_hashes, iter_removed
+
+FORMATS = ("jsonl", "parquet")
+
+
+def _stem(path):
+    """Strip data pack extensions, e.g. 'out/node.jsonl.gz' -> 'out/node'."""
+    for ext in (".gz", ".jsonl", ".json", ".parquet"):
+        if path.endswith(ext):
+            path = path[:-len(ext)]
+    return path
+
+
+def _shard_path(path, n):
+    """Insert a shard number before the extensions, e.g. 'node.jsonl.gz' -> 'node-00002.jsonl.gz'."""
+    stem = _stem(path)
+    return f"{stem}-{n:05d}{path[len(stem):]}"
+
+
+def _next_shard(path, n=0):
+    while os.path.exists(_shard_path(path, n)):
+        n += 1
+    return n
+
+
+class _JsonlStream:
+    """
+    A single buffered, block-compressed jsonl output stream.
+
+    Serialized lines are accumulated in memory and handed to the compressor in
+    blocks of roughly `block_size` bytes, so the file is opened once and every
+    record does not pay for its own `write` call. Blocks always end on a line
+    end and are compressed as independent gzip members.
+
+    When `shard_records` or `shard_bytes` is set the stream rolls over to a
+    new numbered file once the current one holds that many records or
+    compressed bytes. Finished files are described in `shards`.
+
+    With `index` set, a sidecar offset index is written next to every shard
+    (see `biobox_analytics.data._index`).
+    """
+
+    def __init__(self, path, compresslevel=6, block_size=1 << 22, threads=1, shard_records=None, shard_bytes=None, index=False):
+        self.path = path
+        self.compresslevel = compresslevel
+        self.block_size = block_size
+        self.threads = threads
+        self.shard_records = shard_records
+        self.shard_bytes = shard_bytes
+        self.index = index
+        self.records = 0
+        self.bytes = 0
+        self.shards = []
+        self._shard_number = 0
+        self._handle = None
+        self._index = IndexBuilder() if index else None
+        self._block_number = 0
+        self._labels = Counter()
+        self._shard_record_count = 0
+        self._shard_byte_count = 0
+        self._buffer = []
+        self._buffered = 0
+
+    @property
+    def sharded(self):
+        return bool(self.shard_records or self.shard_bytes)
+
+    def write(self, objs):
+        for x in objs:
+            line = (json.dumps(x) + "\n").encode("utf-8")
+            if self._index is not None:
+                self._index.add(record_id(x), self._block_number, self._buffered, len(line) - 1)
+            self._buffer.append(line)
+            self._buffered += len(line)
+            self._labels[record_label(x)] += 1
+            self._shard_record_count += 1
+            self._shard_byte_count += len(line)
+            self.records += 1
+            self.bytes += len(line)
+            if self._buffered >= self.block_size or (
+                self.shard_records and self._shard_record_count >= self.shard_records
+            ):
+                self.flush()
+
+    def room(self):
+        """Records that still fit in the current shard, or None when unsharded by count."""
+        if not self.shard_records:
+            return None
+        return self.shard_records - self._shard_record_count
+
+    def write_serialized(self, data, records, labels):
+        """
+        Write `records` lines that are already serialized into the newline-terminated `data`.
+
+        Args:
+            data (bytes): The jsonl lines, UTF-8 encoded.
+            records (int): Number of lines in `data`.
+            labels (Counter): Record count per label.
+        """
+        self._buffer.append(data)
+        self._buffered += len(data)
+        self._labels.update(labels)
+        self._shard_record_count += records
+        self._shard_byte_count += len(data)
+        self.records += records
+        self.bytes += len(data)
+        if self._buffered >= self.block_size or (
+            self.shard_records and self._shard_record_count >= self.shard_records
+        ):
+            self.flush()
+
+    def _open(self):
+        path = self.path
+        if self.sharded:
+            self._shard_number = _next_shard(self.path, self._shard_number)
+            path = _shard_path(self.path, self._shard_number)
+        self._handle = BlockGzipWriter(path, compresslevel=self.compresslevel, threads=self.threads)
+
+    def flush(self):
+        if not self._buffer:
+            return
+        if self._handle is None:
+            self._open()
+        data = b"".join(self._buffer)
+        self._handle.write_block(data)
+        self._block_number += 1
+        self._buffer = []
+        self._buffered = 0
+        if (self.shard_records and self._shard_record_count >= self.shard_records) or (
+            self.shard_bytes and self._handle.size - self._handle.start_offset >= self.shard_bytes
+        ):
+            self._close_shard()
+
+    def _close_shard(self):
+        handle = self._handle
+        handle.close()
+        shard = {
+            "path": handle.path,
+            "format": "jsonl.gz",
+            "records": self._shard_record_count,
+            "bytes": handle.size,
+            "uncompressed_bytes": self._shard_byte_count,
+            "labels": dict(self._labels),
+            "appended": handle.start_offset > 0,
+        }
+        if not shard["appended"]:
+            # Appended files are hashed by DataPackWriter.close, only if a manifest is written
+            shard["sha256"] = handle.hexdigest()
+        if self._index is not None:
+            shard["index"] = handle.path + INDEX_SUFFIX
+            self._index.write(shard["index"], handle.block_offsets)
+            self._index = IndexBuilder()
+        self.shards.append(shard)
+        self._handle = None
+        self._block_number = 0
+        self._labels = Counter()
+        self._shard_record_count = 0
+        self._shard_byte_count = 0
+
+    def close(self):
+        self.flush()
+        if self._handle is not None:
+            self._close_shard()
+
+
+class DataPackWriter:
+    """
+    Streaming writer for the node and edge files of a data pack.
+
+    One handle is kept open per stream for the lifetime of the writer, and
+    serialized records are buffered into large blocks before compression.
+    Streams are opened lazily, so a writer that only receives nodes never
+    touches the edge file. Files are opened in append mode, matching the
+    behaviour of the adapters' `append_to_file`.
+
+    Output is block-compressed: each block is an independent gzip member that
+    ends on a line end, so the files stay readable by any gzip reader while
+    blocks can be compressed on several threads and later read in parallel
+    (see `biobox_analytics.data._bgzf`).
+
+    Setting `shard_records` or `shard_bytes` splits each stream into numbered
+    shards (`node-00000.jsonl.gz`, `node-00001.jsonl.gz`, ...) and writes a
+    `manifest.json` to `directory` describing every shard, so that a loader
+    can ingest them in parallel.
+
+    With `index=True` every jsonl shard gets a sidecar offset index, and
+    `DataPackIndex` can then fetch records by id without a full scan.
+
+    With `dedupe=True` records whose key (node id, or edge source, label and
+    target) was already written by this writer are dropped, using a
+    disk-backed hash set so memory stays bounded for hundreds of millions of
+    keys; the number dropped is reported in `stats`. With `seen_dir` the hash
+    set is kept in that directory instead, so writers that share it, in this
+    run or later ones, also drop keys that the others wrote. Keys are compared by
+    64-bit hash, so at 1e8 distinct keys there is a ~1e-4 chance that one
+    record is dropped by a collision.
+
+    With `hashes=True` a (key hash, content hash) pair is stored for every
+    record, and with `base` set to the directory of such a pack the writer
+    produces a delta: only records that were added or changed since `base`
+    are written, and base records whose keys were not written again go to a
+    `<stem>-removed.jsonl.gz` shard. Removals are only computed for the
+    streams this writer wrote to. Removed records are copied from the base
+    pack's shards, so the base should be a full build rather than another
+    delta.
+
+    With `format="parquet"` each stream is instead a directory named after the
+    file's stem (e.g. `node/`) holding one Parquet table per label; see
+    `biobox_analytics.data._parquet` for the layout and the matching reader.
+
+    Usage:
+        with DataPackWriter("node.jsonl.gz", "edge.jsonl.gz", compresslevel=3) as writer:
+            writer.write_nodes(nodes)
+            writer.write_edges(edges)
+        print(writer.stats)
+
+    Args:
+        node_filename (str, optional): File that nodes are written to. Defaults to 'node.jsonl.gz'.
+        edge_filename (str, optional): File that edges are written to. Defaults to 'edge.jsonl.gz'.
+        directory (str, optional): Directory the files are placed in. Defaults to the working directory.
+        compresslevel (int, optional): gzip compression level, 1 (fastest) to 9 (smallest). Defaults to 6.
+        block_size (int, optional): Number of uncompressed bytes buffered before a block is compressed. Defaults to 4 MiB.
+        threads (int, optional): Number of threads compressing blocks. None uses every core. Defaults to 1.
+        format (str, optional): 'jsonl' for block-compressed jsonl or 'parquet' for columnar tables. Defaults to 'jsonl'.
+        row_group_size (int, optional): Rows per Parquet row group. Defaults to 131072.
+        shard_records (int, optional): Roll over to a new shard after this many records.
+        shard_bytes (int, optional): Roll over to a new shard after this many compressed bytes.
+        manifest (bool, optional): Whether to write manifest.json on close. Defaults to writing one only for sharded output.
+        index (bool, optional): Write an offset index next to every jsonl shard. Defaults to False.
+        dedupe (bool, optional): Drop records whose key was already written. Defaults to False.
+        bloom_capacity (int, optional): Expected number of distinct keys; enables a Bloom filter in front of
+            the dedupe hash set. Defaults to None.
+        tmp_dir (str, optional): Directory for temporary files such as the dedupe hash set. Defaults to the system temp directory.
+        seen_dir (str, optional): Directory of a persistent dedupe hash set shared across writers and runs; enables
+            dedupe. Writers sharing it must not be open at the same time. Defaults to None.
+        hashes (bool, optional): Store content hashes of every record so the pack can be a delta base. Defaults to False.
+        base (str, optional): Directory of a previous pack written with hashes; only the difference to it is written.
+    """
+
+    def __init__(
+        self,
+        node_filename='node.jsonl.gz',
+        edge_filename='edge.jsonl.gz',
+        directory="",
+        compresslevel=6,
+        block_size=1 << 22,
+        threads=1,
+        format="jsonl",
+        row_group_size=1 << 17,
+        shard_records=None,
+        shard_bytes=None,
+        manifest=None,
+        index=False,
+        dedupe=False,
+        bloom_capacity=None,
+        tmp_dir=None,
+        seen_dir=None,
+        hashes=False,
+        base=None,
+    ):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown data pack format '{format}', expected one of {FORMATS}")
+        if index and format != "jsonl":
+            raise ValueError("Offset indexes are only written for the jsonl format")
+        self.directory = directory
+        self.format = format
+        self.row_group_size = row_group_size
+        self.compresslevel = compresslevel
+        self.block_size = block_size
+        self.threads = threads
+        self.shard_records = shard_records
+        self.shard_bytes = shard_bytes
+        self.hashes = hashes or base is not None
+        self.base = base
+        self.manifest = bool(shard_records or shard_bytes or self.hashes) if manifest is None else manifest
+        self.index = index
+        self.dedupe = dedupe or seen_dir is not None
+        self.seen_dir = seen_dir
+        self.bloom_capacity = bloom_capacity
+        self.tmp_dir = tmp_dir
+        self.manifest_entries = []
+        self._seen = {}
+        self._duplicates = Counter()
+        self._hash_writers = {}
+        self._deltas = {}
+        self._filenames = {"node": node_filename, "edge": edge_filename}
+        self._streams = {}
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _stream(self, kind):
+        stream = self._streams.get(kind)
+        if stream is None:
+            filename = self._filenames[kind]
+            if filename is None:
+                raise ValueError(f"No {kind} file was configured for this writer")
+            path = os.path.join(self.directory, filename)
+            if self.format == "parquet":
+                stream = ParquetStream(
+                    _stem(path),
+                    row_group_size=self.row_group_size,
+                    shard_records=self.shard_records,
+                    shard_bytes=self.shard_bytes,
+                )
+            else:
+                stream = _JsonlStream(
+                    path,
+                    compresslevel=self.compresslevel,
+                    block_size=self.block_size,
+                    threads=self.threads,
+                    shard_records=self.shard_records,
+                    shard_bytes=self.shard_bytes,
+                    index=self.index,
+                )
+            self._streams[kind] = stream
+        return stream
+
+    def _write(self, kind, objs):
+        stream = self._stream(kind)
+        if not (self.dedupe or self.hashes):
+            stream.write(objs)
+            return
+        for batch in batched(objs, 8192):
+            keys = hash_ids(record_key(x) for x in batch)
+            if self.dedupe:
+                mask = self._seen_keys(kind).add_new(keys)
+                self._duplicates[kind] += len(batch) - int(mask.sum())
+            else:
+                mask = np.ones(len(batch), dtype=bool)
+            if self.hashes:
+                contents = content_hashes(itertools.compress(batch, mask))
+                self._hash_writer(kind).write(keys[mask], contents)
+                if self.base is not None:
+                    mask[mask] = self._delta(kind).classify(keys[mask], contents)
+            stream.write(itertools.compress(batch, mask))
+
+    def _seen_keys(self, kind):
+        seen = self._seen.get(kind)
+        if seen is None:
+            path = os.path.join(self.seen_dir, kind) if self.seen_dir is not None else None
+            seen = self._seen[kind] = DiskHashSet(self.tmp_dir, bloom_capacity=self.bloom_capacity, path=path)
+        return seen
+
+    def _hash_writer(self, kind):
+        writer = self._hash_writers.get(kind)
+        if writer is None:
+            path = _stem(os.path.join(self.directory, self._filenames[kind])) + HASHES_SUFFIX
+            writer = self._hash_writers[kind] = HashWriter(path)
+        return writer
+
+    def _delta(self, kind):
+        delta = self._deltas.get(kind)
+        if delta is None:
+            delta = self._deltas[kind] = DeltaState(self.base, kind)
+        return delta
+
+    def write_nodes(self, objs):
+        """Write an iterable of node records to the node stream."""
+        self._write("node", objs)
+
+    def write_edges(self, objs):
+        """Write an iterable of edge records to the edge stream."""
+        self._write("edge", objs)
+
+    def write_frame(self, frame, kind=None, batch_size=1 << 16):
+        """
+        Write a Polars DataFrame of records in bulk.
+
+        The frame has one column per top-level record key: `_id`, `labels`
+        (list of str) and a `properties` struct for nodes, or `from` and `to`
+        structs with a `uuid` field, `label` and an optional `properties`
+        struct for edges. Rows are serialized by Polars, as NDJSON for the
+        jsonl format or through Arrow for Parquet, without building a dict
+        per record. With dedupe, hashes or an offset index enabled the rows
+        are converted to dicts and written like any other records.
+
+        Args:
+            frame (polars.DataFrame): The records.
+            kind (str, optional): 'node' or 'edge'. Defaults to 'edge' if the frame has a `from` column.
+            batch_size (int, optional): Rows serialized at a time. Defaults to 65536.
+        """
+        kind = kind or ("edge" if "from" in frame.columns else "node")
+        if self.dedupe or self.hashes or self.index:
+            for offset in range(0, frame.height, batch_size):
+                self._write(kind, frame.slice(offset, batch_size).to_dicts())
+            return
+        stream = self._stream(kind)
+        if kind == "edge":
+            labels = frame.get_column("label")
+        else:
+            labels = frame.get_column("labels").list.last()
+        if self.format == "parquet":
+            if kind == "edge":
+                frame = frame.with_columns(
+                    frame.get_column("from").struct.field("uuid").alias("from"),
+                    frame.get_column("to").struct.field("uuid").alias("to"),
+                )
+            for label, part in frame.with_columns(labels.alias("__label")).group_by("__label", maintain_order=True):
+                label = label[0] if isinstance(label, tuple) else label
+                stream.write_table(label, part.drop("__label").to_arrow())
+            return
+        offset = 0
+        while offset < frame.height:
+            room = stream.room()
+            n = batch_size if room is None else min(batch_size, room)
+            part = frame.slice(offset, n)
+            stream.write_serialized(part.write_ndjson().encode("utf-8"), part.height, Counter(labels.slice(offset, n).to_list()))
+            offset += part.height
+
+    def write(self, obj):
+        """Write a single record, routing it to the edge stream if it has a `from` endpoint."""
+        if "from" in obj:
+            self.write_edges([obj])
+        else:
+            self.write_nodes([obj])
+
+    def records_written(self, kind):
+        """Number of records written to the `node` or `edge` stream so far."""
+        stream = self._streams.get(kind)
+        return 0 if stream is None else stream.records
+
+    @property
+    def stats(self):
+        """
+        Records and bytes written per stream.
+
+        Bytes are uncompressed jsonl bytes, or the on-disk size of the tables
+        once the writer is closed for the Parquet format.
+
+        Returns:
+            dict: e.g. {"node": {"path": ..., "records": 10, "bytes": 1234}, "edge": {...}},
+            with a "duplicates" count per stream when dedupe is enabled.
+        """
+        stats = {}
+        for kind, stream in self._streams.items():
+            stats[kind] = {"path": stream.path, "records": stream.records, "bytes": stream.bytes}
+            if self.dedupe:
+                stats[kind]["duplicates"] = self._duplicates[kind]
+            if kind in self._deltas:
+                stats[kind]["delta"] = dict(self._deltas[kind].counts)
+        return stats
+
+    def flush(self):
+        for stream in self._streams.values():
+            stream.flush()
+
+    def close(self):
+        """Close every stream and, if enabled, record their shards in the manifest."""
+        if self._closed:
+            return
+        self._closed = True
+        root = self.directory or "."
+        for seen in self._seen.values():
+            seen.close()
+        streams = list(self._streams.items())
+        for kind, delta in self._deltas.items():
+            removed = _JsonlStream(
+                _stem(os.path.join(self.directory, self._filenames[kind])) + "-removed.jsonl.gz",
+                compresslevel=self.compresslevel,
+                block_size=self.block_size,
+            )
+            removed.write(iter_removed(self.base, kind, delta.removed_keys()))
+            removed.delta = "removed"
+            streams.append((kind, removed))
+        for kind, stream in streams:
+            stream.close()
+            for shard in stream.shards:
+                entry = {"kind": kind}
+                entry.update(shard)
+                entry["path"] = os.path.relpath(shard["path"], root)
+                if self.manifest and "sha256" not in entry:
+                    entry["sha256"] = file_sha256(shard["path"])
+                if "index" in shard:
+                    entry["index"] = os.path.relpath(shard["index"], root)
+                if getattr(stream, "delta", None):
+                    entry["delta"] = stream.delta
+                self.manifest_entries.append(entry)
+        hashes = []
+        for kind, writer in self._hash_writers.items():
+            writer.close()
+            hashes.append({"kind": kind, "path": os.path.relpath(writer.path, root), "records": writer.records})
+        delta = None
+        if self._deltas:
+            delta = {"base": os.path.abspath(self.base)}
+            delta.update({kind: dict(d.counts) for kind, d in self._deltas.items()})
+        if self.manifest and (self.manifest_entries or hashes):
+            update_manifest(root, self.manifest_entries, hashes=hashes, delta=delta)
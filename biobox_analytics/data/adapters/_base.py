@@ -1,5 +1,7 @@
 import json
+import contextlib
 from abc import ABC, abstractmethod
+from biobox_analytics.data._writer import DataPackWriter
 
 
 class Adapter(ABC):
@@ -39,6 +41,33 @@ class Adapter(ABC):
         """Initialize the Adapter. This method can be overridden by subclasses if needed."""
         pass
 
+    def open_writer(self, directory="", **kwargs):
+        """
+        Open a DataPackWriter on this adapter's node and edge files.
+
+        A single writer can be shared across `iterate_nodes` and `iterate_edges`
+        so that each file is opened once for the whole build.
+
+        Parameters:
+            directory: Directory the node and edge files are written to.
+            **kwargs: Extra options passed to DataPackWriter, e.g. compresslevel.
+
+        Returns:
+            DataPackWriter: The writer, to be used as a context manager.
+        """
+        return DataPackWriter(
+            node_filename=self.node_filename,
+            edge_filename=self.edge_filename,
+            directory=directory,
+            **kwargs
+        )
+
+    def _use_writer(self, writer=None):
+        """Return a context yielding `writer`, or a new writer that is closed on exit if none was given."""
+        if writer is not None:
+            return contextlib.nullcontext(writer)
+        return self.open_writer()
+
     def describe(self):
         """
         Describe the properties of nodes and edges.
@@ -0,0 +1,129 @@
+"""
+Cell x feature edges straight from sparse count matrices
+
+The non-zero entries of each block of cells are read from the CSR
+`indptr`/`indices`/`data` arrays and turned into a Polars frame of edges by
+gathering cell and feature ids, so the matrix is never densified and no
+Python object is built per entry. Frames go to `DataPackWriter.write_frame`.
+
+For AnnData files opened with `backed='r'` the row blocks can be aligned to
+the HDF5 chunks of the stored matrix, so each chunk is read from disk once
+and memory is bounded by the block rather than the matrix.
+"""
+
+import h5py
+import numpy as np
+import polars as pl
+import scipy.sparse
+
+
+def cell_ids(obs, library_col):
+    """
+    Ids of the CellBarcode nodes of an AnnData, `{library}:{barcode}`.
+
+    Args:
+        obs (pandas.DataFrame): The AnnData's obs, indexed by barcode.
+        library_col (str): Column with the library (experiment) id.
+
+    Returns:
+        polars.Series: One id per cell, in obs order.
+    """
+    frame = pl.DataFrame({
+        "library": obs[library_col].astype(str).to_numpy(),
+        "barcode": obs.index.astype(str).to_numpy(),
+    })
+    return frame.select(pl.concat_str(["library", "barcode"], separator=":")).to_series()
+
+
+def matrix_edge_frame(block, cells, features, label, value_name):
+    """
+    Edges from every cell to every feature with a positive value in `block`.
+
+    Args:
+        block: Rows of the matrix, sparse or dense; converted to CSR.
+        cells (polars.Series): Ids of the block's rows.
+        features (polars.Series): Ids of the matrix columns.
+        label (str): Edge label, e.g. 'expresses'.
+        value_name (str): Edge property holding the value, e.g. 'normValue'.
+
+    Returns:
+        polars.DataFrame: The edges, cell by cell in feature order.
+    """
+    block = scipy.sparse.csr_matrix(block)
+    rows = np.repeat(np.arange(block.shape[0], dtype=np.int64), np.diff(block.indptr))
+    keep = block.data > 0
+    return pl.DataFrame({
+        "from": cells.gather(rows[keep]),
+        "to": features.gather(block.indices[keep].astype(np.int64)),
+        "value": block.data[keep].astype(np.float64),
+    }).select(
+        pl.struct(pl.col("from").alias("uuid")).alias("from"),
+        pl.struct(pl.col("to").alias("uuid")).alias("to"),
+        pl.lit(label).alias("label"),
+        pl.struct(pl.col("value").alias(value_name)).alias("properties"),
+    )
+
+
+def chunk_aligned_bounds(stored, batch_rows=10000, batch_bytes=1 << 26):
+    """
+    Row boundaries of blocks that follow the HDF5 chunking of a stored matrix.
+
+    A dense matrix is split into blocks of at most `batch_bytes`, whatever
+    its width, on multiples of its chunk height when a chunk fits. A CSR matrix,
+    stored as `data`, `indices` and `indptr` arrays, is split where its
+    non-zeros cross multiples of the chunk length of `data`, with each block
+    holding about as many non-zeros as `batch_rows` average rows. Only
+    `indptr` is read. Other layouts, such as CSC, fall back to plain blocks
+    of `batch_rows` rows.
+
+    Args:
+        stored: The h5py Dataset (dense) or Group (CSR) of the matrix, e.g. adata.file["X"] of a backed AnnData.
+        batch_rows (int, optional): Target rows per block of a sparse matrix. Defaults to 10000.
+        batch_bytes (int, optional): Maximum bytes per block of a dense matrix. Defaults to 64 MiB.
+
+    Returns:
+        list: Increasing row boundaries, starting at 0 and ending at the number of rows.
+    """
+    if isinstance(stored, h5py.Dataset):
+        n = stored.shape[0]
+        row_bytes = max(1, int(np.prod(stored.shape[1:], dtype=np.int64)) * stored.dtype.itemsize)
+        step = max(1, batch_bytes // row_bytes)
+        height = stored.chunks[0] if stored.chunks else 1
+        if step >= height:
+            step = step // height * height
+        return list(range(0, n, step)) + [n]
+    if stored.attrs.get("encoding-type") != "csr_matrix":
+        n = stored.attrs["shape"][0]
+        return list(range(0, n, batch_rows)) + [n]
+    indptr = stored["indptr"][:]
+    n, nnz = len(indptr) - 1, int(indptr[-1])
+    chunk = stored["data"].chunks[0] if stored["data"].chunks else 1
+    target = max(chunk, -(-nnz * batch_rows // max(n, 1)) // chunk * chunk)
+    bounds = np.searchsorted(indptr, np.arange(target, nnz, target), side="right") - 1
+    bounds = np.unique(np.concatenate([[0], bounds, [n]]))
+    return bounds.tolist()
+
+
+def iter_matrix_edge_frames(matrix, cells, features, label, value_name, batch_rows=10000, bounds=None):
+    """
+    Stream `matrix_edge_frame` over blocks of `batch_rows` cells.
+
+    Args:
+        matrix: The cells x features matrix, e.g. AnnData.X.
+        cells (polars.Series): Ids of the matrix rows.
+        features (polars.Series): Ids of the matrix columns.
+        label (str): Edge label.
+        value_name (str): Edge property holding the value.
+        batch_rows (int, optional): Cells per frame. Defaults to 10000.
+        bounds (list, optional): Row boundaries of the blocks, e.g. from `chunk_aligned_bounds`, instead of batch_rows.
+
+    Yields:
+        tuple: (first row, last row + 1, polars.DataFrame of edges).
+    """
+    n = matrix.shape[0]
+    if bounds is None:
+        bounds = list(range(0, n, batch_rows)) + [n]
+    for low, high in zip(bounds, bounds[1:]):
+        if high == low:
+            continue
+        yield low, high, matrix_edge_frame(matrix[low:high], cells.slice(low, high - low), features, label, value_name)
@@ -1,10 +1,8 @@
 from biobox_analytics.data.adapters._base import Adapter
+from biobox_analytics.data._writer import DataPackWriter
 import biobox_analytics.data.adapters.chipseq._structs as structs
 import pandas as pd
-import math
-import gzip
-import os
-import json
+from biobox_analytics.intervals import interval_id
 from nanoid import generate
 
 class ChipSeqAdapter(Adapter):
@@ -18,6 +16,7 @@ class ChipSeqAdapter(Adapter):
         taxon_id: str = "9601",
         objects_file: str = "objs.jsonl.gz",
         edges_file: str = "edges.jsonl.gz",
+        bin_size: int = 1000,
     ):
         super().__init__()
         self.name = name
@@ -28,6 +27,8 @@ class ChipSeqAdapter(Adapter):
         self.taxon_id = taxon_id
         self.objects_file = objects_file
         self.edges_file = edges_file
+        # Size of the GenomicInterval nodes that peaks are linked to
+        self.bin_size = bin_size
         
         self.chipseq_id = generate()
 
@@ -86,25 +87,24 @@ class ChipSeqAdapter(Adapter):
             }
         }
 
-        range_start = math.floor(chrom_start / 1000) * 1000
+        # BED coordinates are 0-based and half-open: the peak covers bases chrom_start + 1 to chrom_end
         edge_peak_start_on = {
             "label": "peak start on",
             "from": {
                 "uuid": narrow_peak_id
             },
             "to": {
-                "uuid": "{}:{}:{}:{}".format(self.taxon_id, chr, range_start + 1, range_start + 1000)
+                "uuid": interval_id(self.taxon_id, chr, chrom_start + 1, self.bin_size)
             }
         }
 
-        range_end = math.floor(chrom_end / 1000) * 1000
         edge_peak_end_on = {
             "label": "peak end on",
             "from": {
                 "uuid": narrow_peak_id
             },
             "to": {
-                "uuid": "{}:{}:{}:{}".format(self.taxon_id, chr, range_end + 1, range_end + 1000)
+                "uuid": interval_id(self.taxon_id, chr, chrom_end, self.bin_size)
             }
         }
 
@@ -178,28 +178,14 @@ class ChipSeqAdapter(Adapter):
                 # else:
                 #     self.nodes.append(object)
 
-    def write(self):
-        obs_file = os.path.join("", self.objects_file)
-        edges_file = os.path.join("", self.edges_file)
-        with gzip.open(obs_file, "at") as o, gzip.open(edges_file, "at") as e:
+    def write(self, directory="", **kwargs):
+        with DataPackWriter(self.objects_file, self.edges_file, directory=directory, **kwargs) as writer:
             self.pull_data()
             iterator = self.iterate_nodes()
             for object in self.extra_items():
-                # print(object)
-                if "from" in object:
-                    json.dump(object, e)
-                    e.write("\n")
-                else:
-                    json.dump(object, o)
-                    o.write("\n")
+                writer.write(object)
 
             for _, row in iterator:
-                objects = chipseq.process_item(row)
-                for object in objects:
-                    # print(object)
-                    if "from" in object:
-                        json.dump(object, e)
-                        e.write("\n")
-                    else:
-                        json.dump(object, o)
-                        o.write("\n")
+                for object in self.process_item(row):
+                    writer.write(object)
+        return writer.stats
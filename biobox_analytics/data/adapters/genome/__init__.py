@@ -1,68 +1,180 @@
 from biobox_analytics.data.adapters._base import Adapter
+from biobox_analytics.data._writer import DataPackWriter
+from biobox_analytics.data._records import batched
+from biobox_analytics.data._manifest import update_manifest, file_sha256
 import biobox_analytics.data.adapters.genome._structs as structs
+import biobox_analytics.data.adapters.genome._intervals as _intervals
 import json
-import requests
 import os
-import gzip
-import math
-from gtfparse import read_gtf
-import urllib.request
+from biobox_analytics.data.adapters.genome._gtf import load_gtf, GTF_FEATURES, GTF_COLUMNS, GTF_STRUCTURE_FEATURES, GTF_STRUCTURE_COLUMNS
+import polars as pl
+from biobox_analytics.utils import download
+from biobox_analytics.utils._metadata import fetch_json, METADATA_TTL
+import re
+import copy
 import datetime
 import itertools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Exon, CDS and UTR records are emitted in frames of at most this many rows
+STRUCTURE_CHUNK_ROWS = 1 << 18
+
+# build() aims for about this many partitions per worker process, to balance chromosomes of uneven sizes
+PARTITIONS_PER_PROCESS = 4
+
+
+def _part_filename(filename, part):
+    # node.jsonl.gz -> node-<part>.jsonl.gz
+    head, tail = os.path.split(filename)
+    base, dot, ext = tail.partition(".")
+    return os.path.join(head, f"{base}-{re.sub(r'[^A-Za-z0-9_.]', '_', part)}{dot}{ext}")
+
+
+def _build_part(adapter, directory, part, writer_kwargs):
+    # Write the nodes and edges of one partition to its own files, leaving the manifest to the caller
+    adapter.node_filename = _part_filename(adapter.node_filename, part)
+    adapter.edge_filename = _part_filename(adapter.edge_filename, part)
+    with adapter.open_writer(directory, manifest=False, **writer_kwargs) as writer:
+        adapter._write_sections(writer, [s for s in adapter._node_sections() if s[0] != "genome"], "node")
+        adapter._write_sections(writer, adapter._edge_sections(), "edge")
+    root = directory or "."
+    for entry in writer.manifest_entries:
+        # Shards appended to are not hashed by a writer without a manifest
+        if "sha256" not in entry:
+            entry["sha256"] = file_sha256(os.path.join(root, entry["path"]))
+    return writer.manifest_entries
+
 
 class GenomeAdapter(Adapter):
-    def __init__(self, species='homo sapiens', node_filename='node.jsonl.gz', edge_filename='edge.jsonl.gz' ):
+    def __init__(self, species='homo sapiens', node_filename='node.jsonl.gz', edge_filename='edge.jsonl.gz', bin_sizes=(1000,),
+                 taxon=None, assembly_json=None, metadata_ttl=METADATA_TTL, overlap_edges=True,
+                 structure_nodes=False):
+        """
+        The taxon id and the Ensembl assembly info are looked up lazily, the
+        first time they are needed, and the responses are kept in the on-disk
+        metadata cache for `metadata_ttl` seconds.
+
+        Args:
+            species (str, optional): Scientific name of the species. Defaults to 'homo sapiens'.
+            node_filename (str, optional): File that nodes are written to. Defaults to 'node.jsonl.gz'.
+            edge_filename (str, optional): File that edges are written to. Defaults to 'edge.jsonl.gz'.
+            bin_sizes (tuple, optional): GenomicInterval sizes from finest to coarsest. Defaults to (1000,).
+            taxon (int, optional): NCBI taxon id, skipping the ENA lookup.
+            assembly_json (str or dict, optional): An Ensembl /info/assembly response, or a path to one,
+                skipping the Ensembl lookup.
+            metadata_ttl (int, optional): Seconds cached lookups stay fresh. Defaults to 7 days.
+            overlap_edges (bool, optional): Link genes and transcripts to the finest-level GenomicIntervals
+                they overlap with 'overlaps interval' edges. Defaults to True.
+            structure_nodes (bool, optional): Add Exon, CDS and UTR nodes linked to their transcripts with
+                'has exon', 'has CDS' and 'has UTR' edges. Defaults to False.
+        """
         super().__init__()
         self.species = species
-        self.assembly = ""
-        self.karyotypes = ""
-        self.chromosome_regions = []
+        # GenomicInterval levels from finest to coarsest, e.g. (1000, 10000, 100000, 1000000)
+        self.bin_sizes = _intervals.check_bin_sizes(bin_sizes)
         self.nodes = []
         self.edges = []
         self.node_filename = node_filename
         self.edge_filename = edge_filename
         self.current_date_time = str(datetime.datetime.now())
         self._gtfloaded = False
-        self.taxon = self.__get_taxonid()
-        self.__get_ensembl_assembly_info()
-        self.displayName = f"Genome Datapack - {self.species} {self.taxon} ({self.current_date_time})"
+        self.gtf_file_path = "genome.gtf.gz"
         self.description = "Genome Datapack created through Python SDK"
-        self.key = f"genome:{self.taxon}:{self.current_date_time}"
-        # dateCreated = str(datetime.now().isoformat())
-        self.genome = structs.Genome(
-            uuid=f"genome_{self.assembly}",
-            displayName=f"{self.species} - {self.assembly}",
-            species=self.species,
-            taxon=self.taxon,
-            # dateCreated=dateCreated,
-            assembly=self.assembly
-        )
+        self.metadata_ttl = metadata_ttl
+        self.overlap_edges = overlap_edges
+        self.structure_nodes = structure_nodes
+        self._taxon = taxon
+        self._assembly_json = assembly_json
+        self._assembly_info = None
+        self._genome = None
+
+    @property
+    def taxon(self):
+        if self._taxon is None:
+            self._taxon = self.__get_taxonid()
+        return self._taxon
+
+    @taxon.setter
+    def taxon(self, value):
+        self._taxon = value
+
+    @property
+    def assembly(self):
+        return self.__get_ensembl_assembly_info()["assembly"]
+
+    @assembly.setter
+    def assembly(self, value):
+        self.__get_ensembl_assembly_info()["assembly"] = value
+
+    @property
+    def karyotypes(self):
+        return self.__get_ensembl_assembly_info()["karyotypes"]
+
+    @karyotypes.setter
+    def karyotypes(self, value):
+        self.__get_ensembl_assembly_info()["karyotypes"] = value
+
+    @property
+    def chromosome_regions(self):
+        return self.__get_ensembl_assembly_info()["chromosome_regions"]
+
+    @chromosome_regions.setter
+    def chromosome_regions(self, value):
+        self.__get_ensembl_assembly_info()["chromosome_regions"] = value
+
+    @property
+    def displayName(self):
+        return f"Genome Datapack - {self.species} {self.taxon} ({self.current_date_time})"
+
+    @property
+    def key(self):
+        return f"genome:{self.taxon}:{self.current_date_time}"
+
+    @property
+    def genome(self):
+        if self._genome is None:
+            # dateCreated = str(datetime.now().isoformat())
+            self._genome = structs.Genome(
+                uuid=f"genome_{self.assembly}",
+                displayName=f"{self.species} - {self.assembly}",
+                species=self.species,
+                taxon=self.taxon,
+                # dateCreated=dateCreated,
+                assembly=self.assembly
+            )
+        return self._genome
 
     def __get_taxonid(self):
         species = self.species
         # curl request the species name here: curl "https://www.ebi.ac.uk/ena/taxonomy/rest/scientific-name/Leptonycteris%20nivalis"
         url = "https://www.ebi.ac.uk/ena/taxonomy/rest/scientific-name/" + species.replace(" ","%20")
-        r = requests.get(url)
-        r.json()
-        if len(r.json()) == 1:
-            return int(r.json()[0]['taxId'])
+        decoded = fetch_json(url, ttl=self.metadata_ttl)
+        if isinstance(decoded, list) and len(decoded) == 1:
+            return int(decoded[0]['taxId'])
         else:
             print('Taxon not found on species ' + self.species + ' at link ' + url)
             return None
 
     def __get_ensembl_assembly_info(self, primary_assembly_only=False):
-        species = self.species
-        server = "https://rest.ensembl.org"
-        ext = "/info/assembly/" + species.replace(" ","_")  + "?"
-         
-        r = requests.get(server+ext, headers={ "Content-Type" : "application/json"})
-                  
-        decoded = r.json()
+        if self._assembly_info is not None:
+            return self._assembly_info
+        self._assembly_info = info = {"assembly": "", "karyotypes": "", "chromosome_regions": []}
+        if self._assembly_json is None:
+            species = self.species
+            server = "https://rest.ensembl.org"
+            ext = "/info/assembly/" + species.replace(" ","_")  + "?"
+            decoded = fetch_json(server+ext, headers={ "Content-Type" : "application/json"}, ttl=self.metadata_ttl)
+        elif isinstance(self._assembly_json, dict):
+            decoded = self._assembly_json
+        else:
+            with open(self._assembly_json) as f:
+                decoded = json.load(f)
         if ('error' in decoded):
             print("Error when fetching ensembl assembly info. " + decoded['error'])
         else:
-            self.assembly = decoded['assembly_name']
-            self.karyotypes = decoded['karyotype']
+            info["assembly"] = decoded['assembly_name']
+            info["karyotypes"] = decoded['karyotype']
             chromosomes = []
             if (primary_assembly_only):
                 for chrom in decoded['top_level_region']:
@@ -70,321 +182,434 @@ class GenomeAdapter(Adapter):
                         chromosomes.append(chrom)
             else:
                 chromosomes = decoded['top_level_region']
-            self.chromosome_regions = chromosomes
+            info["chromosome_regions"] = chromosomes
+        return info
                 
-    def pull_data(self, gtf_url=None):
+    def pull_data(self, gtf_url=None, sha256=None, mirrors=None, destination="genome.gtf.gz", release=112):
+        """
+        Download the GTF file of the species through the local download cache.
+
+        Args:
+            gtf_url (str, optional): GTF to download. Defaults to the Ensembl GTF of the species' assembly.
+            sha256 (str, optional): Expected sha256 of the file.
+            mirrors (list, optional): URL prefixes, e.g. file:// directories, tried before gtf_url.
+            destination (str, optional): Where to place the file. Defaults to 'genome.gtf.gz'; None uses the cached file in place.
+            release (int, optional): Ensembl release used when gtf_url is not given. Defaults to 112.
+        """
         if (gtf_url != None):
             url = gtf_url
-        elif (self.taxon == 9606):
+        elif (self.taxon == 9606 and release == 112):
             url = "https://ftp.ensembl.org/pub/release-112/gtf/homo_sapiens/Homo_sapiens.GRCh38.112.gtf.gz"
-        elif (self.taxon == 10090):
+        elif (self.taxon == 10090 and release == 112):
             url = "https://ftp.ensembl.org/pub/release-112/gtf/mus_musculus/Mus_musculus.GRCm39.112.gtf.gz"
+        elif (self.assembly):
+            name = self.species.strip().replace(" ", "_")
+            url = f"https://ftp.ensembl.org/pub/release-{release}/gtf/{name.lower()}/{name.capitalize()}.{self.assembly}.{release}.gtf.gz"
         else:
-            print("Taxon id was not found and gtf_url was not provided")
+            print("Ensembl assembly was not found and gtf_url was not provided")
             return
         
-        urllib.request.urlretrieve(url, 'genome.gtf.gz')
+        self.gtf_file_path = download(url, destination, sha256=sha256, mirrors=mirrors)
+        return self.gtf_file_path
 
     def _generate_genomic_interval_nodes(self):
-        genomicIntervals = []
-        for chrom in self.chromosome_regions:
-            maxCoord = math.ceil(chrom['length']/1000)
-            for i in range(maxCoord):
-                start = (i*1000) + 1
-                # In order to make the end more predictable, the uuid will use (i+1)*1000
-                if (i+1)==(maxCoord):
-                    end = chrom['length']
-                else:
-                    end = (i+1)*1000
-                genomicIntervals.append({
-                    "_id": f"{self.taxon}:{chrom['name']}:{start}-{(i+1)*1000}",
-                    "labels": ["GenomicInterval"],
-                    "properties": {
-                        "uuid": f"{self.taxon}:{chrom['name']}:{start}-{end}",
-                        "displayName": f"{self.species} {chrom['name']}:{start}-{end}",
-                        "taxon": self.taxon,
-                        "species": self.species,
-                        # "assembly": decoded['assembly_name'],
-                        "chr": chrom['name'],
-                        "start": start,
-                        "end": end,
-                    }
-                })
-                # chromRegion = structs.GenomicInterval(
-                #     taxon=self.taxon,
-                #     species=self.species,
-                #     uuid=f"{self.taxon}:{chrom['name']}:{start}-{end}",
-                #     displayName=f"{self.species} {chrom}:{start}-{end}",
-                #     chr=chrom['name'],
-                #     start=start,
-                #     end=end
-                # )
-                # genomicIntervals.append({
-                #   "_id": f"{self.taxon}:{chrom['name']}:{start}-{end}",
-                #   "labels": ["GenomicInterval"],
-                #   "properties": chromRegion
-                # })
-        return genomicIntervals
+        return itertools.chain.from_iterable(
+            _intervals.iter_interval_nodes(self.chromosome_regions, self.taxon, self.species, bin_size)
+            for bin_size in self.bin_sizes
+        )
     
+    def _feature_node_frame(self, feature, label):
+        # Build Gene/Transcript nodes as a frame; an empty name falls back to the id
+        rows = self._gtf.filter(pl.col("feature") == feature)
+        return rows.select(
+            pl.col(f"{feature}_id").alias("_id"),
+            pl.concat_list(pl.lit(label)).alias("labels"),
+            pl.struct(
+                pl.col(f"{feature}_id").alias("uuid"),
+                pl.when(pl.col(f"{feature}_name") == "")
+                .then(pl.col(f"{feature}_id"))
+                .otherwise(pl.col(f"{feature}_name"))
+                .alias("displayName"),
+                pl.col("seqname").alias("chr"),
+                pl.col("start"),
+                pl.col("end"),
+                pl.lit(self.assembly).alias("assembly"),
+                pl.lit(self.taxon).alias("taxon"),
+                pl.col("strand"),
+            ).alias("properties"),
+        )
+
     def _generate_gene_nodes(self):
-        genes = self._gtf.filter(feature='gene')
-        genes_fixed = []
-        for g in genes.iter_rows(named=True):
-            name = g['gene_name']
-            if name == "":
-                name = g['gene_id']
-            genes_fixed.append({
-                "_id": g['gene_id'],
-                "labels": ["Gene"],
-                "properties": {
-                    "uuid": g['gene_id'],
-                    "displayName": name,
-                    "chr": g['seqname'],
-                    "start": g['start'],
-                    "end": g['end'],
-                    "assembly": self.assembly,
-                    "taxon": self.taxon,
-                    "strand": g['strand']
-                }
-            })
-        return genes_fixed
+        return self._feature_node_frame("gene", "Gene")
     
     def _generate_transcript_nodes(self):
-        transcripts = self._gtf.filter(feature='transcript')
-        transcripts_fixed = []
-        for t in transcripts.iter_rows(named=True):
-            name = t['transcript_name']
-            if name == "":
-                name = t['transcript_id']
-            transcripts_fixed.append({
-                "_id": t['transcript_id'],
-                "labels": ["Transcript"],
-                "properties": {
-                    "uuid": t['transcript_id'],
-                    "displayName": name,
-                    "chr": t['seqname'],
-                    "start": t['start'],
-                    "end": t['end'],
-                    "assembly": self.assembly,
-                    "taxon": self.taxon,
-                    "strand": t['strand']
-                }
-            })
-        return transcripts_fixed
+        return self._feature_node_frame("transcript", "Transcript")
     
+    def _transcript_proteins(self):
+        protein = self._gtf.filter(pl.col("protein_id") != "")
+        return protein.select(['transcript_id', 'protein_id']).unique(maintain_order=True)
+
     def _generate_protein_nodes(self):
-        protein = self._gtf.filter(self._gtf["protein_id"] != "")
-        protein_subset = protein.select(['transcript_id', 'protein_id']).unique()
-        protein_distinct = []
-        for p in protein_subset.iter_rows(named=True):
-            protein_distinct.append({
-                "_id": p['protein_id'],
-                "labels": ["Protein"],
-                "properties": {
-                    "uuid": p['protein_id'],
-                    "displayName": p['protein_id'],
-                    "assembly": self.assembly,
-                    "taxon": self.taxon,
-                }
-            })
-        return protein_distinct
+        return self._transcript_proteins().select(
+            pl.col("protein_id").alias("_id"),
+            pl.concat_list(pl.lit("Protein")).alias("labels"),
+            pl.struct(
+                pl.col("protein_id").alias("uuid"),
+                pl.col("protein_id").alias("displayName"),
+                pl.lit(self.assembly).alias("assembly"),
+                pl.lit(self.taxon).alias("taxon"),
+            ).alias("properties"),
+        )
     
-    def iterate_nodes(self, write_to_disk=True, gtf_file_path = "genome.gtf.gz"):
+    def _structure_rows(self, features, kind):
+        # Rows of one transcript component with a node id: the exon id, or transcript:kind:start-end
+        rows = self._gtf.filter(pl.col("feature").is_in(features))
+        fallback = pl.format("{}:{}:{}-{}", "transcript_id", pl.lit(kind), "start", "end")
+        if kind == "exon":
+            node_id = pl.when(pl.col("exon_id") == "").then(fallback).otherwise(pl.col("exon_id"))
+        else:
+            node_id = fallback
+        return rows.with_columns(
+            node_id.alias("_id"),
+            pl.col("exon_number").cast(pl.Int64, strict=False).alias("exon_number"),
+        )
+
+    def _structure_node_frames(self, features, kind, label, *extra):
+        rows = self._structure_rows(features, kind).unique("_id", maintain_order=True)
+        nodes = rows.select(
+            pl.col("_id"),
+            pl.concat_list(pl.lit(label)).alias("labels"),
+            pl.struct(
+                pl.col("_id").alias("uuid"),
+                pl.col("_id").alias("displayName"),
+                pl.col("seqname").alias("chr"),
+                pl.col("start"),
+                pl.col("end"),
+                pl.col("strand"),
+                pl.lit(self.assembly).alias("assembly"),
+                pl.lit(self.taxon).alias("taxon"),
+                *extra,
+            ).alias("properties"),
+        )
+        return nodes.iter_slices(STRUCTURE_CHUNK_ROWS)
+
+    def _structure_edge_frames(self, features, kind, label, *properties):
+        columns = [
+            pl.struct(pl.col("transcript_id").alias("uuid")).alias("from"),
+            pl.struct(pl.col("_id").alias("uuid")).alias("to"),
+            pl.lit(label).alias("label"),
+        ]
+        if properties:
+            columns.append(pl.struct(*properties).alias("properties"))
+        edges = self._structure_rows(features, kind).select(columns)
+        return edges.iter_slices(STRUCTURE_CHUNK_ROWS)
+
+    def _generate_exon_nodes(self):
+        return self._structure_node_frames(["exon"], "exon", "Exon")
+
+    def _generate_cds_nodes(self):
+        return self._structure_node_frames(["CDS"], "CDS", "CDS", pl.col("protein_id").alias("protein"))
+
+    def _generate_utr_nodes(self):
+        return self._structure_node_frames(GTF_STRUCTURE_FEATURES[1:], "UTR", "UTR", pl.col("feature").alias("utrType"))
+
+    def _generate_genome_nodes(self):
+        yield {
+            "_id": self.genome.uuid,
+            "labels": ["Genome"],
+            "properties": {
+                "_id": self.genome.uuid,
+                "displayName": self.genome.displayName,
+                "assembly": self.genome.assembly,
+                "taxon": self.genome.taxon,
+                "chromosomes": self.chromosome_regions
+            }
+        }
+
+    def _gtf_options(self):
+        # Features and columns of the gtf this adapter needs, which also key the parsed gtf cache
+        if self.structure_nodes:
+            return GTF_FEATURES + GTF_STRUCTURE_FEATURES, GTF_COLUMNS + GTF_STRUCTURE_COLUMNS
+        return GTF_FEATURES, GTF_COLUMNS
+
+    def _load_gtf(self, gtf_file_path):
+        # Load gtf file into dataframe before processing genes, transcripts, proteins
+        self._gtf = load_gtf(gtf_file_path, *self._gtf_options())
+        self._gtfloaded = True
+
+    def _node_sections(self):
+        sections = [
+            ("genome", self._generate_genome_nodes),
+            ("genomic interval", self._generate_genomic_interval_nodes),
+            ("gene", self._generate_gene_nodes),
+            ("transcript", self._generate_transcript_nodes),
+            ("protein", self._generate_protein_nodes),
+        ]
+        if self.structure_nodes:
+            sections += [
+                ("exon", self._generate_exon_nodes),
+                ("CDS", self._generate_cds_nodes),
+                ("UTR", self._generate_utr_nodes),
+            ]
+        return sections
+
+    def _edge_sections(self):
+        sections = [
+            ("genome to genomic interval", self._generate_genome_to_genomic_interval_edges),
+            ("genomic interval next", self._generate_genomic_interval_edges),
+        ]
+        if len(self.bin_sizes) > 1:
+            sections.append(("genomic interval hierarchy", self._generate_genomic_interval_hierarchy_edges))
+        sections += [
+            ("gene to transcript", self._generate_gene_transcript_edges),
+            ("transcript to protein", self._generate_transcript_protein_edges),
+        ]
+        if self.structure_nodes:
+            sections += [
+                ("transcript to exon", self._generate_transcript_exon_edges),
+                ("transcript to CDS", self._generate_transcript_cds_edges),
+                ("transcript to UTR", self._generate_transcript_utr_edges),
+            ]
+        if self.overlap_edges:
+            sections.append(("gene and transcript to genomic interval overlap", self._generate_overlap_edges))
+        return sections
+
+    def _write_sections(self, writer, sections, kind):
+        # A section yields dict records and/or polars frames, which are written in bulk
+        for name, generate in sections:
+            print(f"Generating and writing {name} {kind}s")
+            written = writer.records_written(kind)
+            records = generate()
+            if isinstance(records, pl.DataFrame):
+                records = [records]
+            for is_frame, items in itertools.groupby(records, key=lambda x: isinstance(x, pl.DataFrame)):
+                if is_frame:
+                    for frame in items:
+                        writer.write_frame(frame, kind)
+                elif kind == "node":
+                    writer.write_nodes(items)
+                else:
+                    writer.write_edges(items)
+            print(f"Wrote {writer.records_written(kind) - written} {name} {kind}s to file")
+
+    def _iterate_sections(self, sections, kind, batch_size=None):
+        def records():
+            for name, generate in sections:
+                print(f"Generating {name} {kind}s")
+                items = generate()
+                if isinstance(items, pl.DataFrame):
+                    items = [items]
+                for x in items:
+                    if isinstance(x, pl.DataFrame):
+                        yield from x.iter_rows(named=True)
+                    else:
+                        yield x
+        return records() if batch_size is None else batched(records(), batch_size)
+
+    def iterate_nodes(self, write_to_disk=True, gtf_file_path=None, writer=None, batch_size=None):
+        """
+        Generate the nodes of the data pack.
+
+        Nodes are produced lazily, one section at a time, so neither mode holds
+        more than one batch of records in memory.
+
+        Args:
+            write_to_disk (bool, optional): Write the nodes instead of returning them. Defaults to True.
+            gtf_file_path (str, optional): GTF file to load genes, transcripts and proteins from.
+                Defaults to the file fetched by pull_data(), or 'genome.gtf.gz'.
+            writer (DataPackWriter, optional): Writer to use instead of opening node_filename.
+            batch_size (int, optional): In non-write mode, yield lists of this many nodes instead of single nodes.
+
+        Returns:
+            generator: In non-write mode, the nodes (or node batches).
+        """
+        self._load_gtf(gtf_file_path or self.gtf_file_path)
         if (write_to_disk):
             print(f"Running function in write mode. Writing to file {self.node_filename}. To return nodes, set write_to_disk=False in function call")
-            print("Generating genome node")
-            nodes = [
-                {
-                    "_id": self.genome.uuid,
-                    "labels": ["Genome"],
-                    "properties": {
-                        "_id": self.genome.uuid,
-                        "displayName": self.genome.displayName,
-                        "assembly": self.genome.assembly,
-                        "taxon": self.genome.taxon,
-                        "chromosomes": self.chromosome_regions
-                    }
-                }
-            ]
-            print("Writing genome node to file")
-            self.append_to_file(nodes, filepath=self.node_filename)
-            nodes = []
-            print("Generating genomic interval nodes")
-            nodes = self._generate_genomic_interval_nodes()
-            print(f"Writing {len(nodes)} genomic interval nodes to file")
-            self.append_to_file(nodes, filepath=self.node_filename)
-            nodes = []
-            # Load gtf file into dataframe before processing genes, transcripts, proteins
-            self._gtf = read_gtf(gtf_file_path)
-            self._gtfloaded = True
-            print("Generating gene nodes")
-            nodes = self._generate_gene_nodes()
-            print(f"Writing {len(nodes)} gene nodes to file")
-            self.append_to_file(nodes, filepath=self.node_filename)
-            nodes = []
-            print("Generating transcript nodes")
-            nodes = self._generate_transcript_nodes()
-            print(f"Writing {len(nodes)} transcript nodes to file")
-            self.append_to_file(nodes, filepath=self.node_filename)
-            nodes = []
-            print("Generating protein nodes")
-            nodes = self._generate_protein_nodes()
-            print(f"Writing {len(nodes)} protein nodes to file")
-            self.append_to_file(nodes, filepath=self.node_filename)
-            nodes = []
-            print(f"All nodes written to file: {self.node_filename}")
+            with self._use_writer(writer) as writer:
+                self._write_sections(writer, self._node_sections(), "node")
+            print(f"All {writer.records_written('node')} nodes written to file: {self.node_filename}")
         else:
-            print("Running function in non-write mode. Returning nodes. To write to file, set write_to_disk=True in function call")
-            genome = [
-                {
-                    "_id": self.genome.uuid,
-                    "labels": ["Genome"],
-                    "properties": {
-                        "_id": self.genome.uuid,
-                        "displayName": self.genome.displayName,
-                        "assembly": self.genome.assembly,
-                        "taxon": self.genome.taxon,
-                        "chromosomes": self.chromosome_regions
-                    }
-                }
-            ]
-            print("Generating genomic interval nodes")
-            genomic_intervals = self._generate_genomic_interval_nodes()
-            # Load gtf file into dataframe before processing genes, transcripts, proteins
-            self._gtf = read_gtf(gtf_file_path)
-            self._gtfloaded = True
-            print("Generating gene nodes")
-            genes = self._generate_gene_nodes()
-            print("Generating transcript nodes")
-            transcripts = self._generate_transcript_nodes()
-            print("Generating protein nodes")
-            proteins = self._generate_protein_nodes()
-            allNodes = [genome, genomic_intervals, genes, transcripts, proteins]
-            self.nodes = list(itertools.chain(*allNodes))
-            return self.nodes
+            print("Running function in non-write mode. Returning a node generator. To write to file, set write_to_disk=True in function call")
+            return self._iterate_sections(self._node_sections(), "node", batch_size)
     
     def _generate_genome_to_genomic_interval_edges(self):
-        edges = []
-        for chrom in self.chromosome_regions:
-            maxCoord = math.ceil(chrom['length']/1000)
-            for i in range(maxCoord):
-                start = (i*1000) + 1
-                # # In order to make uuid's more predictable for genomic intervals, the end is simply (i+1)*1000
-                # if (i+1)==(maxCoord):
-                #     end = chrom['length']
-                # else:
-                end = (i+1)*1000
-                edges.append({
-                    "from": {
-                        "uuid": self.genome.uuid,
-                    },
-                    "to": {
-                        "uuid": f"{self.taxon}:{chrom['name']}:{start}-{end}",
-                    },
-                    "label": "genome contains interval"
-                })
-        return edges
+        return itertools.chain.from_iterable(
+            _intervals.iter_genome_interval_edges(self.chromosome_regions, self.taxon, self.genome.uuid, bin_size)
+            for bin_size in self.bin_sizes
+        )
     
     def _generate_genomic_interval_edges(self):
-        # Generate edges between adjacent genomic coordinates
-        coordinateEdges = []
-        for chrom in self.chromosome_regions:
-            maxCoord = math.ceil(chrom['length']/1000)
-            # One fewer edge than num nodes
-            for i in range(maxCoord-1):
-                # current node
-                start1 = (i*1000) + 1
-                end1 = (i+1)*1000
-                start2 = end1 + 1
-                # if (i+2)==(maxCoord):
-                #     end2 = chrom['length']
-                # else:
-                # # In order to make uuid's more predictable for genomic intervals, the end is simply (i+2)*1000
-                end2 = (i+2)*1000
-                # write the edges to a file
-                coordinateEdges.append({
-                    "from": {
-                        "uuid": f"{self.taxon}:{chrom['name']}:{start1}-{end1}",
-                    },
-                    "to": {
-                        "uuid": f"{self.taxon}:{chrom['name']}:{start2}-{end2}",
-                    },
-                    "label": "next"
-                })
-        return coordinateEdges
+        # Generate edges between adjacent genomic coordinates of each level
+        return itertools.chain.from_iterable(
+            _intervals.iter_next_edges(self.chromosome_regions, self.taxon, bin_size)
+            for bin_size in self.bin_sizes
+        )
+    
+    def _generate_genomic_interval_hierarchy_edges(self):
+        # Generate edges from each interval to the intervals of the next finer level within it
+        return itertools.chain.from_iterable(
+            _intervals.iter_contains_edges(self.chromosome_regions, self.taxon, coarser, finer)
+            for finer, coarser in zip(self.bin_sizes, self.bin_sizes[1:])
+        )
     
     def _generate_gene_transcript_edges(self):
-        transcripts = self._gtf.filter(feature='transcript')
-        edges = []
-        for t in transcripts.iter_rows(named=True):
-            edges.append({
-                "from": {
-                    "uuid": t["gene_id"],
-                },
-                "to": {
-                    "uuid": t["transcript_id"],
-                },
-                "label": "transcribed to"
-            })
-        return edges
+        transcripts = self._gtf.filter(pl.col("feature") == "transcript")
+        return transcripts.select(
+            pl.struct(pl.col("gene_id").alias("uuid")).alias("from"),
+            pl.struct(pl.col("transcript_id").alias("uuid")).alias("to"),
+            pl.lit("transcribed to").alias("label"),
+        )
     
     def _generate_transcript_protein_edges(self):
-        protein = self._gtf.filter(self._gtf["protein_id"] != "")
-        protein_subset = protein.select(['transcript_id', 'protein_id']).unique()
-        edges = []
-        for t in protein_subset.iter_rows(named=True):
-            edges.append({
-                "from": {
-                    "uuid": t["transcript_id"],
-                },
-                "to": {
-                    "uuid": t["protein_id"],
-                },
-                "label": "has translation"
-            })
-        return edges
+        return self._transcript_proteins().select(
+            pl.struct(pl.col("transcript_id").alias("uuid")).alias("from"),
+            pl.struct(pl.col("protein_id").alias("uuid")).alias("to"),
+            pl.lit("has translation").alias("label"),
+        )
+
+    def _generate_transcript_exon_edges(self):
+        return self._structure_edge_frames(["exon"], "exon", "has exon", pl.col("exon_number").alias("exonNumber"))
+
+    def _generate_transcript_cds_edges(self):
+        return self._structure_edge_frames(
+            ["CDS"], "CDS", "has CDS",
+            pl.col("exon_number").alias("exonNumber"),
+            pl.col("frame").cast(pl.Int64, strict=False).alias("phase"),
+        )
+
+    def _generate_transcript_utr_edges(self):
+        return self._structure_edge_frames(GTF_STRUCTURE_FEATURES[1:], "UTR", "has UTR")
+
+    def _generate_overlap_edges(self):
+        # Link every gene and transcript to the finest-level intervals it overlaps, one chromosome at a time
+        features = self._gtf.filter(pl.col("feature").is_in(["gene", "transcript"])).select(
+            pl.when(pl.col("feature") == "gene").then(pl.col("gene_id")).otherwise(pl.col("transcript_id")).alias("uuid"),
+            "seqname", "start", "end",
+        )
+        for chrom in self.chromosome_regions:
+            rows = features.filter(pl.col("seqname") == chrom["name"])
+            if rows.height == 0:
+                continue
+            yield _intervals.overlap_edge_frame(
+                rows.get_column("uuid"),
+                rows.get_column("start").to_numpy(),
+                rows.get_column("end").to_numpy(),
+                chrom,
+                self.taxon,
+                self.bin_sizes[0],
+            )
+
+    def iterate_edges(self, write_to_disk=True, writer=None, batch_size=None, gtf_file_path=None):
+        """
+        Generate the edges of the data pack.
 
-    def iterate_edges(self, write_to_disk=True):
-        edges = []
+        Uses the gtf file loaded by iterate_nodes(), or loads `gtf_file_path`
+        (from the parsed gtf cache when it has been parsed before).
+
+        Args:
+            write_to_disk (bool, optional): Write the edges instead of returning them. Defaults to True.
+            writer (DataPackWriter, optional): Writer to use instead of opening edge_filename.
+            batch_size (int, optional): In non-write mode, yield lists of this many edges instead of single edges.
+            gtf_file_path (str, optional): GTF file to load if iterate_nodes() has not loaded one.
+
+        Returns:
+            generator: In non-write mode, the edges (or edge batches).
+        """
+        if self._gtfloaded == False and gtf_file_path is not None:
+            self._load_gtf(gtf_file_path)
         if self._gtfloaded == False:
-            print("Run iterate_nodes() to load in the gtf file, prior to this function being callable. Alternatively, call <INSTANCE>._gtf = <INSTANCE>.read_gtf() and <INSTANCE>._gtfloaded = True")
+            print("Run iterate_nodes() or pass gtf_file_path to load in the gtf file, prior to this function being callable. Alternatively, call <INSTANCE>._gtf = load_gtf(<PATH>) and <INSTANCE>._gtfloaded = True")
             return
         if (write_to_disk):
             print(f"Running function in write mode. Writing to file {self.edge_filename}. To return edges, set write_to_disk=False in function call")
-            print("Processing genome to genomic interval edges")
-            edges = self._generate_genome_to_genomic_interval_edges()
-            print(f"Writing {len(edges)} genome to genomic interval edges to file")
-            self.append_to_file(edges, filepath=self.edge_filename)
-            edges = []
-            print("Processing genomic interval next edges")
-            edges = self._generate_genomic_interval_edges()
-            print(f"Writing {len(edges)} genomic interval next edges to file")
-            self.append_to_file(edges, filepath=self.edge_filename)
-            edges = []
-            print("Processing gene to transcript edges")
-            edges = self._generate_gene_transcript_edges()
-            print(f"Writing {len(edges)} gene to transcript edges to file")
-            self.append_to_file(edges, filepath=self.edge_filename)
-            edges = []
-            print("Processing transcript to protein edges")
-            edges = self._generate_transcript_protein_edges()
-            print(f"Writing {len(edges)} transcript to protein edges to file")
-            self.append_to_file(edges, filepath=self.edge_filename)
-            edges = []
-            print(f"All edges written to file: {self.edge_filename}")
+            with self._use_writer(writer) as writer:
+                self._write_sections(writer, self._edge_sections(), "edge")
+            print(f"All {writer.records_written('edge')} edges written to file: {self.edge_filename}")
+        else:
+            print("Running function in non-write mode. Returning an edge generator. To write to file, set write_to_disk=True in function call")
+            return self._iterate_sections(self._edge_sections(), "edge", batch_size)
+
+    def _partitions(self, processes=1):
+        # Adapters over groups of chromosomes, largest first, plus one for features on sequences outside the
+        # assembly. Chromosomes are packed up to a share of the genome length, so a large chromosome gets its
+        # own partition while thousands of scaffolds are written by a handful
+        self.genome
+        regions = sorted(self.chromosome_regions, key=lambda chrom: chrom["length"], reverse=True)
+        budget = sum(chrom["length"] for chrom in regions) / (processes * PARTITIONS_PER_PROCESS)
+        groups = []
+        for chrom in regions:
+            if groups and sum(c["length"] for c in groups[-1]) + chrom["length"] <= budget:
+                groups[-1].append(chrom)
+            else:
+                groups.append([chrom])
+        parts = []
+        for i, chroms in enumerate(groups):
+            names = [chrom["name"] for chrom in chroms]
+            name = names[0] if len(names) == 1 else f"group-{i}"
+            parts.append((name, chroms, self._gtf.filter(pl.col("seqname").is_in(names))))
+        other = self._gtf.filter(~pl.col("seqname").is_in([chrom["name"] for chrom in regions]))
+        if other.height:
+            parts.append(("other", [], other))
+        for name, chroms, gtf in parts:
+            part = copy.copy(self)
+            part._assembly_info = dict(self._assembly_info, chromosome_regions=chroms)
+            part._gtf = gtf
+            yield name, part
+
+    def build(self, directory="", processes=None, gtf_file_path=None, **writer_kwargs):
+        """
+        Write the whole data pack, partitioned by chromosome over worker processes.
+
+        Chromosomes are grouped into a few partitions per process: large ones
+        on their own, smaller ones and scaffolds packed together. Every
+        partition's intervals, interval edges, genes, transcripts and proteins
+        are written by a worker to its own files (e.g. node-1.jsonl.gz or
+        node-group-30.jsonl.gz); the genome node is written by this
+        process and the shards of every worker are then merged into the manifest
+        of `directory`.
+
+        Args:
+            directory (str, optional): Directory the data pack is written to.
+            processes (int, optional): Worker processes. None uses every core; 1 builds in this process.
+            gtf_file_path (str, optional): GTF file to load. Defaults to the file fetched by pull_data().
+            **writer_kwargs: Extra options passed to DataPackWriter, e.g. format or shard_records.
+                dedupe, hashes and base need a single writer and are not supported.
+
+        Returns:
+            dict: The updated manifest.
+        """
+        for option in ("dedupe", "hashes", "base"):
+            if writer_kwargs.get(option):
+                raise ValueError(f"build() writes from several processes and does not support {option}=; use iterate_nodes() and iterate_edges()")
+        self._load_gtf(gtf_file_path or self.gtf_file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        processes = max(1, processes or os.cpu_count() or 1)
+        parts = list(self._partitions(processes))
+        print(f"Building {len(parts)} partitions with {processes} processes")
+
+        genome = copy.copy(self)
+        genome.node_filename = _part_filename(self.node_filename, "genome")
+        genome.edge_filename = None
+        with genome.open_writer(directory, manifest=False, **writer_kwargs) as writer:
+            genome._write_sections(writer, [s for s in self._node_sections() if s[0] == "genome"], "node")
+        entries = list(writer.manifest_entries)
+
+        if processes == 1:
+            for name, part in parts:
+                entries += _build_part(part, directory, name, writer_kwargs)
         else:
-            print("Running function in non-write mode. Returning edges. To write to file, set write_to_disk=True in function call")
-            print("Processing genome to genomic interval edges")
-            gene_genomic_edges = self._generate_genome_to_genomic_interval_edges()
-            print("Processing genomic interval next edges")
-            genomic_coordinate_edges = self._generate_genomic_interval_edges()
-            print("Processing gene to transcript edges")
-            gene_transcript_edges = self._generate_gene_transcript_edges()
-            transcript_protein_edges = self._generate_transcript_protein_edges()
-            print("Processing transcript to protein edges")
-            allEdges = [gene_genomic_edges, genomic_coordinate_edges, gene_transcript_edges, transcript_protein_edges]
-            print("Returning edges")
-            return list(itertools.chain(*allEdges))
+            # Polars' thread pool is not fork-safe, so workers are spawned
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=processes, mp_context=context) as executor:
+                futures = [executor.submit(_build_part, part, directory, name, writer_kwargs) for name, part in parts]
+                for future in futures:
+                    entries += future.result()
+        manifest = update_manifest(directory or ".", entries)
+        print(f"Wrote {sum(e['records'] for e in entries if e['kind'] == 'node')} nodes and "
+              f"{sum(e['records'] for e in entries if e['kind'] == 'edge')} edges to {len(entries)} shards")
+        return manifest
 
     def process_item(self, item):
         """Processes a single item (node or edge)."""
@@ -430,7 +655,9 @@ class GenomeAdapter(Adapter):
                 "GenomicInterval": {
                     "label": "Genomic Interval",
                     "dbLabel": "GenomicInterval",
-                    "definition": "Genomic Interval splitting the genome's chromosomal regions into sections of 1kbp",
+                    "definition": "Genomic Interval splitting the genome's chromosomal regions into sections of "
+                                  + ", ".join(f"{b}bp" for b in self.bin_sizes),
+                    "binSizes": list(self.bin_sizes),
                 },
             },
             "relationships": {
@@ -442,6 +669,10 @@ class GenomeAdapter(Adapter):
                     "from": "GenomicInterval",
                     "to": "GenomicInterval"
                 },
+                "contains interval": {
+                    "from": "GenomicInterval",
+                    "to": "GenomicInterval"
+                },
                 "transcribed to": {
                     "from": "Gene",
                     "to": "Transcript"
@@ -450,15 +681,49 @@ class GenomeAdapter(Adapter):
                     "from": "Transcript",
                     "to": "Protein"
                 },
+                "overlaps interval": {
+                    "from": ["Gene", "Transcript"],
+                    "to": "GenomicInterval"
+                },
             }
         }
+        if self.structure_nodes:
+            metadata["concepts"].update({
+                "Exon": {
+                    "label": "Exon",
+                    "dbLabel": "Exon",
+                    "definition": "Exon of one or more transcripts",
+                },
+                "CDS": {
+                    "label": "CDS",
+                    "dbLabel": "CDS",
+                    "definition": "Coding sequence of a transcript within one exon",
+                },
+                "UTR": {
+                    "label": "UTR",
+                    "dbLabel": "UTR",
+                    "definition": "Untranslated region of a transcript",
+                },
+            })
+            metadata["relationships"].update({
+                "has exon": {
+                    "from": "Transcript",
+                    "to": "Exon"
+                },
+                "has CDS": {
+                    "from": "Transcript",
+                    "to": "CDS"
+                },
+                "has UTR": {
+                    "from": "Transcript",
+                    "to": "UTR"
+                },
+            })
         return metadata
     
     def append_to_file(self, objs, directory="", filepath="obj.jsonl.gz"):
-        with gzip.open(os.path.join(directory, filepath), "at") as f:
-            for x in objs:
-                json.dump(x, f)
-                f.write("\n")
+        with DataPackWriter(node_filename=filepath, edge_filename=None, directory=directory) as writer:
+            writer.write_nodes(objs)
 
     # def write_serialized_data_to_file(self, directory=""):
     #     node_filepath = os.path.join(directory, self.node_filename)
@@ -0,0 +1,123 @@
+"""
+Batch builds of genome data packs for many species
+
+`build_genomes` runs three stages as a pipeline: metadata lookups and GTF
+downloads on a thread pool, GTF parsing on a process pool and pack builds in
+this process, which farm chromosomes out to their own workers. A species
+moves to the next stage as soon as it is ready, so downloads, parses and
+builds of different species overlap. Lookups, downloads and parsed GTFs all
+go through the caches under BIOBOX_CACHE_DIR, so a rerun only repeats the
+work for species that failed or changed.
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from biobox_analytics.data.adapters.genome import GenomeAdapter
+from biobox_analytics.data.adapters.genome._gtf import load_gtf
+
+
+def _fetch(adapter, gtf_url, sha256, mirrors, release):
+    # Resolve the taxon and assembly (through the metadata cache), then download the gtf
+    adapter.taxon
+    adapter.assembly
+    return adapter.pull_data(gtf_url, sha256=sha256, mirrors=mirrors, destination=None, release=release)
+
+
+def _parse(gtf_file_path, features, columns):
+    # Fill the parsed gtf cache; the frame is read back by the build instead of being pickled
+    load_gtf(gtf_file_path, features, columns)
+    return gtf_file_path
+
+
+def _pack_name(spec):
+    # Folder and result key of a pack: an explicit name, or the species plus the assembly when it is given
+    if spec.get("name"):
+        return spec["name"]
+    name = spec["species"].strip().replace(" ", "_").lower()
+    assembly = spec.get("assembly_json")
+    if isinstance(assembly, dict) and assembly.get("assembly_name"):
+        name += "_" + assembly["assembly_name"]
+    return name
+
+
+def build_genomes(genomes, directory="", adapter_kwargs=None, download_threads=4, processes=None, mirrors=None, release=112, **writer_kwargs):
+    """
+    Build the genome data packs of several species in one run.
+
+    Usage:
+        build_genomes(["homo sapiens", "mus musculus", {"species": "danio rerio", "bin_sizes": (1000, 10000)}], "packs")
+
+    Every pack is written to a folder named after its species, plus its
+    assembly when the spec has an assembly_json, or after the 'name' of its
+    spec. Two builds that would share a folder, e.g. two releases of one
+    species, need distinct names.
+
+    Args:
+        genomes (list): Species names, or dicts with a 'species' key, optional 'name', 'gtf_url', 'sha256'
+            and 'release', and any other GenomeAdapter argument.
+        directory (str, optional): Directory under which each pack is written to its own folder.
+        adapter_kwargs (dict, optional): GenomeAdapter arguments shared by every species, e.g. structure_nodes.
+        download_threads (int, optional): Metadata lookups and downloads run at a time. Defaults to 4.
+        processes (int, optional): GTF parsing processes, and worker processes of each build. None uses every core.
+        mirrors (list, optional): URL prefixes tried before each gtf URL. Defaults to BIOBOX_MIRRORS.
+        release (int, optional): Ensembl release of GTFs without a gtf_url. Defaults to 112.
+        **writer_kwargs: Extra options passed to DataPackWriter, e.g. format.
+
+    Returns:
+        dict: The manifest of every pack by name, or None for packs that failed.
+
+    Raises:
+        ValueError: If two genomes have the same name.
+    """
+    specs = [{"species": spec} if isinstance(spec, str) else dict(spec) for spec in genomes]
+    names = [_pack_name(spec) for spec in specs]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Several genomes would be written to {duplicates}; give them distinct 'name's")
+    processes = max(1, processes or os.cpu_count() or 1)
+    results = {}
+    pending = {}
+
+    def fail(name, error):
+        print(f"Failed to build the genome pack {name}: {error}")
+        results[name] = None
+
+    # Polars' thread pool is not fork-safe, so parsers are spawned
+    context = multiprocessing.get_context("spawn")
+    with ThreadPoolExecutor(max_workers=download_threads) as downloads, \
+            ProcessPoolExecutor(max_workers=processes, mp_context=context) as parsers:
+        for name, spec in zip(names, specs):
+            spec.pop("name", None)
+            gtf_url = spec.pop("gtf_url", None)
+            sha256 = spec.pop("sha256", None)
+            spec_release = spec.pop("release", release)
+            adapter = GenomeAdapter(**dict(adapter_kwargs or {}, **spec))
+            future = downloads.submit(_fetch, adapter, gtf_url, sha256, mirrors, spec_release)
+            pending[future] = ("download", name, adapter)
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage, name, adapter = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    fail(name, e)
+                    continue
+                if stage == "download":
+                    if result is None:
+                        fail(name, "no gtf to download")
+                        continue
+                    print(f"Downloaded the gtf of {name}, parsing")
+                    pending[parsers.submit(_parse, result, *adapter._gtf_options())] = ("parse", name, adapter)
+                    continue
+                output = os.path.join(directory, name)
+                print(f"Building the genome pack {name} in {output}")
+                try:
+                    results[name] = adapter.build(output, processes=processes, gtf_file_path=result, **writer_kwargs)
+                except Exception as e:
+                    fail(name, e)
+    built = sum(manifest is not None for manifest in results.values())
+    print(f"Built {built} of {len(results)} genome packs")
+    return results
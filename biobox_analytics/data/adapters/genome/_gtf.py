@@ -0,0 +1,176 @@
+"""
+Streaming GTF parser and parsed GTF cache
+
+`iter_gtf_frames` reads a GTF (optionally gzipped) in line-aligned chunks and
+parses each chunk with Polars' CSV reader on a thread pool. Rows are filtered
+on feature type before any attribute is touched, and only the requested
+attributes are extracted from the attribute column. At most `max_bytes` of
+raw chunks are in flight at once, so memory is bounded by that window and
+the projected columns rather than by the whole file or the number of cores.
+
+`load_gtf` keeps only the features and columns the data packs use and stores
+the result as Parquet under `BIOBOX_CACHE_DIR/gtf`, keyed by the sha256 of the
+GTF file together with the requested features and columns, so later builds
+(and other adapters that need gene coordinates) read the table back in well
+under a second.
+"""
+
+import os
+import io
+import gzip
+import json
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import polars as pl
+import biobox_analytics._setup as _setup
+from biobox_analytics.data._manifest import file_sha256
+
+# The eight fixed GTF fields before the attribute column
+GTF_FIELDS = ("seqname", "source", "feature", "start", "end", "score", "strand", "frame")
+GTF_PARSER_VERSION = 3
+
+GTF_COLUMNS = (
+    "seqname", "feature", "start", "end", "strand",
+    "gene_id", "gene_name", "transcript_id", "transcript_name", "protein_id",
+)
+GTF_FEATURES = ("gene", "transcript", "CDS")
+
+# Extra features and columns loaded for the opt-in Exon, CDS and UTR nodes.
+# Ensembl splits UTRs into five_prime_utr and three_prime_utr, GENCODE has UTR.
+GTF_STRUCTURE_FEATURES = ("exon", "UTR", "five_prime_utr", "three_prime_utr")
+GTF_STRUCTURE_COLUMNS = ("frame", "exon_number", "exon_id")
+
+
+def _iter_chunks(path, chunk_bytes):
+    # Sniff for gzip rather than trusting the extension: cached downloads have none
+    with open(path, "rb") as f:
+        opener = gzip.open if f.read(2) == b"\x1f\x8b" else open
+    with opener(path, "rb") as f:
+        tail = b""
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            chunk = tail + chunk
+            cut = chunk.rfind(b"\n") + 1
+            tail = chunk[cut:]
+            if cut:
+                yield chunk[:cut]
+        if tail:
+            yield tail
+
+
+def _parse_chunk(data, features, columns):
+    schema = {name: pl.Utf8 for name in GTF_FIELDS + ("attribute",)}
+    schema["start"] = schema["end"] = pl.Int64
+    try:
+        gtf = pl.read_csv(
+            io.BytesIO(data),
+            separator="\t",
+            has_header=False,
+            new_columns=list(schema),
+            schema_overrides=schema,
+            comment_prefix="#",
+            quote_char=None,
+        )
+    except pl.exceptions.NoDataError:
+        gtf = pl.DataFrame(schema=schema)
+    if features is not None:
+        gtf = gtf.filter(pl.col("feature").is_in(list(features)))
+    return gtf.select([pl.col(c) if c in schema else _attribute(c) for c in columns])
+
+
+def _attribute(name):
+    # Values are quoted strings, which may hold ';', or bare tokens such as `exon_number 1`
+    attribute = pl.col("attribute").str
+    return pl.coalesce(
+        attribute.extract(f'(?:^|;)\\s*{name} "([^"]*)"', 1),
+        attribute.extract(f'(?:^|;)\\s*{name} ([^";\\s]+)', 1),
+    ).fill_null("").alias(name)
+
+
+def iter_gtf_frames(gtf_file_path, features=None, columns=GTF_COLUMNS, chunk_bytes=1 << 24, threads=None, max_bytes=1 << 28):
+    """
+    Stream a GTF file as Polars frames, one per chunk.
+
+    Args:
+        gtf_file_path (str): Path to the GTF file, optionally gzipped.
+        features (list, optional): Feature types to keep, or None for every row.
+        columns (list, optional): GTF fields (seqname, source, feature, start, end, score, strand, frame)
+            and attribute names to keep; missing attributes are "". Defaults to GTF_COLUMNS.
+        chunk_bytes (int, optional): Uncompressed bytes parsed at a time. Defaults to 16 MiB.
+        threads (int, optional): Chunks parsed concurrently. None uses every core. Defaults to None.
+        max_bytes (int, optional): Uncompressed bytes read ahead of the consumer, which caps the chunks in
+            flight whatever the number of threads. Defaults to 256 MiB.
+
+    Yields:
+        polars.DataFrame: The parsed rows of each chunk, in file order.
+    """
+    window = max(1, min(max_bytes // chunk_bytes, threads or os.cpu_count() or 1))
+    features = set(features) if features is not None else None
+    columns = list(columns)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=window) as executor:
+        for chunk in _iter_chunks(gtf_file_path, chunk_bytes):
+            if len(pending) >= window:
+                yield pending.popleft().result()
+            pending.append(executor.submit(_parse_chunk, chunk, features, columns))
+        while pending:
+            yield pending.popleft().result()
+
+
+def parse_gtf(gtf_file_path, features=None, columns=GTF_COLUMNS, chunk_bytes=1 << 24, threads=None, max_bytes=1 << 28):
+    """
+    Parse a GTF file into a single Polars frame. See `iter_gtf_frames` for the arguments.
+
+    Returns:
+        polars.DataFrame: The parsed rows.
+    """
+    frames = list(iter_gtf_frames(gtf_file_path, features, columns, chunk_bytes, threads, max_bytes))
+    if not frames:
+        return _parse_chunk(b"", features, list(columns))
+    return pl.concat(frames, rechunk=True)
+
+
+def gtf_cache_key(gtf_file_path, features=GTF_FEATURES, columns=GTF_COLUMNS):
+    """
+    Compute the cache key of a parsed GTF.
+
+    Returns:
+        str: Hex digest over the file's sha256, the features and the columns.
+    """
+    spec = {
+        "sha256": file_sha256(gtf_file_path),
+        "features": sorted(features) if features is not None else None,
+        "columns": list(columns),
+        "parser": GTF_PARSER_VERSION,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def load_gtf(gtf_file_path, features=GTF_FEATURES, columns=GTF_COLUMNS, cache_dir=None, cache=True):
+    """
+    Load the feature table of a GTF file, restricted to `features` and `columns`.
+
+    Args:
+        gtf_file_path (str): Path to the GTF file, optionally gzipped.
+        features (list, optional): Feature types to keep, or None for every row. Defaults to gene, transcript and CDS.
+        columns (list, optional): Columns to keep; attributes missing from the file are filled with "".
+            Defaults to GTF_COLUMNS.
+        cache_dir (str, optional): Cache directory. Defaults to BIOBOX_CACHE_DIR.
+        cache (bool, optional): Read and write the Parquet cache. Defaults to True.
+
+    Returns:
+        polars.DataFrame: The parsed features.
+    """
+    if not cache:
+        return parse_gtf(gtf_file_path, features, columns)
+    directory = os.path.join(cache_dir or _setup.BIOBOX_CACHE_DIR, "gtf")
+    path = os.path.join(directory, gtf_cache_key(gtf_file_path, features, columns) + ".parquet")
+    if os.path.exists(path):
+        print(f"Loading parsed gtf from cache {path}")
+        return pl.read_parquet(path)
+    gtf = parse_gtf(gtf_file_path, features, columns)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    gtf.write_parquet(tmp_path)
+    os.replace(tmp_path, path)
+    return gtf
@@ -0,0 +1,195 @@
+"""
+Vectorized genomic interval generation
+
+A chromosome of length L is tiled into ceil(L / bin_size) intervals. Starts
+and ends are computed as NumPy arrays and every chromosome's interval nodes
+and edges are built as one Polars frame, with ids formatted by Polars
+expressions, so they are written through `DataPackWriter.write_frame`
+without a Python dict or string per interval.
+
+Interval `_id`s always end on a multiple of the bin size, even for the last
+interval of a chromosome, so they can be computed from a coordinate alone
+and are unique across bin sizes. The `uuid` is the same id; the
+`displayName` and `end` properties carry the real end.
+
+Several bin sizes can be stacked into a ladder (e.g. 1 kb, 10 kb, 100 kb,
+1 Mb). Every coarser size must be a multiple of the next finer one, so each
+interval is contained in exactly one interval of the level above and is
+linked to it by a 'contains interval' edge.
+"""
+
+import numpy as np
+import polars as pl
+from biobox_analytics.intervals import overlap_bins
+
+
+def check_bin_sizes(bin_sizes):
+    """
+    Validate a bin size ladder.
+
+    Args:
+        bin_sizes (int or list): One bin size or several, in any order.
+
+    Returns:
+        tuple: The bin sizes from finest to coarsest.
+
+    Raises:
+        ValueError: If a size is not a positive integer, is repeated, or is
+            not a multiple of the next finer size.
+    """
+    if isinstance(bin_sizes, int):
+        bin_sizes = [bin_sizes]
+    bin_sizes = tuple(sorted(int(b) for b in bin_sizes))
+    if not bin_sizes or bin_sizes[0] <= 0:
+        raise ValueError(f"Bin sizes must be positive integers, got {bin_sizes}")
+    for finer, coarser in zip(bin_sizes, bin_sizes[1:]):
+        if coarser == finer or coarser % finer:
+            raise ValueError(f"Bin size {coarser} is not a multiple of the finer bin size {finer}")
+    return bin_sizes
+
+
+def interval_bounds(length, bin_size=1000):
+    """
+    Compute the 1-based, closed intervals tiling a chromosome.
+
+    Args:
+        length (int): Length of the chromosome.
+        bin_size (int, optional): Interval size. Defaults to 1000.
+
+    Returns:
+        tuple: (starts, id_ends, ends) int64 arrays, where `id_ends` are the
+        bin-aligned ends used in `_id`s and `ends` are clipped to `length`.
+    """
+    n = -(-int(length) // bin_size)
+    starts = np.arange(n, dtype=np.int64) * bin_size + 1
+    id_ends = starts + (bin_size - 1)
+    ends = np.minimum(id_ends, length)
+    return starts, id_ends, ends
+
+
+def interval_id_expr(taxon, chrom, start="start", end="end"):
+    """
+    Polars expression formatting `{taxon}:{chrom}:{start}-{end}` from two integer columns.
+    """
+    return pl.concat_str([pl.lit(f"{taxon}:{chrom}:"), pl.col(start), pl.lit("-"), pl.col(end)])
+
+
+def _bounds_frame(chrom, bin_size):
+    starts, id_ends, ends = interval_bounds(chrom["length"], bin_size)
+    return pl.DataFrame({"start": starts, "id_end": id_ends, "end": ends})
+
+
+def iter_interval_nodes(chromosomes, taxon, species, bin_size=1000):
+    """
+    Generate GenomicInterval nodes for every chromosome.
+
+    Args:
+        chromosomes (list): Ensembl top level regions, dicts with `name` and `length`.
+        taxon (int): NCBI taxon id used in ids.
+        species (str): Species name used in display names.
+        bin_size (int, optional): Interval size. Defaults to 1000.
+
+    Yields:
+        polars.DataFrame: The GenomicInterval node records of one chromosome.
+    """
+    for chrom in chromosomes:
+        name = chrom["name"]
+        _id = interval_id_expr(taxon, name, "start", "id_end")
+        yield _bounds_frame(chrom, bin_size).select(
+            _id.alias("_id"),
+            pl.concat_list(pl.lit("GenomicInterval")).alias("labels"),
+            pl.struct(
+                _id.alias("uuid"),
+                pl.concat_str([pl.lit(f"{species} {name}:"), pl.col("start"), pl.lit("-"), pl.col("end")]).alias("displayName"),
+                pl.lit(taxon).alias("taxon"),
+                pl.lit(species).alias("species"),
+                pl.lit(name).alias("chr"),
+                pl.col("start"),
+                pl.col("end"),
+                pl.lit(bin_size).alias("binSize"),
+            ).alias("properties"),
+        )
+
+
+def iter_genome_interval_edges(chromosomes, taxon, genome_uuid, bin_size=1000):
+    """
+    Generate 'genome contains interval' edges from the genome to every interval.
+
+    Yields:
+        polars.DataFrame: The edge records of one chromosome.
+    """
+    for chrom in chromosomes:
+        yield _bounds_frame(chrom, bin_size).select(
+            pl.struct(pl.lit(genome_uuid).alias("uuid")).alias("from"),
+            pl.struct(interval_id_expr(taxon, chrom["name"], "start", "id_end").alias("uuid")).alias("to"),
+            pl.lit("genome contains interval").alias("label"),
+        )
+
+
+def iter_next_edges(chromosomes, taxon, bin_size=1000):
+    """
+    Generate 'next' edges between adjacent intervals of each chromosome.
+
+    Yields:
+        polars.DataFrame: The edge records of one chromosome.
+    """
+    for chrom in chromosomes:
+        ids = _bounds_frame(chrom, bin_size).select(interval_id_expr(taxon, chrom["name"], "start", "id_end").alias("uuid"))
+        yield pl.DataFrame({
+            "from": ids.get_column("uuid").slice(0, max(ids.height - 1, 0)),
+            "to": ids.get_column("uuid").slice(1),
+        }).select(
+            pl.struct(pl.col("from").alias("uuid")).alias("from"),
+            pl.struct(pl.col("to").alias("uuid")).alias("to"),
+            pl.lit("next").alias("label"),
+        )
+
+
+def iter_contains_edges(chromosomes, taxon, parent_size, child_size):
+    """
+    Generate 'contains interval' edges from each interval of size `parent_size`
+    to the intervals of size `child_size` it contains.
+
+    Yields:
+        polars.DataFrame: The edge records of one chromosome.
+    """
+    for chrom in chromosomes:
+        name = chrom["name"]
+        parent_start = (pl.col("start") - 1) // parent_size * parent_size + 1
+        children = _bounds_frame(chrom, child_size).with_columns(
+            parent_start.alias("parent_start"),
+            (parent_start + (parent_size - 1)).alias("parent_end"),
+        )
+        yield children.select(
+            pl.struct(interval_id_expr(taxon, name, "parent_start", "parent_end").alias("uuid")).alias("from"),
+            pl.struct(interval_id_expr(taxon, name, "start", "id_end").alias("uuid")).alias("to"),
+            pl.lit("contains interval").alias("label"),
+        )
+
+
+def overlap_edge_frame(uuids, starts, ends, chrom, taxon, bin_size=1000):
+    """
+    Build 'overlaps interval' edges from features on one chromosome to the intervals they overlap.
+
+    Args:
+        uuids (polars.Series): Feature ids.
+        starts (numpy.ndarray): 1-based feature starts.
+        ends (numpy.ndarray): 1-based, inclusive feature ends.
+        chrom (dict): Ensembl top level region with `name` and `length`.
+        taxon (int): NCBI taxon id used in interval ids.
+        bin_size (int, optional): Interval size. Defaults to 1000.
+
+    Returns:
+        polars.DataFrame: Edge records with `from`, `to` and `label` columns.
+    """
+    index, bins = overlap_bins(starts, ends, bin_size, -(-int(chrom["length"]) // bin_size))
+    bin_starts = bins * bin_size + 1
+    return pl.DataFrame({
+        "uuid": uuids.gather(index),
+        "start": bin_starts,
+        "end": bin_starts + (bin_size - 1),
+    }).select(
+        pl.struct(pl.col("uuid")).alias("from"),
+        pl.struct(pl.format(f"{taxon}:{chrom['name']}:{{}}-{{}}", "start", "end").alias("uuid")).alias("to"),
+        pl.lit("overlaps interval").alias("label"),
+    )
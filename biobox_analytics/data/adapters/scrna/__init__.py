@@ -1,13 +1,11 @@
 from biobox_analytics.data.adapters._base import Adapter
+from biobox_analytics.data._writer import DataPackWriter
+from biobox_analytics.data.adapters._matrix import cell_ids, chunk_aligned_bounds, iter_matrix_edge_frames
 # import biobox_analytics.data.adapters.scrna._structs as structs
-import json
-import os
-import gzip
-import math
 import datetime
 import itertools
 import scanpy
-import pandas as pd
+import polars as pl
 
 class ScRNA(Adapter):
     def __init__(
@@ -15,9 +13,19 @@ class ScRNA(Adapter):
         h5adFile,
         node_filename='node.jsonl.gz',
         edge_filename='edge.jsonl.gz',
+        backed=False,
     ):
+        """
+        Args:
+            h5adFile (str): Path to the AnnData file.
+            node_filename (str, optional): File that nodes are written to. Defaults to 'node.jsonl.gz'.
+            edge_filename (str, optional): File that edges are written to. Defaults to 'edge.jsonl.gz'.
+            backed (bool, optional): Open the file read-only with only obs and var in memory; the matrix is
+                read in blocks aligned to its HDF5 chunks. Defaults to False.
+        """
         super().__init__()
         self.input_file = h5adFile
+        self.backed = backed
         self.pull_data()
         self.node_filename = node_filename
         self.edge_filename = edge_filename
@@ -25,10 +33,9 @@ class ScRNA(Adapter):
         self.displayName = f"SingleCellRNASeq Datapack - {self.current_date_time}"
         self.description = "SingleCellRNASeq Datapack created through Python SDK"
         self.key = f"scrna:{self.current_date_time}"
-        self._cellxgeneedges = []
     
     def pull_data(self):
-        self.rna = scanpy.read_h5ad(self.input_file)
+        self.rna = scanpy.read_h5ad(self.input_file, backed="r" if self.backed else None)
 
     def set_metadata(self, displayName, description, key):
         self.displayName = displayName
@@ -71,27 +78,28 @@ class ScRNA(Adapter):
             })
         return barcodes
 
-    def iterate_nodes(self, write_to_disk=True, sc_library_experiment_id="library_uuid", sample_id_col="sample_uuid", sc_experiment_cols_to_subset=["library_uuid"], sample_metadata_cols_to_subset=["sample_uuid"]):
+    def iterate_nodes(self, write_to_disk=True, sc_library_experiment_id="library_uuid", sample_id_col="sample_uuid", sc_experiment_cols_to_subset=["library_uuid"], sample_metadata_cols_to_subset=["sample_uuid"], writer=None):
         if (write_to_disk):
             print(f"Running function in write mode. Writing to file {self.node_filename}. To return nodes, set write_to_disk=False in function call")
-            nodes = []
-            print(f"Create cell nodes")
-            nodes = self.create_cell_nodes(sc_library_experiment_id)
-            print(f"Writing {len(nodes)} cell nodes to file")
-            self.append_to_file(nodes, filepath=self.node_filename)
-            nodes = []
-            print(f"Create experiment nodes")
-            nodes = self.create_sc_experiment_library_nodes(sc_library_experiment_id, sc_experiment_cols_to_subset)
-            print(f"Writing {len(nodes)} experiment nodes to file")
-            self.append_to_file(nodes, filepath=self.node_filename)
-            if (sample_id_col):
+            with self._use_writer(writer) as writer:
                 nodes = []
-                print(f"Create sample nodes")
-                nodes = self.create_sample_nodes(sample_id_col, sample_metadata_cols_to_subset)
-                print(f"Writing {len(nodes)} sample nodes to file")
-                self.append_to_file(nodes, filepath=self.node_filename)
+                print(f"Create cell nodes")
+                nodes = self.create_cell_nodes(sc_library_experiment_id)
+                print(f"Writing {len(nodes)} cell nodes to file")
+                writer.write_nodes(nodes)
                 nodes = []
-            print(f"All nodes written to file: {self.node_filename}")
+                print(f"Create experiment nodes")
+                nodes = self.create_sc_experiment_library_nodes(sc_library_experiment_id, sc_experiment_cols_to_subset)
+                print(f"Writing {len(nodes)} experiment nodes to file")
+                writer.write_nodes(nodes)
+                if (sample_id_col):
+                    nodes = []
+                    print(f"Create sample nodes")
+                    nodes = self.create_sample_nodes(sample_id_col, sample_metadata_cols_to_subset)
+                    print(f"Writing {len(nodes)} sample nodes to file")
+                    writer.write_nodes(nodes)
+                    nodes = []
+            print(f"All {writer.records_written('node')} nodes written to file: {self.node_filename}")
         else:
             print("Running function in non-write mode. Returning nodes. To write to file, set write_to_disk=True in function call")
             barcodes = self.create_cell_nodes(sc_library_experiment_id)
@@ -143,71 +151,44 @@ class ScRNA(Adapter):
             })
         return edges
 
-    def _process_barcodes_genes(self, row, barcode):
-        return {
-            "from": {
-                "uuid": barcode
-            },
-            "to": {
-                "uuid": row.name
-            },
-            "label": "expresses",
-            "properties": {
-                "normValue": row[barcode].astype(float)
-            }
-        }
-    
-    def _process_barcode(self, column):
-        barcode = column.name
-        cell = pd.DataFrame(column)
-        filtered_cell = cell[cell[column.name] > 0]
-        # cell2 = cell.set_axis(['expression'], axis=1)
-        a = filtered_cell.apply(lambda row: self._process_barcodes_genes(row, barcode), axis=1)
-        self._cellxgeneedges.extend(a.tolist())
-    
-    def create_barcode_to_gene_connection(self, sc_library_experiment_id):
+    def create_barcode_to_gene_connection(self, sc_library_experiment_id, writer=None, batch_rows=10000):
         numcells = self.rna.X.shape[0]
         print(f"Number of cells to process: {numcells}")
         print(f"Starting Cell x Gene edge processing now: {datetime.datetime.now()}")
-        for i in range(math.ceil(self.rna.X.shape[0]/1000)):
-            low = i*1000
-            high = (i+1)*1000
-            if (high > numcells):
-                high = numcells
-            print(f"Processing batch index {low}:{high} at time {datetime.datetime.now()}")
-            library = self.rna.obs[sc_library_experiment_id][low:high]
-            cell = self.rna.obs.index[low:high]
-            cell_uniq = [f"{libi}:{celli}" for libi, celli in zip(library.tolist(), cell.tolist())]
-            rowPandas = pd.DataFrame(self.rna.X[low:high].toarray().T, index=self.rna.var.index, columns=cell_uniq)
-            rowPandas.apply(self._process_barcode, axis=0)
-            self.append_to_file(self._cellxgeneedges, filepath=self.edge_filename)
-            self._cellxgeneedges = []
+        cells = cell_ids(self.rna.obs, sc_library_experiment_id)
+        genes = pl.Series(self.rna.var.index.astype(str).to_numpy())
+        bounds = chunk_aligned_bounds(self.rna.file["X"], batch_rows) if self.rna.isbacked else None
+        with self._use_writer(writer) as writer:
+            for low, high, edges in iter_matrix_edge_frames(self.rna.X, cells, genes, "expresses", "normValue", batch_rows, bounds):
+                print(f"Processing batch index {low}:{high} at time {datetime.datetime.now()}")
+                writer.write_frame(edges, "edge")
         print(f"Cell x Gene edges written to file: {self.edge_filename} at time {datetime.datetime.now()}")
         return []
 
-    def iterate_edges(self, write_to_disk=True, sc_library_experiment_id="library_uuid", sample_id_col=None, celltype_id_col=None, tissuetype_id_col=None):
+    def iterate_edges(self, write_to_disk=True, sc_library_experiment_id="library_uuid", sample_id_col=None, celltype_id_col=None, tissuetype_id_col=None, writer=None):
         if (write_to_disk):
             print(f"Running function in write mode. Writing to file {self.edge_filename}. To return edges, set write_to_disk=False in function call")
-            edges = []
-            print(f"Calculating experiment-cell edges")
-            edges = self.create_experiment_to_barcode_connection(sc_library_experiment_id)
-            print(f"Writing {len(edges)} experiment-cell edges to file")
-            self.append_to_file(edges, filepath=self.edge_filename)
-            if sample_id_col != None:
-                print(f"Calculating sample-experiment edges")
-                edges = self.create_sample_to_experiment_connection(sc_library_experiment_id, sample_id_col)
-                print(f"Writing {len(edges)} sample-experiment edges to file")
-                self.append_to_file(edges, filepath=self.edge_filename)
-                edges = []
-            if celltype_id_col != None:
-                print(f"Calculating cell-celltype edges")
-                edges = self.create_barcode_to_celltype_connection(sc_library_experiment_id, celltype_id_col)
-                print(f"Writing {len(edges)} cell-celltype edges to file")
-                self.append_to_file(edges, filepath=self.edge_filename)
+            with self._use_writer(writer) as writer:
                 edges = []
-            print(f"Calculating cell-gene edges")
-            self.create_barcode_to_gene_connection(sc_library_experiment_id)
-            print(f"All edges written to file: {self.edge_filename}")
+                print(f"Calculating experiment-cell edges")
+                edges = self.create_experiment_to_barcode_connection(sc_library_experiment_id)
+                print(f"Writing {len(edges)} experiment-cell edges to file")
+                writer.write_edges(edges)
+                if sample_id_col != None:
+                    print(f"Calculating sample-experiment edges")
+                    edges = self.create_sample_to_experiment_connection(sc_library_experiment_id, sample_id_col)
+                    print(f"Writing {len(edges)} sample-experiment edges to file")
+                    writer.write_edges(edges)
+                    edges = []
+                if celltype_id_col != None:
+                    print(f"Calculating cell-celltype edges")
+                    edges = self.create_barcode_to_celltype_connection(sc_library_experiment_id, celltype_id_col)
+                    print(f"Writing {len(edges)} cell-celltype edges to file")
+                    writer.write_edges(edges)
+                    edges = []
+                print(f"Calculating cell-gene edges")
+                self.create_barcode_to_gene_connection(sc_library_experiment_id, writer=writer)
+            print(f"All {writer.records_written('edge')} edges written to file: {self.edge_filename}")
         else:
             print("Running function in non-write mode. Returning edges. To write to file, set write_to_disk=True in function call")
             exp_to_barcode_edges = self.create_experiment_to_barcode_connection(sc_library_experiment_id)
@@ -293,10 +274,8 @@ class ScRNA(Adapter):
         return metadata
     
     def append_to_file(self, objs, directory="", filepath="obj.jsonl.gz"):
-        with gzip.open(os.path.join(directory, filepath), "at") as f:
-            for x in objs:
-                json.dump(x, f)
-                f.write("\n")
+        with DataPackWriter(node_filename=filepath, edge_filename=None, directory=directory) as writer:
+            writer.write_nodes(objs)
 
     # def write_serialized_data_to_file(self, directory=""):
     #     node_filepath = os.path.join(directory, self.node_filename)
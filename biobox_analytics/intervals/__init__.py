@@ -0,0 +1,6 @@
+"""
+BioBox genomic intervals
+"""
+
+from biobox_analytics.intervals._index import IntervalIndex
+from biobox_analytics.intervals._binning import bin_index, bin_start, interval_id, overlap_bins
@@ -0,0 +1,77 @@
+"""
+Fixed-size genomic bins
+
+Bins tile a chromosome from position 1: with a bin size of b, bin i covers
+the 1-based, closed range [i * b + 1, (i + 1) * b]. These are the ranges of
+the GenomicInterval nodes in genome data packs, whose ids have the form
+`{taxon}:{chrom}:{start}-{end}` with `end` always a multiple of b.
+"""
+
+import numpy as np
+
+
+def bin_index(positions, bin_size=1000):
+    """
+    Bin numbers of 1-based positions.
+
+    Args:
+        positions (array-like or int): 1-based positions.
+        bin_size (int, optional): Bin size. Defaults to 1000.
+
+    Returns:
+        numpy.ndarray or int: Bin numbers, counted from 0.
+    """
+    return (np.asarray(positions, dtype=np.int64) - 1) // bin_size
+
+
+def bin_start(positions, bin_size=1000):
+    """
+    First position of the bin containing each 1-based position.
+
+    Returns:
+        numpy.ndarray or int: 1-based bin starts.
+    """
+    return bin_index(positions, bin_size) * bin_size + 1
+
+
+def interval_id(taxon, chrom, position, bin_size=1000):
+    """
+    Id of the GenomicInterval containing a 1-based position.
+
+    Args:
+        taxon: NCBI taxon id used in the id.
+        chrom (str): Chromosome name, without a 'chr' prefix.
+        position (int): 1-based position.
+        bin_size (int, optional): Bin size. Defaults to 1000.
+
+    Returns:
+        str: e.g. '9606:1:1001-2000'.
+    """
+    start = int(bin_start(position, bin_size))
+    return f"{taxon}:{chrom}:{start}-{start + bin_size - 1}"
+
+
+def overlap_bins(starts, ends, bin_size=1000, n_bins=None):
+    """
+    Expand features into the bins they overlap.
+
+    A feature spanning k bins contributes k (feature, bin) pairs; the expansion
+    is done with floor division and repeat, without a Python loop.
+
+    Args:
+        starts (array-like): 1-based feature starts.
+        ends (array-like): 1-based, inclusive feature ends.
+        bin_size (int, optional): Bin size. Defaults to 1000.
+        n_bins (int, optional): Number of bins on the chromosome; bins past the end are dropped.
+
+    Returns:
+        tuple: (feature_index, bin) int64 arrays.
+    """
+    first = bin_index(starts, bin_size)
+    last = bin_index(ends, bin_size)
+    if n_bins is not None:
+        last = np.minimum(last, n_bins - 1)
+    counts = np.maximum(last - first + 1, 0)
+    index = np.repeat(np.arange(len(first), dtype=np.int64), counts)
+    offsets = np.arange(counts.sum(), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+    return index, first[index] + offsets
@@ -0,0 +1,172 @@
+"""
+In-memory genomic interval index
+
+Features are kept per chromosome as arrays sorted by start, together with
+the running maximum of their ends. For a query [qs, qe] the features that
+can overlap it lie between the first feature whose running maximum end
+reaches qs and the last feature starting at or before qe, both found by
+binary search; candidates in that range are expanded and filtered with
+vectorized comparisons. Batches of queries are answered with no Python loop
+over queries or features, in O((n + m) log n + k) for n features, m queries
+and k candidates.
+
+Coordinates are 1-based and closed, like GTF and GenomicInterval nodes.
+"""
+
+import numpy as np
+
+
+class _Chromosome:
+    def __init__(self, starts, ends, index):
+        order = np.argsort(starts, kind="stable")
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.index = index[order]
+        self.max_ends = np.maximum.accumulate(self.ends)
+        # Position of the feature that holds the running maximum end
+        positions = np.arange(len(order), dtype=np.int64)
+        self.max_positions = np.maximum.accumulate(np.where(self.ends == self.max_ends, positions, 0))
+
+
+def _expand(lo, hi):
+    counts = np.maximum(hi - lo, 0)
+    query = np.repeat(np.arange(len(lo), dtype=np.int64), counts)
+    offsets = np.arange(counts.sum(), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+    return query, lo[query] + offsets
+
+
+class IntervalIndex:
+    """
+    Index of genomic features supporting batch overlap, nearest and window queries.
+
+    Usage:
+        genes = IntervalIndex(gtf["seqname"], gtf["start"], gtf["end"])
+        query, feature = genes.overlap(peaks["chr"], peaks["start"], peaks["end"])
+
+    Args:
+        chroms (array-like): Chromosome name of every feature.
+        starts (array-like): 1-based feature starts.
+        ends (array-like): 1-based, inclusive feature ends.
+
+    Results refer to features by their position in the arrays the index was
+    built from.
+    """
+
+    def __init__(self, chroms, starts, ends):
+        chroms = np.asarray(chroms).astype(str)
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = np.asarray(ends, dtype=np.int64)
+        self._size = len(starts)
+        self._chromosomes = {}
+        names, inverse = np.unique(chroms, return_inverse=True)
+        for code, name in enumerate(names):
+            index = np.flatnonzero(inverse == code)
+            self._chromosomes[name] = _Chromosome(starts[index], ends[index], index)
+
+    @classmethod
+    def from_frame(cls, frame, chrom="seqname", start="start", end="end"):
+        """Build an index from the columns of a Polars or pandas DataFrame."""
+        return cls(np.asarray(frame[chrom]), np.asarray(frame[start]), np.asarray(frame[end]))
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def chromosomes(self):
+        return list(self._chromosomes)
+
+    def _queries(self, chroms, starts, ends):
+        chroms = np.asarray(chroms).astype(str)
+        starts = np.atleast_1d(np.asarray(starts, dtype=np.int64))
+        ends = starts if ends is None else np.atleast_1d(np.asarray(ends, dtype=np.int64))
+        if chroms.ndim == 0:
+            chroms = np.full(len(starts), chroms)
+        names, inverse = np.unique(chroms, return_inverse=True)
+        for code, name in enumerate(names):
+            chromosome = self._chromosomes.get(name)
+            if chromosome is not None:
+                query = np.flatnonzero(inverse == code)
+                yield chromosome, query, starts[query], ends[query]
+
+    def overlap(self, chroms, starts, ends=None):
+        """
+        Find every (query, feature) pair that overlaps.
+
+        Args:
+            chroms (array-like or str): Chromosome of every query, or one chromosome for all.
+            starts (array-like): 1-based query starts.
+            ends (array-like, optional): 1-based, inclusive query ends. Defaults to point queries at `starts`.
+
+        Returns:
+            tuple: (query_index, feature_index) int64 arrays, sorted by query.
+        """
+        queries, features = [], []
+        for chromosome, query, qs, qe in self._queries(chroms, starts, ends):
+            lo = np.searchsorted(chromosome.max_ends, qs, side="left")
+            hi = np.searchsorted(chromosome.starts, qe, side="right")
+            q, candidate = _expand(lo, hi)
+            keep = chromosome.ends[candidate] >= qs[q]
+            queries.append(query[q[keep]])
+            features.append(chromosome.index[candidate[keep]])
+        if not queries:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        query, feature = np.concatenate(queries), np.concatenate(features)
+        order = np.argsort(query, kind="stable")
+        return query[order], feature[order]
+
+    def count_overlaps(self, chroms, starts, ends=None):
+        """
+        Count the features overlapping every query.
+
+        Returns:
+            numpy.ndarray: One count per query.
+        """
+        query, _ = self.overlap(chroms, starts, ends)
+        n = len(np.atleast_1d(starts))
+        return np.bincount(query, minlength=n)
+
+    def window(self, chroms, starts, ends=None, flank=0):
+        """
+        Find features within `flank` bases of every query.
+
+        Returns:
+            tuple: (query_index, feature_index) int64 arrays, sorted by query.
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        ends = starts if ends is None else np.asarray(ends, dtype=np.int64)
+        return self.overlap(chroms, starts - flank, ends + flank)
+
+    def nearest(self, chroms, starts, ends=None):
+        """
+        Find the nearest feature to every query.
+
+        An overlapping feature has distance 0; otherwise the distance is the
+        number of bases between the query and the feature, e.g. 1 for
+        adjacent intervals. Ties go to the feature upstream of the query.
+
+        Returns:
+            tuple: (feature_index, distance) int64 arrays with one entry per
+            query; -1 for both where the chromosome has no features.
+        """
+        n = len(np.atleast_1d(starts))
+        feature = np.full(n, -1, dtype=np.int64)
+        distance = np.full(n, -1, dtype=np.int64)
+        for chromosome, query, qs, qe in self._queries(chroms, starts, ends):
+            count = len(chromosome.starts)
+            # Features starting at or before the query end: the one reaching furthest right
+            left = np.searchsorted(chromosome.starts, qe, side="right") - 1
+            has_left = left >= 0
+            left_clipped = np.maximum(left, 0)
+            left_end = chromosome.max_ends[left_clipped]
+            left_position = chromosome.max_positions[left_clipped]
+            left_distance = np.where(has_left, np.maximum(qs - left_end, 0), np.iinfo(np.int64).max)
+            # The first feature starting after the query end
+            right = left + 1
+            has_right = right < count
+            right_clipped = np.minimum(right, count - 1)
+            right_distance = np.where(has_right, chromosome.starts[right_clipped] - qe, np.iinfo(np.int64).max)
+            use_left = left_distance <= right_distance
+            position = np.where(use_left, left_position, right_clipped)
+            feature[query] = chromosome.index[position]
+            distance[query] = np.where(use_left, left_distance, right_distance)
+        return feature, distance
@@ -5,6 +5,9 @@ import requests
 from concurrent.futures import ThreadPoolExecutor
 import io
 import gzip
+from biobox_analytics.utils._jsonl import iter_jsonl_files, find_jsonl_files
+from biobox_analytics.utils._download import download
+from biobox_analytics.utils._metadata import fetch_json
 
 def setup_working_directories(base_path):
     tmp_data = os.path.join(base_path, 'tmp_data')
@@ -22,33 +25,26 @@ def ensure_primitive_or_array_of_primitives(value):
         return json.dumps(value)
 
 
-def read_jsonl_files(directory):
+def read_jsonl_files(directory, columns=None, processes=None):
     """
-    Recursively reads all .jsonl files in a directory and its subdirectories.
+    Recursively reads all .jsonl and .json files, gzipped or not, in a directory and its subdirectories.
+
+    This collects `iter_jsonl_files` into a single list; prefer iterating over
+    `iter_jsonl_files` directly for large trees.
 
     Args:
         directory (str): The path to the directory to scan for .jsonl files.
+        columns (list, optional): Top-level keys to keep from each record.
+        processes (int, optional): Worker processes. None uses every core.
 
     Returns:
-        list: A list of dictionaries, where each dictionary represents the contents of a .jsonl file.
+        list: A list of dictionaries, one per line of the .jsonl files.
     """
-    data = []  # Initialize an empty list to store the data
-    jsonl_files = []  # Initialize an empty list to store the .jsonl files
-    
-    # Find all .jsonl files in the directory and its subdirectories
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith(".jsonl") or file.endswith(".json"):
-                jsonl_files.append(os.path.join(root, file))
-    
-    # Read the contents of each .jsonl file
-    for file_path in tqdm(jsonl_files, desc="Loading .jsonl files"):
-        with open(file_path, 'r') as f:
-            # Read the file line by line
-            for line in f:
-                # Parse each line as JSON and add it to the data list
-                data.append(json.loads(line))
-    
+    data = []
+    with tqdm(desc="Loading .jsonl files", unit=" records") as progress:
+        for batch in iter_jsonl_files(directory, processes=processes, columns=columns):
+            data.extend(batch)
+            progress.update(len(batch))
     return data
 
 def download_gzipped_json(uri):
@@ -0,0 +1,205 @@
+"""
+Resumable, verified downloads with a content-addressed cache
+
+Files are stored once under `<cache_dir>/downloads/sha256/<digest>` and a
+small index maps every URL that was fetched to the digest of its content, so
+repeated builds (and builds of other species sharing a file) never download it
+again. Interrupted transfers are kept as `.part` files, next to the ETag or
+Last-Modified of the response, and resumed with an HTTP Range request that
+only applies while the file on the server is unchanged. Mirrors are URL prefixes, including `file://` directories
+for air-gapped machines, that are tried before the original URL.
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+from urllib.parse import urlparse, unquote
+from urllib.request import url2pathname
+import requests
+from tqdm import tqdm
+import biobox_analytics._setup as _setup
+
+
+def _sha256_text(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _hash_file(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h
+
+
+def mirror_urls(url, mirrors=()):
+    """
+    List the URLs to try for `url`, mirrors first.
+
+    A mirror is a prefix that replaces the scheme and host of `url`, e.g. the
+    mirror `file:///data/mirror/` turns
+    `https://ftp.ensembl.org/pub/release-112/gtf/x.gtf.gz` into
+    `file:///data/mirror/pub/release-112/gtf/x.gtf.gz`.
+
+    Returns:
+        list: Candidate URLs, ending with `url` itself.
+    """
+    path = urlparse(url).path.lstrip("/")
+    return [mirror.rstrip("/") + "/" + path for mirror in mirrors] + [url]
+
+
+def _fetch_file(url, part_path):
+    source = url2pathname(unquote(urlparse(url).path))
+    if not os.path.exists(source):
+        raise FileNotFoundError(source)
+    shutil.copyfile(source, part_path)
+
+
+def _validator(response):
+    # If-Range only accepts a strong ETag or a date
+    etag = response.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return response.headers.get("Last-Modified")
+
+
+def _remove_part(part_path):
+    for path in (part_path, part_path + ".json"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _fetch_http(url, part_path, chunk_size, timeout):
+    meta_path = part_path + ".json"
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    validator = None
+    if offset and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            validator = json.load(f).get("validator")
+    # A partial file is only resumed when the server can tell whether it still matches
+    headers = {"Range": f"bytes={offset}-", "If-Range": validator} if offset and validator else {}
+    with requests.get(url, headers=headers, stream=True, timeout=timeout) as r:
+        if r.status_code == 416 and headers:
+            total = r.headers.get("Content-Range", "").rpartition("/")[2]
+            if not total.isdigit():
+                total = requests.head(url, timeout=timeout, allow_redirects=True).headers.get("Content-Length", "")
+            if total.isdigit() and int(total) == offset:
+                return
+            _remove_part(part_path)
+            raise IOError(f"Partial download of {url} does not match the file on the server, starting over")
+        r.raise_for_status()
+        if r.status_code != 206:
+            offset = 0
+            validator = _validator(r)
+            if validator:
+                with open(meta_path, "w") as f:
+                    json.dump({"url": url, "validator": validator}, f)
+            elif os.path.exists(meta_path):
+                os.remove(meta_path)
+        total = int(r.headers.get("Content-Length", 0)) + offset or None
+        with open(part_path, "ab" if offset else "wb") as f, tqdm(
+            total=total, initial=offset, unit="B", unit_scale=True, desc=os.path.basename(urlparse(url).path)
+        ) as progress:
+            for chunk in r.iter_content(chunk_size=chunk_size):
+                f.write(chunk)
+                progress.update(len(chunk))
+        # requests decodes a Content-Encoding, after which Content-Length no longer counts the file's bytes
+        if total is not None and "Content-Encoding" not in r.headers:
+            size = os.path.getsize(part_path)
+            if size > total:
+                _remove_part(part_path)
+            if size != total:
+                raise IOError(f"Incomplete download of {url}: expected {total} bytes, got {size}")
+
+
+def _retryable(error):
+    # Server errors and rate limiting are worth another attempt; other HTTP errors are not
+    if isinstance(error, requests.HTTPError):
+        status = error.response.status_code if error.response is not None else None
+        return status is not None and (status == 429 or status >= 500)
+    return not isinstance(error, FileNotFoundError)
+
+
+def _fetch(url, part_path, retries, chunk_size, timeout):
+    """Fetch `url` into `part_path`, returning None on success or the last error."""
+    error = None
+    for attempt in range(max(1, retries)):
+        if attempt:
+            time.sleep(min(2 ** (attempt - 1), 30))
+        try:
+            if url.startswith("file://"):
+                _fetch_file(url, part_path)
+            else:
+                _fetch_http(url, part_path, chunk_size, timeout)
+            return None
+        except (requests.RequestException, OSError) as e:
+            error = e
+            if not _retryable(e):
+                break
+    return str(error)
+
+
+def download(url, destination=None, sha256=None, mirrors=None, cache_dir=None, refresh=False, retries=3, chunk_size=1 << 20, timeout=60):
+    """
+    Download `url` through the local content-addressed cache.
+
+    Args:
+        url (str): The file to download. http(s) and file:// URLs are supported.
+        destination (str, optional): Path to copy the downloaded file to. Defaults to returning the cached file.
+        sha256 (str, optional): Expected hex sha256 of the file. Verified after download and used to find it in the cache.
+        mirrors (list, optional): URL prefixes tried before `url`. Defaults to BIOBOX_MIRRORS.
+        cache_dir (str, optional): Cache directory. Defaults to BIOBOX_CACHE_DIR.
+        refresh (bool, optional): Download again even if `url` was fetched before. Defaults to False.
+        retries (int, optional): Attempts per candidate URL, on network errors, 5xx and 429 responses and
+            incomplete transfers; each attempt resumes the previous one. Defaults to 3.
+        chunk_size (int, optional): Bytes read at a time. Defaults to 1 MiB.
+        timeout (int, optional): Seconds to wait for the server. Defaults to 60.
+
+    Returns:
+        str: Path to the downloaded file.
+
+    Raises:
+        ValueError: If the downloaded file does not match `sha256`.
+        IOError: If no candidate URL could be fetched.
+    """
+    root = os.path.join(cache_dir or _setup.BIOBOX_CACHE_DIR, "downloads")
+    blobs = os.path.join(root, "sha256")
+    urls = os.path.join(root, "urls")
+    for directory in (blobs, urls):
+        os.makedirs(directory, exist_ok=True)
+    url_key = _sha256_text(url)
+    index_path = os.path.join(urls, url_key + ".json")
+
+    digest = sha256.lower() if sha256 else None
+    if digest is None and not refresh and os.path.exists(index_path):
+        with open(index_path) as f:
+            digest = json.load(f)["sha256"]
+    blob = os.path.join(blobs, digest) if digest else None
+
+    if blob is None or not os.path.exists(blob):
+        part_path = os.path.join(root, url_key + ".part")
+        errors = []
+        for candidate in mirror_urls(url, _setup.BIOBOX_MIRRORS if mirrors is None else mirrors):
+            error = _fetch(candidate, part_path, retries, chunk_size, timeout)
+            if error is None:
+                break
+            errors.append(f"{candidate}: {error}")
+        else:
+            raise IOError(f"Could not download {url}: " + "; ".join(errors))
+        actual = _hash_file(part_path).hexdigest()
+        if sha256 and actual != digest:
+            _remove_part(part_path)
+            raise ValueError(f"Checksum mismatch for {url}: expected sha256 {digest}, got {actual}")
+        digest = actual
+        blob = os.path.join(blobs, digest)
+        os.replace(part_path, blob)
+        _remove_part(part_path)
+    with open(index_path, "w") as f:
+        json.dump({"url": url, "sha256": digest}, f)
+
+    if destination is None:
+        return blob
+    shutil.copyfile(blob, destination)
+    return destination
@@ -0,0 +1,172 @@
+"""
+Streaming, parallel jsonl reader
+
+Files are cut into work units that a process pool parses independently:
+plain files are memory-mapped and split into byte ranges on line ends,
+block-compressed files (see biobox_analytics.data._bgzf) are split into runs
+of whole gzip members, and other gzip files are decompressed in the calling
+process and handed out as line-aligned chunks.
+"""
+
+import os
+import gzip
+import json
+import mmap
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+JSONL_SUFFIXES = (".jsonl", ".json", ".jsonl.gz", ".json.gz")
+
+
+def find_jsonl_files(directory):
+    """
+    Recursively find the .jsonl and .json files, gzipped or not, in a directory.
+
+    Args:
+        directory (str): The path to the directory to scan.
+
+    Returns:
+        list: Sorted file paths.
+    """
+    if os.path.isfile(directory):
+        return [directory]
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        for file in files:
+            if file.endswith(JSONL_SUFFIXES):
+                paths.append(os.path.join(root, file))
+    return sorted(paths)
+
+
+def _parse_lines(data, columns):
+    records = []
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if columns is not None:
+            record = {k: record[k] for k in columns if k in record}
+        records.append(record)
+    return records
+
+
+def _parse_range(path, start, end, columns):
+    """Parse the lines of a plain file that start within [start, end)."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        if start:
+            start = m.find(b"\n", start - 1) + 1 or len(m)
+        stop = m.find(b"\n", end - 1) + 1 if end < len(m) else len(m)
+        if stop == 0:
+            stop = len(m)
+        if start >= stop:
+            return []
+        return _parse_lines(m[start:stop], columns)
+
+
+def _parse_members(path, start, end, columns):
+    """Parse a run of whole gzip members spanning [start, end)."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        return _parse_lines(gzip.decompress(f.read(end - start)), columns)
+
+
+def _parse_bytes(data, columns):
+    return _parse_lines(data, columns)
+
+
+def _block_ranges(path, chunk_bytes):
+    from biobox_analytics.data._bgzf import iter_blocks
+
+    start = end = 0
+    for offset, size in iter_blocks(path):
+        if end - start >= chunk_bytes:
+            yield start, end
+            start = offset
+        end = offset + size
+    if end > start:
+        yield start, end
+
+
+def _is_block_compressed(path):
+    from biobox_analytics.data._bgzf import _HEADER, _block_size
+
+    with open(path, "rb") as f:
+        header = f.read(_HEADER.size)
+    try:
+        _block_size(header, path, 0)
+    except ValueError:
+        return False
+    return True
+
+
+def _work_units(path, chunk_bytes, columns):
+    """Yield (function, args) tuples covering the whole file."""
+    if path.endswith(".gz"):
+        if _is_block_compressed(path):
+            for start, end in _block_ranges(path, chunk_bytes):
+                yield _parse_members, (path, start, end, columns)
+            return
+        with gzip.open(path, "rb") as f:
+            tail = b""
+            for chunk in iter(lambda: f.read(chunk_bytes), b""):
+                chunk = tail + chunk
+                cut = chunk.rfind(b"\n") + 1
+                tail = chunk[cut:]
+                if cut:
+                    yield _parse_bytes, (chunk[:cut], columns)
+            if tail:
+                yield _parse_bytes, (tail, columns)
+        return
+    size = os.path.getsize(path)
+    for start in range(0, size, chunk_bytes):
+        yield _parse_range, (path, start, min(start + chunk_bytes, size), columns)
+
+
+def iter_jsonl_files(directory, batch_size=65536, processes=None, columns=None, chunk_bytes=1 << 25):
+    """
+    Stream the records of every .jsonl/.json file (optionally gzipped) in a directory.
+
+    Files are parsed in parallel but records are yielded in file and line
+    order. At most `2 * processes` work units are in flight, so memory stays
+    bounded by the chunk size rather than the size of the tree.
+
+    Args:
+        directory (str): A directory to scan recursively, or a single file.
+        batch_size (int, optional): Records per yielded batch. Defaults to 65536.
+        processes (int, optional): Worker processes. 1 parses inline, None uses every core. Defaults to None.
+        columns (list, optional): Top-level keys to keep; other keys are dropped as each line is parsed.
+        chunk_bytes (int, optional): Approximate size of one work unit in bytes. Defaults to 32 MiB.
+
+    Yields:
+        list: Batches of up to `batch_size` dictionaries.
+    """
+    processes = max(1, processes or os.cpu_count() or 1)
+    columns = list(columns) if columns is not None else None
+    units = (
+        unit
+        for path in find_jsonl_files(directory)
+        for unit in _work_units(path, chunk_bytes, columns)
+    )
+
+    def parsed():
+        if processes == 1:
+            for fn, args in units:
+                yield fn(*args)
+            return
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for fn, args in units:
+                pending.append(executor.submit(fn, *args))
+                if len(pending) >= 2 * processes:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+    batch = []
+    for records in parsed():
+        batch.extend(records)
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    if batch:
+        yield batch
@@ -0,0 +1,60 @@
+"""
+On-disk cache for JSON metadata lookups
+
+Responses of small REST lookups (ENA taxonomy, Ensembl assembly info, ...)
+are kept under `<cache_dir>/metadata`, one file per URL, and reused until
+they are older than a TTL. When a refresh fails, for example on an offline
+machine, the stale response is used instead.
+"""
+
+import os
+import json
+import time
+import hashlib
+import requests
+import biobox_analytics._setup as _setup
+
+METADATA_TTL = 7 * 24 * 3600
+
+
+def fetch_json(url, headers=None, ttl=METADATA_TTL, cache_dir=None, timeout=60):
+    """
+    GET `url` and decode its JSON body, through the metadata cache.
+
+    Only successful responses are cached; error bodies are returned as-is so
+    callers can report them.
+
+    Args:
+        url (str): The URL to fetch.
+        headers (dict, optional): Request headers.
+        ttl (int, optional): Seconds a cached response stays fresh; None never expires it,
+            0 always refreshes. Defaults to 7 days.
+        cache_dir (str, optional): Cache directory. Defaults to BIOBOX_CACHE_DIR.
+        timeout (int, optional): Seconds to wait for the server. Defaults to 60.
+
+    Returns:
+        The decoded JSON.
+    """
+    directory = os.path.join(cache_dir or _setup.BIOBOX_CACHE_DIR, "metadata")
+    path = os.path.join(directory, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+    cached = None
+    if os.path.exists(path):
+        with open(path) as f:
+            cached = json.load(f)
+        if ttl is None or time.time() - cached["fetched_at"] < ttl:
+            return cached["data"]
+    try:
+        r = requests.get(url, headers=headers, timeout=timeout)
+        data = r.json()
+    except (requests.RequestException, ValueError) as e:
+        if cached is None:
+            raise
+        print(f"Could not refresh {url} ({e}); using the cached response from {time.ctime(cached['fetched_at'])}")
+        return cached["data"]
+    if r.ok:
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"url": url, "fetched_at": time.time(), "data": data}, f)
+        os.replace(tmp_path, path)
+    return data
@@ -56,7 +56,6 @@ setup(
         'gotrue==2.4.4',
         'graphviz==0.20.3',
         'greenlet==3.0.3',
-        'gtfparse==2.5.0',
         'h11==0.14.0',
         'h5py==3.11.0',
         'hbreader==0.9.1',
@@ -0,0 +1,51 @@
+import gzip
+import os
+
+import pytest
+
+from biobox_analytics.data._bgzf import BlockGzipWriter, compress_block, iter_blocks, read_block
+
+
+def _write(path, blocks, threads=1):
+    writer = BlockGzipWriter(path, threads=threads)
+    for block in blocks:
+        writer.write_block(block)
+    writer.close()
+    return writer
+
+
+@pytest.mark.parametrize("threads", [1, 3])
+def test_members_are_listed_and_read_back(tmp_path, threads):
+    path = str(tmp_path / "x.gz")
+    blocks = [f'{{"_id": "n{i}"}}\n'.encode() * (i + 1) for i in range(10)]
+    writer = _write(path, blocks, threads)
+
+    members = list(iter_blocks(path))
+    assert [offset for offset, _ in members] == writer.block_offsets
+    assert sum(size for _, size in members) == os.path.getsize(path) == writer.size
+    assert [read_block(path, offset) for offset, _ in members] == blocks
+    with gzip.open(path, "rb") as f:
+        assert f.read() == b"".join(blocks)
+
+
+def test_append_keeps_members_and_hash(tmp_path):
+    path = str(tmp_path / "x.gz")
+    first = _write(path, [b"a\n"])
+    second = _write(path, [b"b\n", b"c\n"])
+    assert second.start_offset == first.size
+    assert [read_block(path, offset) for offset, _ in iter_blocks(path)] == [b"a\n", b"b\n", b"c\n"]
+    assert second.hexdigest() == _write(str(tmp_path / "y.gz"), [b"a\n", b"b\n", b"c\n"]).hexdigest()
+
+
+def test_compress_block_sizes_itself():
+    member = compress_block(b"hello\n" * 100)
+    assert int.from_bytes(member[16:20], "little") == len(member)
+    assert gzip.decompress(member) == b"hello\n" * 100
+
+
+def test_plain_gzip_is_rejected(tmp_path):
+    path = str(tmp_path / "plain.gz")
+    with gzip.open(path, "wb") as f:
+        f.write(b"x\n")
+    with pytest.raises(ValueError, match="not block-compressed"):
+        list(iter_blocks(path))
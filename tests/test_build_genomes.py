@@ -0,0 +1,22 @@
+import pytest
+
+from biobox_analytics.data import build_genomes
+from biobox_analytics.data.adapters.genome._batch import _pack_name
+
+
+def test_pack_names():
+    assert _pack_name({"species": "Homo sapiens"}) == "homo_sapiens"
+    assert _pack_name({"species": "homo sapiens", "assembly_json": {"assembly_name": "GRCh38"}}) == "homo_sapiens_GRCh38"
+    assert _pack_name({"species": "homo sapiens", "name": "human-111"}) == "human-111"
+
+
+def test_duplicate_names_are_rejected_before_downloading(tmp_path):
+    with pytest.raises(ValueError, match="homo_sapiens"):
+        build_genomes(
+            [
+                {"species": "homo sapiens", "gtf_url": "file:///missing/111.gtf.gz"},
+                {"species": "homo sapiens", "gtf_url": "file:///missing/112.gtf.gz"},
+            ],
+            str(tmp_path),
+        )
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,59 @@
+import gzip
+import json
+import os
+
+import numpy as np
+
+from biobox_analytics.data import DataPackWriter
+from biobox_analytics.data._dedupe import DiskHashSet
+
+
+def _node(i):
+    return {"_id": f"n{i}", "labels": ["Node"], "properties": {}}
+
+
+def _ids(path):
+    with gzip.open(path, "rt") as f:
+        return [json.loads(line)["_id"] for line in f]
+
+
+def test_disk_hash_set_matches_set(tmp_path):
+    rng = np.random.default_rng(0)
+    seen = DiskHashSet(str(tmp_path), buffer_size=500, bloom_capacity=10000, merge_chunk=64)
+    expected = set()
+    for _ in range(40):
+        batch = rng.integers(0, 3000, size=200).astype(np.uint64)
+        new = seen.add_new(batch)
+        first = {}
+        for i, value in enumerate(batch.tolist()):
+            first.setdefault(value, i)
+        want = [value not in expected and first[value] == i for i, value in enumerate(batch.tolist())]
+        assert new.tolist() == want
+        expected.update(batch.tolist())
+        assert len(seen) == len(expected)
+    seen.close()
+    assert not os.path.exists(seen.directory)
+
+
+def test_persistent_set_reloads(tmp_path):
+    path = str(tmp_path / "seen")
+    seen = DiskHashSet(path=path, buffer_size=4)
+    seen.add_new(np.arange(10, dtype=np.uint64))
+    seen.close()
+
+    seen = DiskHashSet(path=path, buffer_size=4, bloom_capacity=100)
+    assert len(seen) == 10
+    assert seen.add_new(np.arange(5, 15, dtype=np.uint64)).tolist() == [False] * 5 + [True] * 5
+    seen.close()
+    assert len(DiskHashSet(path=path)) == 15
+
+
+def test_seen_dir_dedupes_across_writers(tmp_path):
+    seen_dir = str(tmp_path / "seen")
+    for name, ids in [("a", range(0, 6)), ("b", range(3, 9))]:
+        os.makedirs(tmp_path / name)
+        with DataPackWriter(directory=str(tmp_path / name), seen_dir=seen_dir) as writer:
+            writer.write_nodes([_node(i) for i in ids])
+    assert _ids(tmp_path / "a" / "node.jsonl.gz") == [f"n{i}" for i in range(0, 6)]
+    assert _ids(tmp_path / "b" / "node.jsonl.gz") == [f"n{i}" for i in range(6, 9)]
+    assert writer.stats["node"]["duplicates"] == 3
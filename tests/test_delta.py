@@ -0,0 +1,28 @@
+import gzip
+import json
+import os
+
+from biobox_analytics.data import DataPackWriter, load_manifest
+
+
+def _edge(a, b):
+    return {"from": {"uuid": a}, "to": {"uuid": b}, "label": "next"}
+
+
+def test_delta_with_duplicate_base_records(tmp_path):
+    base = str(tmp_path / "base")
+    os.makedirs(base)
+    with DataPackWriter(directory=base, hashes=True) as writer:
+        writer.write_edges([_edge("n1", "n2"), _edge("n1", "n2"), _edge("n2", "n3")])
+
+    patch = str(tmp_path / "patch")
+    os.makedirs(patch)
+    with DataPackWriter(directory=patch, base=base) as writer:
+        writer.write_edges([_edge("n1", "n2")])
+
+    counts = load_manifest(patch)["delta"]["edge"]
+    assert counts["removed"] == 1
+    assert counts["unchanged"] == 1
+    with gzip.open(os.path.join(patch, "edge-removed.jsonl.gz"), "rt") as f:
+        removed = [json.loads(line) for line in f]
+    assert removed == [_edge("n2", "n3")]
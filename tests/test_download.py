@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import biobox_analytics.utils._download as _download
+from biobox_analytics.utils._download import _sha256_text, download
+
+
+class _Handler(BaseHTTPRequestHandler):
+    files = {}
+    failures = {}
+    requests = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.do_GET(body=False)
+
+    def do_GET(self, body=True):
+        self.requests.append((self.path, self.headers.get("Range"), self.headers.get("If-Range")))
+        if self.failures.get(self.path):
+            self.send_error(self.failures[self.path].pop(0))
+            return
+        if self.path not in self.files:
+            self.send_error(404)
+            return
+        data, etag = self.files[self.path]
+        start = 0
+        ranged = self.headers.get("Range") and self.headers.get("If-Range") == etag
+        if ranged:
+            start = int(self.headers["Range"][len("bytes="):-1])
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(data)}")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(data) - 1}/{len(data)}")
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(data) - start))
+        self.end_headers()
+        if body:
+            self.wfile.write(data[start:])
+
+
+@pytest.fixture
+def server():
+    _Handler.files = {}
+    _Handler.failures = {}
+    _Handler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}", _Handler
+    httpd.shutdown()
+
+
+def _part(cache, url):
+    return os.path.join(cache, "downloads", _sha256_text(url) + ".part")
+
+
+def _write_part(cache, url, data, validator):
+    part = _part(cache, url)
+    os.makedirs(os.path.dirname(part), exist_ok=True)
+    with open(part, "wb") as f:
+        f.write(data)
+    with open(part + ".json", "w") as f:
+        json.dump({"url": url, "validator": validator}, f)
+
+
+def test_resumes_unchanged_file(server, tmp_path):
+    base, handler = server
+    data = os.urandom(5000)
+    handler.files["/f.gz"] = (data, '"v1"')
+    url = base + "/f.gz"
+    cache = str(tmp_path)
+    _write_part(cache, url, data[:2000], '"v1"')
+
+    path = download(url, cache_dir=cache, sha256=hashlib.sha256(data).hexdigest())
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert handler.requests == [("/f.gz", "bytes=2000-", '"v1"')]
+    assert not os.path.exists(_part(cache, url) + ".json")
+
+
+def test_restarts_changed_file(server, tmp_path):
+    base, handler = server
+    data = os.urandom(5000)
+    handler.files["/f.gz"] = (data, '"v2"')
+    url = base + "/f.gz"
+    cache = str(tmp_path)
+    _write_part(cache, url, os.urandom(2000), '"v1"')
+
+    with open(download(url, cache_dir=cache), "rb") as f:
+        assert f.read() == data
+
+
+def test_416_with_stale_part_starts_over(server, tmp_path):
+    base, handler = server
+    data = os.urandom(3000)
+    handler.files["/f.gz"] = (data, '"v1"')
+    url = base + "/f.gz"
+    cache = str(tmp_path)
+    _write_part(cache, url, os.urandom(4000), '"v1"')
+
+    with open(download(url, cache_dir=cache), "rb") as f:
+        assert f.read() == data
+    assert [r[1] for r in handler.requests] == ["bytes=4000-", None]
+
+
+def test_416_with_complete_part(server, tmp_path):
+    base, handler = server
+    data = os.urandom(3000)
+    handler.files["/f.gz"] = (data, '"v1"')
+    url = base + "/f.gz"
+    cache = str(tmp_path)
+    _write_part(cache, url, data, '"v1"')
+
+    with open(download(url, cache_dir=cache), "rb") as f:
+        assert f.read() == data
+    assert len(handler.requests) == 1
+
+
+def test_retries_server_errors_then_uses_cache(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(_download.time, "sleep", lambda seconds: None)
+    base, handler = server
+    data = os.urandom(1000)
+    handler.files["/f.gz"] = (data, '"v1"')
+    handler.failures["/f.gz"] = [503, 429]
+    cache = str(tmp_path)
+
+    path = download(base + "/f.gz", cache_dir=cache)
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert len(handler.requests) == 3
+    assert download(base + "/f.gz", cache_dir=cache) == path
+    assert len(handler.requests) == 3
+
+
+def test_client_errors_are_not_retried(server, tmp_path):
+    base, handler = server
+    with pytest.raises(IOError, match="404"):
+        download(base + "/missing.gz", cache_dir=str(tmp_path), retries=5)
+    assert len(handler.requests) == 1
+
+
+def test_mirror_is_tried_first(server, tmp_path):
+    base, handler = server
+    data = os.urandom(1000)
+    handler.files["/pub/f.gz"] = (b"origin", '"v1"')
+    os.makedirs(tmp_path / "mirror" / "pub")
+    with open(tmp_path / "mirror" / "pub" / "f.gz", "wb") as f:
+        f.write(data)
+    mirrors = [(tmp_path / "empty").as_uri(), (tmp_path / "mirror").as_uri()]
+
+    destination = str(tmp_path / "out.gz")
+    assert download(base + "/pub/f.gz", destination, mirrors=mirrors, cache_dir=str(tmp_path / "cache")) == destination
+    with open(destination, "rb") as f:
+        assert f.read() == data
+    assert handler.requests == []
+
+
+def test_checksum_mismatch(server, tmp_path):
+    base, handler = server
+    handler.files["/f.gz"] = (b"data", '"v1"')
+    with pytest.raises(ValueError, match="Checksum mismatch"):
+        download(base + "/f.gz", sha256="0" * 64, cache_dir=str(tmp_path))
+    assert not os.path.exists(_part(str(tmp_path), base + "/f.gz"))
@@ -0,0 +1,111 @@
+import glob
+import gzip
+import json
+import os
+
+import biobox_analytics._setup as _setup
+from biobox_analytics.data.adapters.genome import GenomeAdapter
+
+ASSEMBLY = {
+    "assembly_name": "test",
+    "karyotype": ["1", "2"],
+    "top_level_region": [
+        {"name": "1", "length": 60000, "coord_system": "chromosome"},
+        {"name": "2", "length": 40000, "coord_system": "chromosome"},
+    ] + [{"name": f"scaffold_{i}", "length": 1500, "coord_system": "scaffold"} for i in range(20)],
+}
+
+
+def _gtf(path):
+    lines = []
+    for i, (chrom, start) in enumerate([("1", 100), ("1", 30000), ("2", 5000), ("scaffold_3", 200), ("unplaced", 10)]):
+        attributes = f'gene_id "G{i}"; gene_name "g{i}"; transcript_id "T{i}";'
+        lines.append(f"{chrom}\tt\tgene\t{start}\t{start + 900}\t.\t+\t.\t{attributes}\n")
+        lines.append(f"{chrom}\tt\ttranscript\t{start}\t{start + 900}\t.\t+\t.\t{attributes}\n")
+    with gzip.open(path, "wt") as f:
+        f.writelines(lines)
+    return str(path)
+
+
+def _adapter():
+    return GenomeAdapter(taxon=9606, assembly_json=ASSEMBLY, bin_sizes=(1000,))
+
+
+def _lines(directory):
+    return sorted(line for path in glob.glob(os.path.join(directory, "*.jsonl.gz")) for line in gzip.open(path, "rt"))
+
+
+def _canonical(record):
+    return json.dumps(record, sort_keys=True)
+
+
+def test_build_packs_scaffolds_and_matches_serial(tmp_path, monkeypatch):
+    monkeypatch.setattr(_setup, "BIOBOX_CACHE_DIR", str(tmp_path / "cache"))
+    gtf = _gtf(tmp_path / "t.gtf.gz")
+
+    adapter = _adapter()
+    adapter._load_gtf(gtf)
+    parts = [name for name, _ in adapter._partitions(2)]
+    assert parts[:2] == ["1", "2"]
+    assert len(parts) < 10
+    assert parts[-1] == "other"
+
+    serial = str(tmp_path / "serial")
+    os.makedirs(serial)
+    adapter = _adapter()
+    with adapter.open_writer(serial) as writer:
+        adapter.iterate_nodes(gtf_file_path=gtf, writer=writer)
+        adapter.iterate_edges(writer=writer)
+    built = str(tmp_path / "built")
+    _adapter().build(built, processes=1, gtf_file_path=gtf)
+    assert _lines(built) == _lines(serial)
+
+
+def test_iterate_is_lazy_and_matches_written(tmp_path, monkeypatch):
+    monkeypatch.setattr(_setup, "BIOBOX_CACHE_DIR", str(tmp_path / "cache"))
+    gtf = _gtf(tmp_path / "t.gtf.gz")
+    adapter = _adapter()
+    nodes = adapter.iterate_nodes(write_to_disk=False, gtf_file_path=gtf)
+    edges = adapter.iterate_edges(write_to_disk=False, batch_size=50)
+    assert iter(nodes) is nodes and iter(edges) is edges
+
+    batches = list(edges)
+    assert all(len(batch) == 50 for batch in batches[:-1])
+    records = list(nodes) + [edge for batch in batches for edge in batch]
+
+    written = str(tmp_path / "written")
+    os.makedirs(written)
+    adapter = _adapter()
+    with adapter.open_writer(written) as writer:
+        adapter.iterate_nodes(gtf_file_path=gtf, writer=writer)
+        adapter.iterate_edges(writer=writer)
+    assert sorted(map(_canonical, records)) == sorted(_canonical(json.loads(line)) for line in _lines(written))
+
+
+STRUCTURE_GTF = (
+    '1\tt\ttranscript\t100\t900\t.\t+\t.\tgene_id "G1"; transcript_id "T1";\n'
+    '1\tt\texon\t100\t300\t.\t+\t.\tgene_id "G1"; transcript_id "T1"; exon_number 1; exon_id "E1";\n'
+    '1\tt\texon\t500\t900\t.\t+\t.\tgene_id "G1"; transcript_id "T1"; exon_number "2";\n'
+    '1\tt\tCDS\t150\t300\t.\t+\t0\tgene_id "G1"; transcript_id "T1"; exon_number 1; protein_id "P1";\n'
+    '1\tt\tfive_prime_utr\t100\t149\t.\t+\t.\tgene_id "G1"; transcript_id "T1";\n'
+)
+
+
+def test_structure_nodes_and_edges(tmp_path, monkeypatch):
+    monkeypatch.setattr(_setup, "BIOBOX_CACHE_DIR", str(tmp_path / "cache"))
+    path = tmp_path / "s.gtf.gz"
+    with gzip.open(path, "wt") as f:
+        f.write(STRUCTURE_GTF)
+    adapter = GenomeAdapter(taxon=9606, assembly_json=ASSEMBLY, bin_sizes=(1000,), structure_nodes=True)
+    nodes = list(adapter.iterate_nodes(write_to_disk=False, gtf_file_path=str(path)))
+    edges = list(adapter.iterate_edges(write_to_disk=False))
+
+    structure = {node["_id"]: node for node in nodes if node["labels"][0] in ("Exon", "CDS", "UTR")}
+    assert sorted(structure) == ["E1", "T1:CDS:150-300", "T1:UTR:100-149", "T1:exon:500-900"]
+    assert structure["T1:CDS:150-300"]["properties"]["protein"] == "P1"
+    assert structure["T1:UTR:100-149"]["properties"]["utrType"] == "five_prime_utr"
+    found = {(edge["label"], edge["to"]["uuid"]): edge.get("properties") for edge in edges if edge["from"]["uuid"] == "T1"}
+    assert found[("has exon", "E1")] == {"exonNumber": 1}
+    assert found[("has exon", "T1:exon:500-900")] == {"exonNumber": 2}
+    assert found[("has CDS", "T1:CDS:150-300")] == {"exonNumber": 1, "phase": 0}
+    assert found[("has UTR", "T1:UTR:100-149")] is None
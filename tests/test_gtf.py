@@ -0,0 +1,62 @@
+import gzip
+import os
+
+import pytest
+
+import biobox_analytics.data.adapters.genome._gtf as _gtf
+from biobox_analytics.data.adapters.genome._gtf import iter_gtf_frames, load_gtf, parse_gtf
+
+GTF = (
+    "#!genome-build test\n"
+    '1\tensembl\tgene\t11\t100\t.\t+\t.\tgene_id "G1"; gene_name "Alpha";\n'
+    '1\tensembl\texon\t11\t50\t.\t+\t.\tgene_id "G1"; transcript_id "T1"; exon_number 1; exon_id "E1";\n'
+    '1\tensembl\texon\t61\t100\t.\t+\t.\tgene_id "G1"; transcript_id "T1"; exon_number "2"; exon_id E2\n'
+    '2\tensembl\tgene\t5\t80\t.\t-\t.\tgene_id "G2"; note "a; b";\n'
+)
+
+
+def _write(path, text):
+    with gzip.open(path, "wt") as f:
+        f.write(text)
+    return str(path)
+
+
+def test_parse_gtf_attributes(tmp_path):
+    path = _write(tmp_path / "t.gtf.gz", GTF)
+    gtf = parse_gtf(path, ["exon"], ["seqname", "start", "end", "transcript_id", "exon_number", "exon_id", "gene_name"])
+    assert gtf.rows() == [
+        ("1", 11, 50, "T1", "1", "E1", ""),
+        ("1", 61, 100, "T1", "2", "E2", ""),
+    ]
+
+
+def test_quoted_values_keep_semicolons(tmp_path):
+    path = _write(tmp_path / "t.gtf.gz", GTF)
+    gtf = parse_gtf(path, ["gene"], ["gene_id", "gene_name", "note"])
+    assert gtf.rows() == [("G1", "Alpha", ""), ("G2", "", "a; b")]
+
+
+def test_chunks_split_on_lines(tmp_path):
+    path = _write(tmp_path / "t.gtf.gz", GTF * 50)
+    frames = list(iter_gtf_frames(path, None, ["seqname", "feature", "exon_number"], chunk_bytes=300, threads=2, max_bytes=600))
+    assert len(frames) > 1
+    assert sum(len(frame) for frame in frames) == 200
+    assert parse_gtf(path, None, ["seqname", "feature", "exon_number"], chunk_bytes=300).equals(parse_gtf(path, None, ["seqname", "feature", "exon_number"]))
+
+
+def test_load_gtf_cache(tmp_path, monkeypatch):
+    path = _write(tmp_path / "t.gtf.gz", GTF)
+    cache = str(tmp_path / "cache")
+    gtf = load_gtf(path, ["gene"], ["gene_id", "gene_name"], cache_dir=cache)
+    assert len(os.listdir(os.path.join(cache, "gtf"))) == 1
+
+    def fail(*args):
+        raise AssertionError("parsed again")
+
+    monkeypatch.setattr(_gtf, "parse_gtf", fail)
+    assert load_gtf(path, ["gene"], ["gene_id", "gene_name"], cache_dir=cache).equals(gtf)
+    with pytest.raises(AssertionError, match="parsed again"):
+        load_gtf(path, ["gene"], ["gene_id"], cache_dir=cache)
+    _write(path, GTF.replace("Alpha", "Beta"))
+    with pytest.raises(AssertionError, match="parsed again"):
+        load_gtf(path, ["gene"], ["gene_id", "gene_name"], cache_dir=cache)
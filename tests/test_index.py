@@ -0,0 +1,39 @@
+import pytest
+
+from biobox_analytics.data import DataPackIndex, DataPackWriter
+
+
+def _node(i):
+    return {"_id": f"n{i}", "labels": ["Node"], "properties": {"name": f"näme {i}"}}
+
+
+def _edge(a, b):
+    return {"from": {"uuid": f"n{a}"}, "to": {"uuid": f"n{b}"}, "label": "next"}
+
+
+@pytest.fixture
+def pack(tmp_path):
+    directory = str(tmp_path)
+    with DataPackWriter(directory=directory, index=True, block_size=200, shard_records=70) as writer:
+        writer.write_nodes(_node(i) for i in range(200))
+        writer.write_edges(_edge(i, i + 1) for i in range(200))
+        writer.write_edges([_edge(5, 50)])
+    return directory
+
+
+def test_lookup_across_blocks_and_shards(pack):
+    index = DataPackIndex(pack)
+    assert len(index) == 401
+    for i in (0, 69, 70, 137, 199):
+        assert index.get(f"n{i}", kind="node") == _node(i)
+    assert index.get("missing") is None
+    found = index.get_many(["n5", "n150", "n5", "missing"], kind="edge")
+    assert found == {"n5": [_edge(5, 6), _edge(5, 50)], "n150": [_edge(150, 151)], "missing": []}
+    assert index.get_many(["n3"]) == {"n3": [_node(3), _edge(3, 4)]}
+
+
+def test_unindexed_pack_is_rejected(tmp_path):
+    with DataPackWriter(directory=str(tmp_path)) as writer:
+        writer.write_nodes([_node(0)])
+    with pytest.raises(ValueError, match="No indexed shards"):
+        DataPackIndex(str(tmp_path))
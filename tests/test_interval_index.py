@@ -0,0 +1,60 @@
+import numpy as np
+
+from biobox_analytics.intervals import IntervalIndex, bin_start, interval_id, overlap_bins
+
+
+def _features(rng, n):
+    chroms = rng.choice(["1", "2"], n)
+    starts = rng.integers(1, 5000, n)
+    ends = starts + rng.integers(0, 400, n)
+    return chroms, starts, ends
+
+
+def _distance(qs, qe, fs, fe):
+    return max(fs - qe, qs - fe, 0)
+
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(1)
+    chroms, starts, ends = _features(rng, 150)
+    index = IntervalIndex(chroms, starts, ends)
+    q_chroms = rng.choice(["1", "2", "3"], 100)
+    q_starts = rng.integers(1, 5500, 100)
+    q_ends = q_starts + rng.integers(0, 100, 100)
+
+    def brute(flank=0):
+        return {
+            (q, f)
+            for q in range(100) for f in range(150)
+            if q_chroms[q] == chroms[f] and starts[f] <= q_ends[q] + flank and ends[f] >= q_starts[q] - flank
+        }
+
+    query, feature = index.overlap(q_chroms, q_starts, q_ends)
+    assert list(query) == sorted(query)
+    assert set(zip(query.tolist(), feature.tolist())) == brute()
+    assert set(zip(*(a.tolist() for a in index.window(q_chroms, q_starts, q_ends, flank=50)))) == brute(50)
+    counts = index.count_overlaps(q_chroms, q_starts, q_ends)
+    assert counts.tolist() == [sum(1 for q, _ in brute() if q == i) for i in range(100)]
+
+    feature, distance = index.nearest(q_chroms, q_starts, q_ends)
+    for q in range(100):
+        candidates = [_distance(q_starts[q], q_ends[q], starts[f], ends[f]) for f in range(150) if chroms[f] == q_chroms[q]]
+        if not candidates:
+            assert (feature[q], distance[q]) == (-1, -1)
+            continue
+        assert distance[q] == min(candidates)
+        assert _distance(q_starts[q], q_ends[q], starts[feature[q]], ends[feature[q]]) == distance[q]
+
+
+def test_point_queries_and_single_chromosome():
+    index = IntervalIndex(["1", "1"], [10, 100], [20, 200])
+    assert [a.tolist() for a in index.overlap("1", [15, 50, 150])] == [[0, 2], [0, 1]]
+    assert index.nearest("1", [50])[1].tolist() == [30]
+    assert len(index) == 2 and index.chromosomes == ["1"]
+
+
+def test_binning():
+    assert bin_start([1, 1000, 1001], 1000).tolist() == [1, 1, 1001]
+    assert interval_id(9606, "X", 2500) == "9606:X:2001-3000"
+    feature, bins = overlap_bins([1, 990, 2500], [10, 1010, 2600], 1000, n_bins=3)
+    assert list(zip(feature.tolist(), bins.tolist())) == [(0, 0), (1, 0), (1, 1), (2, 2)]
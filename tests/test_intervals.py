@@ -0,0 +1,19 @@
+from biobox_analytics.data.adapters.genome import _intervals
+
+
+def test_interval_uuids_are_unique_across_levels():
+    chromosomes = [{"name": "1", "length": 2500}, {"name": "MT", "length": 100}]
+    nodes = [
+        node
+        for bin_size in (1000, 2000)
+        for frame in _intervals.iter_interval_nodes(chromosomes, 9606, "homo sapiens", bin_size)
+        for node in frame.iter_rows(named=True)
+    ]
+    uuids = [node["properties"]["uuid"] for node in nodes]
+    assert len(set(uuids)) == len(nodes) == 7
+    assert [node["_id"] for node in nodes] == uuids
+    mt = [node["properties"] for node in nodes if node["properties"]["chr"] == "MT"]
+    assert [(p["uuid"], p["end"], p["binSize"]) for p in mt] == [
+        ("9606:MT:1-1000", 100, 1000),
+        ("9606:MT:1-2000", 100, 2000),
+    ]
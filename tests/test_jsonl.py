@@ -0,0 +1,39 @@
+import gzip
+import json
+import os
+
+import pytest
+
+from biobox_analytics.data import DataPackWriter
+from biobox_analytics.utils import iter_jsonl_files, read_jsonl_files
+
+
+def _records(prefix, n):
+    return [{"_id": f"{prefix}{i}", "labels": ["Node"], "properties": {"i": i}} for i in range(n)]
+
+
+@pytest.fixture
+def tree(tmp_path):
+    with open(tmp_path / "a.jsonl", "w") as f:
+        f.writelines(json.dumps(record) + "\n" for record in _records("a", 300))
+    os.makedirs(tmp_path / "sub")
+    with gzip.open(tmp_path / "sub" / "b.json.gz", "wt") as f:
+        f.writelines(json.dumps(record) + "\n" for record in _records("b", 200))
+    with DataPackWriter("c.jsonl.gz", directory=str(tmp_path / "sub"), block_size=500) as writer:
+        writer.write_nodes(_records("c", 250))
+    with open(tmp_path / "notes.txt", "w") as f:
+        f.write("not jsonl\n")
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize("processes", [1, 2])
+def test_records_in_file_and_line_order(tree, processes):
+    batches = list(iter_jsonl_files(tree, batch_size=64, processes=processes, chunk_bytes=1000))
+    assert all(len(batch) == 64 for batch in batches[:-1])
+    records = [record for batch in batches for record in batch]
+    assert records == _records("a", 300) + _records("b", 200) + _records("c", 250)
+
+
+def test_columns_are_projected(tree):
+    records = read_jsonl_files(os.path.join(tree, "sub"), columns=["_id"], processes=1)
+    assert records == [{"_id": record["_id"]} for record in _records("b", 200) + _records("c", 250)]
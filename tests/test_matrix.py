@@ -0,0 +1,87 @@
+import anndata
+import h5py
+import numpy as np
+import pandas as pd
+import polars as pl
+import scipy.sparse
+
+from biobox_analytics.data.adapters._matrix import cell_ids, chunk_aligned_bounds, iter_matrix_edge_frames, matrix_edge_frame
+
+
+def _dense(rng, shape):
+    values = rng.random(shape)
+    values[values < 0.7] = 0
+    values[0, 0] = -1
+    return values
+
+
+def _expected(dense, cells, features):
+    return [
+        (cells[i], features[j], float(dense[i, j]))
+        for i in range(dense.shape[0]) for j in range(dense.shape[1]) if dense[i, j] > 0
+    ]
+
+
+def _rows(frame):
+    return [(row["from"]["uuid"], row["to"]["uuid"], row["properties"]["normValue"]) for row in frame.iter_rows(named=True)]
+
+
+def test_edges_match_dense_matrix():
+    rng = np.random.default_rng(0)
+    dense = _dense(rng, (30, 12))
+    cells = pl.Series([f"c{i}" for i in range(30)])
+    features = pl.Series([f"g{j}" for j in range(12)])
+
+    for block in (dense, scipy.sparse.csr_matrix(dense), scipy.sparse.csc_matrix(dense)):
+        frame = matrix_edge_frame(block, cells, features, "expresses", "normValue")
+        assert frame.columns == ["from", "to", "label", "properties"]
+        assert frame["label"].unique().to_list() == ["expresses"]
+        assert _rows(frame) == _expected(dense, cells.to_list(), features.to_list())
+
+    blocks = list(iter_matrix_edge_frames(scipy.sparse.csr_matrix(dense), cells, features, "expresses", "normValue", batch_rows=7))
+    assert [(low, high) for low, high, _ in blocks] == [(0, 7), (7, 14), (14, 21), (21, 28), (28, 30)]
+    assert [row for _, _, frame in blocks for row in _rows(frame)] == _expected(dense, cells.to_list(), features.to_list())
+
+
+def test_cell_ids():
+    obs = pd.DataFrame({"library": ["L1", "L2"]}, index=["AAAC", "TTTG"])
+    assert cell_ids(obs, "library").to_list() == ["L1:AAAC", "L2:TTTG"]
+
+
+def test_dense_bounds_follow_chunks_and_bytes(tmp_path):
+    with h5py.File(tmp_path / "x.h5", "w") as f:
+        stored = f.create_dataset("X", data=np.zeros((100, 16), dtype=np.float32), chunks=(8, 16))
+        # 64-byte rows: 20 rows fit in the budget, rounded down to whole 8-row chunks
+        assert chunk_aligned_bounds(stored, batch_bytes=64 * 20) == [0, 16, 32, 48, 64, 80, 96, 100]
+        # Less than a chunk fits: blocks are cut on rows
+        assert chunk_aligned_bounds(stored, batch_bytes=64 * 3)[:3] == [0, 3, 6]
+
+
+def test_csr_bounds_follow_data_chunks(tmp_path):
+    rng = np.random.default_rng(0)
+    dense = _dense(rng, (200, 40))
+    dense[dense < 0] = 0
+    path = str(tmp_path / "x.h5ad")
+    anndata.AnnData(scipy.sparse.csr_matrix(dense.astype(np.float32))).write_h5ad(path)
+    with h5py.File(path, "r+") as f:
+        # Rechunk the non-zeros so blocks have chunk boundaries to follow
+        data = f["X"]["data"][:]
+        del f["X"]["data"]
+        f["X"].create_dataset("data", data=data, chunks=(64,))
+    with h5py.File(path, "r") as f:
+        indptr = f["X"]["indptr"][:]
+        bounds = chunk_aligned_bounds(f["X"], batch_rows=20)
+    # About 20 average rows of non-zeros per block, rounded down to whole 64-value chunks
+    target = -(-int(indptr[-1]) * 20 // 200) // 64 * 64
+    assert len(bounds) > 5 and bounds[0] == 0 and bounds[-1] == 200 and bounds == sorted(set(bounds))
+    for low, high in zip(bounds, bounds[1:]):
+        assert indptr[high] - indptr[low] <= target + 40
+
+    adata = anndata.read_h5ad(path, backed="r")
+    cells = pl.Series([f"c{i}" for i in range(200)])
+    features = pl.Series([f"g{j}" for j in range(40)])
+    bounds = chunk_aligned_bounds(adata.file["X"], batch_rows=20)
+    blocks = list(iter_matrix_edge_frames(adata.X, cells, features, "expresses", "normValue", bounds=bounds))
+    expected = _expected(dense.astype(np.float32), cells.to_list(), features.to_list())
+    assert [row for _, _, frame in blocks for row in _rows(frame)] == expected
+    adata.file.close()
@@ -0,0 +1,47 @@
+import os
+import random
+
+from biobox_analytics.data import DataPackWriter, iter_pack_records, merge_packs
+
+
+def _node(i, source):
+    return {"_id": f"n{i:03d}", "labels": ["Node"], "properties": {"source": source}}
+
+
+def _edge(a, b, label, source):
+    return {"from": {"uuid": f"n{a:03d}"}, "to": {"uuid": f"n{b:03d}"}, "label": label, "properties": {"source": source}}
+
+
+def _pack(directory, nodes, edges):
+    os.makedirs(directory)
+    with DataPackWriter(directory=directory) as writer:
+        writer.write_nodes(nodes)
+        writer.write_edges(edges)
+    return directory
+
+
+def test_merge_sorts_and_keeps_first_input(tmp_path):
+    rng = random.Random(0)
+    first_ids = rng.sample(range(300), 150)
+    second_ids = rng.sample(range(300), 150)
+    first_edges = [(i, (i * 7) % 300, "b") for i in first_ids] + [(i, (i * 7) % 300, "a") for i in first_ids[:20]]
+    second_edges = [(i, (i * 7) % 300, "b") for i in second_ids]
+    first = _pack(str(tmp_path / "first"), [_node(i, "first") for i in first_ids], [_edge(*e, "first") for e in first_edges])
+    second = _pack(str(tmp_path / "second"), [_node(i, "second") for i in second_ids], [_edge(*e, "second") for e in second_edges])
+
+    merged = str(tmp_path / "merged")
+    stats = merge_packs([first, second], merged, run_records=16, fan_in=3, tmp_dir=str(tmp_path))
+
+    nodes = list(iter_pack_records(merged, kind="node"))
+    edges = list(iter_pack_records(merged, kind="edge"))
+    ids = sorted(set(first_ids) | set(second_ids))
+    assert [node["_id"] for node in nodes] == [f"n{i:03d}" for i in ids]
+    assert all(node["properties"]["source"] == ("first" if int(node["_id"][1:]) in first_ids else "second") for node in nodes)
+    keys = [(edge["from"]["uuid"], edge["label"], edge["to"]["uuid"]) for edge in edges]
+    assert keys == sorted(set(keys))
+    assert len(keys) == len({(a, b, label) for a, b, label in first_edges + second_edges})
+    assert stats["node"] == {"read": 300, "written": len(ids), "duplicates": 300 - len(ids)}
+    first_keys = {(f"n{a:03d}", label, f"n{b:03d}") for a, b, label in first_edges}
+    assert all(edge["properties"]["source"] == ("first" if key in first_keys else "second") for key, edge in zip(keys, edges))
+    assert stats["edge"]["written"] == len(edges)
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("biobox-merge-")]
@@ -0,0 +1,53 @@
+import pytest
+import requests
+
+import biobox_analytics.utils._metadata as _metadata
+from biobox_analytics.utils._metadata import fetch_json
+
+
+class _Response:
+    def __init__(self, data, ok=True):
+        self.data = data
+        self.ok = ok
+
+    def json(self):
+        return self.data
+
+
+@pytest.fixture
+def responses(monkeypatch):
+    queue = []
+
+    def get(url, headers=None, timeout=None):
+        response = queue.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    monkeypatch.setattr(_metadata.requests, "get", get)
+    return queue
+
+
+def test_cached_until_ttl(tmp_path, responses):
+    cache = str(tmp_path)
+    responses += [_Response({"taxon": 1}), _Response({"taxon": 2})]
+    assert fetch_json("https://x/taxon", cache_dir=cache) == {"taxon": 1}
+    assert fetch_json("https://x/taxon", cache_dir=cache) == {"taxon": 1}
+    assert fetch_json("https://x/taxon", cache_dir=cache, ttl=0) == {"taxon": 2}
+    assert responses == []
+
+
+def test_offline_uses_stale_response(tmp_path, responses):
+    cache = str(tmp_path)
+    responses += [_Response({"taxon": 1}), requests.ConnectionError("offline"), requests.ConnectionError("offline")]
+    fetch_json("https://x/taxon", cache_dir=cache)
+    assert fetch_json("https://x/taxon", cache_dir=cache, ttl=0) == {"taxon": 1}
+    with pytest.raises(requests.ConnectionError):
+        fetch_json("https://x/other", cache_dir=cache)
+
+
+def test_errors_are_not_cached(tmp_path, responses):
+    cache = str(tmp_path)
+    responses += [_Response({"error": "not found"}, ok=False), _Response({"taxon": 1})]
+    assert fetch_json("https://x/taxon", cache_dir=cache) == {"error": "not found"}
+    assert fetch_json("https://x/taxon", cache_dir=cache) == {"taxon": 1}
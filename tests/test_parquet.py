@@ -0,0 +1,61 @@
+import os
+
+import polars as pl
+import pytest
+
+from biobox_analytics.data import DataPackWriter, iter_parquet_records, read_parquet_tables
+
+NODES = [
+    {"_id": "g1", "labels": ["Gene"], "properties": {"name": "A", "start": 1, "end": 10}},
+    {"_id": "g2", "labels": ["Gene"], "properties": {"name": "B", "start": 5}},
+    {"_id": "t1", "labels": ["Transcript"], "properties": {"name": "T"}},
+]
+EDGES = [
+    {"from": {"uuid": "g1"}, "to": {"uuid": "t1"}, "label": "transcribed to"},
+    {"from": {"uuid": "c1"}, "to": {"uuid": "g1"}, "label": "expresses", "properties": {"normValue": 0.5}},
+]
+
+
+def _sorted(records):
+    return sorted(records, key=lambda r: str(r.get("_id") or (r["from"]["uuid"], r["to"]["uuid"])))
+
+
+def test_records_round_trip(tmp_path):
+    directory = str(tmp_path)
+    with DataPackWriter("node.parquet", "edge.parquet", directory=directory, format="parquet") as writer:
+        writer.write_nodes(NODES)
+        writer.write_edges(EDGES)
+
+    assert _sorted(iter_parquet_records(os.path.join(directory, "node"))) == _sorted(NODES)
+    assert _sorted(iter_parquet_records(os.path.join(directory, "edge"))) == _sorted(EDGES)
+    tables = read_parquet_tables(os.path.join(directory, "node"), columns=["_id"])
+    assert {os.path.basename(path).split("-")[0]: table.column_names for path, table in tables.items()} == {
+        "Gene": ["_id"],
+        "Transcript": ["_id"],
+    }
+
+
+def test_frames_round_trip(tmp_path):
+    directory = str(tmp_path)
+    frame = pl.DataFrame({
+        "from": [{"uuid": "c1"}, {"uuid": "c2"}],
+        "to": [{"uuid": "g1"}, {"uuid": "g2"}],
+        "label": ["expresses", "expresses"],
+        "properties": [{"normValue": 1.5}, {"normValue": 2.0}],
+    })
+    with DataPackWriter("node.parquet", "edge.parquet", directory=directory, format="parquet") as writer:
+        writer.write_frame(frame)
+    records = list(iter_parquet_records(os.path.join(directory, "edge")))
+    assert records == [
+        {"from": {"uuid": "c1"}, "to": {"uuid": "g1"}, "label": "expresses", "properties": {"normValue": 1.5}},
+        {"from": {"uuid": "c2"}, "to": {"uuid": "g2"}, "label": "expresses", "properties": {"normValue": 2.0}},
+    ]
+
+
+def test_properties_missing_from_first_row_group(tmp_path):
+    with pytest.raises(ValueError, match="row_group_size"):
+        with DataPackWriter("node.parquet", "edge.parquet", directory=str(tmp_path), format="parquet", row_group_size=1) as writer:
+            writer.write_nodes([
+                {"_id": "a", "labels": ["Gene"], "properties": {"name": "A"}},
+                {"_id": "b", "labels": ["Gene"], "properties": {"name": "B", "extra": 1}},
+            ])
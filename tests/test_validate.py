@@ -0,0 +1,42 @@
+import os
+
+from biobox_analytics.data import DataPackWriter, validate_pack
+
+
+def _node(i):
+    return {"_id": f"n{i}", "labels": ["Node"], "properties": {}}
+
+
+def _edge(a, b, label="next"):
+    return {"from": {"uuid": a}, "to": {"uuid": b}, "label": label}
+
+
+def _pack(directory, nodes, edges):
+    os.makedirs(directory)
+    with DataPackWriter(directory=directory, manifest=True) as writer:
+        writer.write_nodes(nodes)
+        writer.write_edges(edges)
+    return directory
+
+
+def test_reports_dangling_endpoints(tmp_path):
+    edges = [_edge(f"n{i}", f"n{i + 1}") for i in range(100)] + [_edge(f"x{i}", "n0", "other") for i in range(15)]
+    pack = _pack(str(tmp_path / "pack"), [_node(i) for i in range(100)], edges)
+
+    report = validate_pack(pack, max_examples=3)
+    assert (report["nodes"], report["edges"], report["valid"]) == (100, 115, False)
+    assert report["dangling"] == {"next": {"to": 1}, "other": {"from": 15}}
+    assert report["examples"]["next"] == {"from": [], "to": ["n100"]}
+    assert len(report["examples"]["other"]["from"]) == 3
+
+    small = validate_pack(pack, memory_budget=256, max_examples=3, batch_size=7)
+    assert small["partitions"] > 1
+    assert (small["nodes"], small["edges"], small["dangling"]) == (100, 115, report["dangling"])
+
+
+def test_other_packs_provide_nodes(tmp_path):
+    genome = _pack(str(tmp_path / "genome"), [_node(i) for i in range(3)], [])
+    pack = _pack(str(tmp_path / "pack"), [{"_id": "p", "labels": ["Peak"], "properties": {}}], [_edge("p", "n2")])
+    assert not validate_pack(pack)["valid"]
+    report = validate_pack(pack, node_directories=[genome])
+    assert report["valid"] and report["dangling"] == {}
@@ -0,0 +1,23 @@
+import gzip
+import os
+
+import polars as pl
+
+from biobox_analytics.data import DataPackWriter, load_manifest
+
+
+def test_frame_bytes_count_utf8(tmp_path):
+    frame = pl.DataFrame({
+        "_id": ["g1", "g2", "g3"],
+        "labels": [["Gene"]] * 3,
+        "properties": [{"name": "α-actinin"}, {"name": "β-globin"}, {"name": "plain"}],
+    })
+    directory = str(tmp_path)
+    with DataPackWriter(directory=directory, manifest=True) as writer:
+        writer.write_frame(frame)
+
+    with gzip.open(os.path.join(directory, "node.jsonl.gz"), "rb") as f:
+        size = len(f.read())
+    assert writer.stats["node"]["bytes"] == size
+    shard, = [entry for entry in load_manifest(directory)["shards"] if entry["kind"] == "node"]
+    assert shard["uncompressed_bytes"] == size